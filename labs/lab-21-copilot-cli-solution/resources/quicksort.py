@@ -1,8 +1,570 @@
-def quick_sort(arr):
-    if len(arr) <= 1:
+"""
+In-Place Introsort
+
+``quick_sort`` used to build three new lists per recursion level and
+concatenate them, with unbounded recursion depth. It now copies its input
+once and sorts the copy in place with ``introsort``:
+
+    - pivot: median of three, or Tukey's ninther on large ranges
+    - three-way (Dutch national flag) partitioning, so runs of equal keys
+      are finished in one pass instead of recursing on them
+    - insertion sort below INSERTION_CUTOFF elements
+    - heapsort fallback once the recursion depth exceeds 2*log2(n), which
+      bounds the worst case at O(n log n)
+    - recursion only into the smaller side, so the stack stays O(log n)
+
+``introsort`` works on any mutable sequence (``list``, ``array.array``).
+NumPy arrays are sorted with NumPy's own introsort (``kind='quicksort'``).
+
+``quick_sort`` also takes ``key=``, ``reverse=`` and ``stable=`` like
+``sorted()``. Keyed and stable sorts decorate every element once with its
+cached key and original index, introsort the decorated list, then strip
+the decoration. Arrays of fixed-width ints or floats take the
+``radix_sort`` fast path instead of comparing one Python object at a time.
+With ``workers=N``, numeric input is handed to ``parallel_sort`` to be
+sorted on N processes.
+
+``nth_element``, ``partial_sort`` and ``top_k`` reuse the same pivot and
+partitioning code for quickselect, so callers that only need the first
+k items or one percentile do not sort the whole input.
+
+Run this module directly to benchmark against ``sorted()``.
+"""
+
+from array import array
+from collections import Counter
+import heapq
+from itertools import repeat
+
+from parallel_sort import parallel_sort
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# Ranges this small are finished with insertion sort
+INSERTION_CUTOFF = 16
+# Ranges at least this large use the ninther for the pivot
+NINTHER_THRESHOLD = 128
+# array.array typecodes of fixed-width numbers handled by radix_sort
+RADIX_TYPECODES = 'bBhHiIlLqQfd'
+# Bits per LSD radix digit (one stable counting pass per digit)
+RADIX_BITS = 16
+
+
+def _insertion_sort(a, lo, hi):
+    """Sort a[lo:hi] in place."""
+    for i in range(lo + 1, hi):
+        x = a[i]
+        j = i - 1
+        while j >= lo and x < a[j]:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+def _median_of_three(a, i, j, k):
+    """Return the index of the median of a[i], a[j], a[k]."""
+    x, y, z = a[i], a[j], a[k]
+    if x < y:
+        if y < z:
+            return j
+        return k if x < z else i
+    if x < z:
+        return i
+    return k if y < z else j
+
+
+def _choose_pivot(a, lo, hi):
+    n = hi - lo
+    mid = lo + n // 2
+    if n < NINTHER_THRESHOLD:
+        return a[_median_of_three(a, lo, mid, hi - 1)]
+    step = n // 8
+    return a[_median_of_three(
+        a,
+        _median_of_three(a, lo, lo + step, lo + 2 * step),
+        _median_of_three(a, mid - step, mid, mid + step),
+        _median_of_three(a, hi - 1 - 2 * step, hi - 1 - step, hi - 1),
+    )]
+
+
+def _partition3(a, lo, hi, pivot):
+    """
+    Three-way partition a[lo:hi] around ``pivot`` in one pass.
+
+    Returns:
+        (lt, gt) such that a[lo:lt] < pivot, a[lt:gt] == pivot and
+        a[gt:hi] > pivot
+    """
+    lt = i = lo
+    gt = hi - 1
+    while i <= gt:
+        x = a[i]
+        if x < pivot:
+            a[i] = a[lt]
+            a[lt] = x
+            lt += 1
+            i += 1
+        elif pivot < x:
+            a[i] = a[gt]
+            a[gt] = x
+            gt -= 1
+        else:
+            i += 1
+    return lt, gt + 1
+
+
+def _sift_down(a, lo, root, end):
+    """Restore the max-heap property below ``root`` for the heap a[lo:lo+end]."""
+    x = a[lo + root]
+    child = 2 * root + 1
+    while child < end:
+        if child + 1 < end and a[lo + child] < a[lo + child + 1]:
+            child += 1
+        if not x < a[lo + child]:
+            break
+        a[lo + root] = a[lo + child]
+        root = child
+        child = 2 * root + 1
+    a[lo + root] = x
+
+
+def _heapsort(a, lo, hi):
+    """Sort a[lo:hi] in place in O(n log n) worst case."""
+    n = hi - lo
+    for root in range(n // 2 - 1, -1, -1):
+        _sift_down(a, lo, root, n)
+    for end in range(n - 1, 0, -1):
+        a[lo], a[lo + end] = a[lo + end], a[lo]
+        _sift_down(a, lo, 0, end)
+
+
+def _introsort(a, lo, hi, depth):
+    while hi - lo > INSERTION_CUTOFF:
+        if depth == 0:
+            _heapsort(a, lo, hi)
+            return
+        depth -= 1
+        lt, gt = _partition3(a, lo, hi, _choose_pivot(a, lo, hi))
+        # Recurse into the smaller side, loop on the larger one
+        if lt - lo < hi - gt:
+            _introsort(a, lo, lt, depth)
+            lo = gt
+        else:
+            _introsort(a, gt, hi, depth)
+            hi = lt
+    _insertion_sort(a, lo, hi)
+
+
+def introsort(arr, lo=0, hi=None):
+    """
+    Sort ``arr[lo:hi]`` in place (not stable).
+
+    Elements only need to support ``<``.
+
+    Args:
+        arr: list, array.array, NumPy array or other mutable sequence
+        lo, hi: Range to sort (default: the whole sequence)
+
+    Returns:
+        ``arr``
+    """
+    if hi is None:
+        hi = len(arr)
+    if np is not None and isinstance(arr, np.ndarray):
+        arr[lo:hi].sort(kind='quicksort')
         return arr
-    pivot = arr[len(arr) // 2]
-    left = [x for x in arr if x < pivot]
-    middle = [x for x in arr if x == pivot]
-    right = [x for x in arr if x > pivot]
-    return quick_sort(left) + middle + quick_sort(right)
+    n = hi - lo
+    if n > 1:
+        _introsort(arr, lo, hi, 2 * n.bit_length())
+    return arr
+
+
+def _radix_numpy(values):
+    """LSD radix sort of a 1-D NumPy int/float array in vectorized passes."""
+    data = np.ascontiguousarray(values).ravel()
+    width = data.dtype.itemsize * 8
+    unsigned = np.dtype(f'u{data.dtype.itemsize}')
+    sign = unsigned.type(1 << (width - 1))
+    # Map the values to unsigned keys with the same order
+    keys = data.view(unsigned).copy()
+    if data.dtype.kind == 'i':
+        keys ^= sign
+    elif data.dtype.kind == 'f':
+        negative = (keys & sign).astype(bool)
+        keys[negative] = ~keys[negative]
+        keys[~negative] |= sign
+    # Bits above the highest one differing between min and max are
+    # common to every key, so their passes can be skipped
+    top = int(keys.min() ^ keys.max()).bit_length() if len(keys) else 0
+    for shift in range(0, top, RADIX_BITS):
+        # The cast to uint16 keeps the low RADIX_BITS bits
+        digits = (keys >> unsigned.type(shift)).astype(np.uint16)
+        keys = keys[np.argsort(digits, kind='stable')]
+    if data.dtype.kind == 'i':
+        keys ^= sign
+    elif data.dtype.kind == 'f':
+        positive = (keys & sign).astype(bool)
+        keys[positive] ^= sign
+        keys[~positive] = ~keys[~positive]
+    return keys.view(data.dtype)
+
+
+def _counting_sort(values, typecode):
+    """Sort ints with few distinct values by counting them (C-speed Counter)."""
+    counts = Counter(values)
+    result = array(typecode)
+    for value in sorted(counts):
+        result.extend(repeat(value, counts[value]))
+    return result
+
+
+def radix_sort(values, typecode=None):
+    """
+    Sort fixed-width ints or floats without element-by-element comparisons.
+
+    With NumPy, this is an LSD radix sort: the values are mapped to
+    order-preserving unsigned keys and sorted by RADIX_BITS-bit digits in
+    O(n * w / RADIX_BITS) vectorized stable passes. Without NumPy, int
+    arrays whose value span is small relative to their length are counting
+    sorted (a single-digit radix pass); other inputs fall back to
+    ``sorted()``, because Python-level digit passes are slower than C
+    timsort.
+
+    Args:
+        values: array.array, NumPy array or sequence of numbers
+        typecode: array typecode for non-array input (default 'q' for
+            ints, 'd' for floats)
+
+    Returns:
+        New sorted array of the same kind as ``values`` (array.array for
+        sequences)
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        return _radix_numpy(values)
+    if isinstance(values, array):
+        typecode = values.typecode
+    elif typecode is None:
+        typecode = 'q' if values and isinstance(values[0], int) else 'd'
+    if typecode not in RADIX_TYPECODES:
+        raise ValueError(f"radix_sort needs a fixed-width number typecode, not {typecode!r}")
+    if np is not None:
+        data = values if isinstance(values, array) else array(typecode, values)
+        return array(typecode, _radix_numpy(np.frombuffer(data, dtype=typecode)).tobytes())
+    n = len(values)
+    if n and typecode not in 'fd':
+        span = max(values) - min(values)
+        if span <= n // 4 and span < 1 << 20:
+            return _counting_sort(values, typecode)
+    return array(typecode, sorted(values))
+
+
+# Key types whose ``==`` agrees with ``<``, so tuple comparison reaches
+# the tie-breaking index
+_PLAIN_KEY_TYPES = (int, float, str, bytes)
+
+
+class _Decorated:
+    """Key with a tie-breaking index, for keys that only define ``<``."""
+
+    __slots__ = ('key', 'index')
+
+    def __init__(self, key, index):
+        self.key = key
+        self.index = index
+
+    def __lt__(self, other):
+        if self.key < other.key:
+            return True
+        if other.key < self.key:
+            return False
+        return self.index < other.index
+
+
+def _is_radix_sortable(arr):
+    if np is not None and isinstance(arr, np.ndarray):
+        return arr.ndim == 1 and arr.dtype.kind in 'iuf'
+    return isinstance(arr, array) and arr.typecode in RADIX_TYPECODES
+
+
+def _parallel_typecode(arr):
+    """array typecode for parallel_sort, or None if ``arr`` is not numeric."""
+    if isinstance(arr, array):
+        return arr.typecode if arr.typecode in RADIX_TYPECODES else None
+    if not isinstance(arr, (list, tuple)) or not arr:
+        return None
+    if all(type(x) is float for x in arr):
+        return 'd'
+    if all(type(x) is int for x in arr) and -2**63 <= min(arr) and max(arr) < 2**63:
+        return 'q'
+    return None
+
+
+def quick_sort(arr, key=None, reverse=False, stable=False, workers=None):
+    """
+    Return a new list with the elements of ``arr`` in ascending order.
+
+    Args:
+        arr: Any iterable of mutually comparable elements
+        key: Function computing the sort key, called once per element
+        reverse: Sort in descending order
+        stable: Keep equal elements in their original order (always the
+            case when ``key`` is given)
+        workers: Sort with ``parallel_sort`` on this many processes when
+            ``arr`` is a numeric array.array, or a list or tuple of only
+            ints or only floats, and neither ``key`` nor ``stable`` is
+            given. ``parallel_sort`` stays serial below its crossover size.
+    """
+    if workers is not None and key is None and not stable:
+        typecode = _parallel_typecode(arr)
+        if typecode is not None:
+            result = parallel_sort(arr, typecode, workers=workers).tolist()
+            if reverse:
+                result.reverse()
+            return result
+
+    if key is None and _is_radix_sortable(arr):
+        result = radix_sort(arr).tolist()
+        if reverse:
+            result.reverse()
+        return result
+
+    if key is None and not stable:
+        result = list(arr)
+        introsort(result)
+        if reverse:
+            result.reverse()
+        return result
+
+    # Decorate-sort-undecorate: the unique index breaks ties, so elements
+    # themselves are never compared and equal keys keep their order.
+    # For reverse, ties are ordered by descending index before the final
+    # reversal puts them back in original order.
+    items = list(arr)
+    keys = items if key is None else [key(item) for item in items]
+    sign = -1 if reverse else 1
+    if all(type(k) in _PLAIN_KEY_TYPES for k in keys):
+        decorated = [(k, sign * i) for i, k in enumerate(keys)]
+        introsort(decorated)
+        if reverse:
+            decorated.reverse()
+        return [items[sign * i] for _, i in decorated]
+    decorated = [_Decorated(k, sign * i) for i, k in enumerate(keys)]
+    introsort(decorated)
+    if reverse:
+        decorated.reverse()
+    return [items[sign * d.index] for d in decorated]
+
+
+def _select(a, lo, hi, nth, depth):
+    """Quickselect: move the element of sorted rank ``nth`` to a[nth]."""
+    while hi - lo > INSERTION_CUTOFF:
+        if depth == 0:
+            _heapsort(a, lo, hi)
+            return
+        depth -= 1
+        lt, gt = _partition3(a, lo, hi, _choose_pivot(a, lo, hi))
+        if nth < lt:
+            hi = lt
+        elif nth >= gt:
+            lo = gt
+        else:
+            return          # a[nth] is in the block equal to the pivot
+    _insertion_sort(a, lo, hi)
+
+
+def nth_element(arr, nth, lo=0, hi=None):
+    """
+    Partially reorder ``arr[lo:hi]`` in place so ``arr[nth]`` holds the
+    element that would be there if the range were sorted.
+
+    Every element before ``nth`` is <= ``arr[nth]`` and every element after
+    it is >=. Runs in expected O(n), with a heapsort fallback bounding the
+    worst case at O(n log n). NumPy arrays use ``ndarray.partition``.
+
+    Args:
+        arr: list, array.array, NumPy array or other mutable sequence
+        nth: Absolute index of the element to place (lo <= nth < hi)
+        lo, hi: Range to select in (default: the whole sequence)
+
+    Returns:
+        ``arr[nth]``
+    """
+    if hi is None:
+        hi = len(arr)
+    if not lo <= nth < hi:
+        raise IndexError(f"nth_element index {nth} outside [{lo}, {hi})")
+    if np is not None and isinstance(arr, np.ndarray):
+        arr[lo:hi].partition(nth - lo)
+        return arr[nth]
+    _select(arr, lo, hi, nth, 2 * (hi - lo).bit_length())
+    return arr[nth]
+
+
+def partial_sort(arr, k):
+    """
+    Reorder ``arr`` in place so ``arr[:k]`` holds its k smallest elements
+    in ascending order; the order of the rest is unspecified.
+
+    Expected O(n + k log k): quickselect around rank k - 1, then introsort
+    of the first k. NumPy arrays use ``ndarray.partition`` and ``sort``.
+
+    Returns:
+        ``arr``
+    """
+    n = len(arr)
+    k = min(k, n)
+    if k <= 0:
+        return arr
+    if k < n:
+        nth_element(arr, k - 1)
+    if np is not None and isinstance(arr, np.ndarray):
+        arr[:k].sort()
+    else:
+        introsort(arr, 0, k)
+    return arr
+
+
+def top_k(arr, k, key=None):
+    """
+    Return the k largest elements of ``arr``, largest first.
+
+    Equivalent to ``sorted(arr, key=key, reverse=True)[:k]`` (ties keep
+    their input order). Small k (up to n / 8) use a bounded heap in
+    O(n log k) time and O(k) memory; larger k sort the whole input, which
+    is faster in CPython than a pure-Python selection. NumPy arrays
+    without a key use ``np.partition``. To select in place instead of
+    building a new list, use ``nth_element`` or ``partial_sort``.
+
+    Args:
+        arr: Iterable of elements (or NumPy array)
+        k: Number of elements to return
+        key: Function computing the comparison key, called once per element
+
+    Returns:
+        List of at most k elements (NumPy array for NumPy input without key)
+    """
+    if k <= 0:
+        return []
+    if np is not None and isinstance(arr, np.ndarray) and key is None:
+        data = arr.ravel()
+        if k >= len(data):
+            return np.sort(data)[::-1]
+        return np.sort(np.partition(data, len(data) - k)[len(data) - k:])[::-1]
+
+    items = arr if isinstance(arr, list) else list(arr)
+    if k * 8 <= len(items):
+        return heapq.nlargest(k, items, key=key)
+    # Quickselect on decorated keys is O(n) but runs in the interpreter; for
+    # k this large one C timsort pass is several times faster
+    return sorted(items, key=key, reverse=True)[:k]
+
+
+# Benchmark: introsort vs sorted() and the original list-building version
+if __name__ == "__main__":
+    import random
+    import sys
+    import time
+
+    def list_comprehension_quick_sort(arr):
+        """The original implementation, for comparison."""
+        if len(arr) <= 1:
+            return arr
+        pivot = arr[len(arr) // 2]
+        left = [x for x in arr if x < pivot]
+        middle = [x for x in arr if x == pivot]
+        right = [x for x in arr if x > pivot]
+        return (list_comprehension_quick_sort(left) + middle
+                + list_comprehension_quick_sort(right))
+
+    def best_of(function, data, repeat=3):
+        best = float('inf')
+        for _ in range(repeat):
+            copy = list(data)
+            start = time.perf_counter()
+            function(copy)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    inputs = {
+        'random': [rng.random() for _ in range(n)],
+        'sorted': list(range(n)),
+        'reversed': list(range(n, 0, -1)),
+        'all equal': [7] * n,
+        'few unique': [rng.randrange(10) for _ in range(n)],
+    }
+
+    print(f"SORT BENCHMARK (n = {n}, best of 3, ms)")
+    print("=" * 50)
+    print(f"{'input':12} {'sorted()':>10} {'introsort':>10} {'original':>10}")
+    for name, data in inputs.items():
+        assert quick_sort(data) == sorted(data)
+        print(f"{name:12} {best_of(sorted, data):10.1f} {best_of(introsort, data):10.1f} "
+              f"{best_of(list_comprehension_quick_sort, data):10.1f}")
+
+    values = array('d', inputs['random'])
+    introsort(values)
+    assert list(values) == sorted(inputs['random'])
+    print("\narray.array('d') sorted in place: OK")
+
+    def timed(function, repeat=3):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    key = lambda record: record[0]
+    records = [(rng.randrange(1000), f"user{i}") for i in range(n)]
+    narrow = array('q', (rng.randrange(1000) for _ in range(n)))
+    wide = array('q', (rng.randrange(-2**62, 2**62) for _ in range(n)))
+    doubles = array('d', inputs['random'])
+    variants = [
+        ("key=, records", lambda: sorted(records, key=key),
+         lambda: quick_sort(records, key=key), "decorated introsort"),
+        ("stable=True", lambda: sorted(inputs['few unique']),
+         lambda: quick_sort(inputs['few unique'], stable=True), "decorated introsort"),
+        ("array q span 1e3", lambda: sorted(narrow),
+         lambda: quick_sort(narrow), "radix_sort"),
+        ("array q span 2^63", lambda: sorted(wide),
+         lambda: quick_sort(wide), "radix_sort"),
+        ("array d random", lambda: sorted(doubles),
+         lambda: quick_sort(doubles), "radix_sort"),
+        ("list, no radix", lambda: sorted(narrow),
+         lambda: quick_sort(narrow.tolist()), "introsort"),
+    ]
+    backend = "NumPy LSD radix" if np is not None else "counting sort / sorted() fallback"
+    print(f"\nVARIANTS (ms, radix backend: {backend})")
+    print("=" * 50)
+    print(f"{'input':18} {'sorted()':>10} {'quick_sort':>11}  path")
+    for name, baseline, variant, path in variants:
+        assert variant() == list(baseline())
+        print(f"{name:18} {timed(baseline):10.1f} {timed(variant):11.1f}  {path}")
+
+    k = 100
+    nth = n * 99 // 100
+    selections = [
+        (f"first {k}", lambda: sorted(inputs['random'])[:k],
+         lambda: partial_sort(list(inputs['random']), k)[:k], "partial_sort"),
+        ("99th percentile", lambda: sorted(inputs['random'])[nth],
+         lambda: nth_element(list(inputs['random']), nth), "nth_element"),
+        (f"top {k} by key", lambda: sorted(records, key=key, reverse=True)[:k],
+         lambda: top_k(records, k, key=key), "bounded heap"),
+        (f"top {n // 4} by key", lambda: sorted(records, key=key, reverse=True)[:n // 4],
+         lambda: top_k(records, n // 4, key=key), "sorted() fallback"),
+    ]
+    if np is not None:
+        floats = np.array(inputs['random'])
+        selections.append(("NumPy top 100", lambda: np.sort(floats)[::-1][:k].tolist(),
+                           lambda: top_k(floats, k).tolist(), "np.partition"))
+    print("\nSELECTION (ms)")
+    print("=" * 50)
+    print(f"{'query':18} {'sort all':>10} {'select':>11}  path")
+    for name, baseline, variant, path in selections:
+        assert variant() == baseline()
+        print(f"{name:18} {timed(baseline):10.1f} {timed(variant):11.1f}  {path}")
@@ -0,0 +1,236 @@
+"""
+Async SQLite Query Executor for the Admin Dashboard
+
+Async counterparts of ``search_users`` and ``get_user_details`` from
+``security_issue.py`` for asyncio web servers. Blocking ``sqlite3`` calls
+run off the event loop:
+
+    - reads on a dedicated reader thread pool, each thread borrowing a
+      connection from the instance's own ``ConnectionPool`` (the pool of
+      the blocking functions is left alone)
+    - writes on a single writer thread with its own connection, which
+      matches SQLite's one-writer model and avoids ``database is locked``
+
+Identical queries already in flight are coalesced into one database call,
+and results are kept in a small TTL cache that every write clears. Each
+write also starts a new generation: reads begun before it neither cache
+their result nor take in new callers once it has committed.
+
+Run this module directly for a load test comparing p99 latency with the
+blocking functions called from the event loop.
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import security_issue
+from sqlite_pool import ConnectionPool
+
+
+class AsyncUserQueries:
+    """
+    Run user queries on background threads and await them from asyncio.
+
+    Cached results are shared between callers and must not be mutated.
+
+    Args:
+        database: SQLite database path
+        readers: Number of reader threads and pooled read connections
+        cache_ttl: Seconds a result stays cached (0 disables the cache)
+        cache_size: Maximum number of cached results
+    """
+
+    def __init__(self, database=security_issue.DATABASE_PATH, readers=4,
+                 cache_ttl=1.0, cache_size=1024):
+        self.database = database
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._pool = ConnectionPool(database, size=readers, connect=self._connect)
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='sqlite-reader')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='sqlite-writer')
+        self._writer_local = threading.local()
+        self._inflight = {}
+        self._cache = OrderedDict()
+        self._generation = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    @staticmethod
+    def _connect(*args, **kwargs):
+        # Look up the hook at call time so instrument_sqlite() is honoured
+        return security_issue.connect(*args, **kwargs)
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        if self.cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _read(self, key, function, *args):
+        entry = self._cached(key)
+        if entry is not None:
+            self.cache_hits += 1
+            return entry[1]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: one waiter being cancelled must not cancel the others
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        generation = self._generation
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._readers, function, *args, self._pool)
+        self._inflight[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            # A write may have replaced this entry with a newer read
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        # Results of reads that overlapped a write may predate it
+        if generation == self._generation:
+            self._store(key, result)
+        return result
+
+    async def search_users(self, search_term, role_filter=None):
+        """Async ``security_issue.search_users``."""
+        return await self._read(('search', search_term, role_filter),
+                                security_issue.search_users, search_term, role_filter)
+
+    async def get_user_details(self, user_id):
+        """Async ``security_issue.get_user_details``."""
+        return await self._read(('details', user_id),
+                                security_issue.get_user_details, user_id)
+
+    def _write(self, sql, parameters):
+        conn = getattr(self._writer_local, 'conn', None)
+        if conn is None:
+            conn = self._writer_local.conn = security_issue.connect(self.database)
+        with conn:
+            return conn.execute(sql, parameters).rowcount
+
+    async def execute_write(self, sql, parameters=()):
+        """
+        Run a write statement on the single writer thread and commit it.
+
+        Returns:
+            Number of rows changed
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._writer, self._write, sql, parameters)
+        finally:
+            self._generation += 1
+            self._cache.clear()
+            self._inflight.clear()
+
+    def close(self):
+        """Stop the worker threads and close their connections."""
+        self._readers.shutdown(wait=True)
+        self._writer.submit(self._close_writer).result()
+        self._writer.shutdown(wait=True)
+        self._pool.close()
+
+    def _close_writer(self):
+        conn = getattr(self._writer_local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._writer_local.conn = None
+
+
+# Load test: p99 latency under concurrent requests
+if __name__ == "__main__":
+    import argparse
+    import os
+    import random
+    import tempfile
+
+    from benchmark_sqlite_access import create_database
+
+    parser = argparse.ArgumentParser(description="Async vs blocking dashboard queries.")
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--rate', type=float, default=1_000, help="requests per second")
+    options = parser.parse_args()
+
+    def workload(seed):
+        """Mostly id lookups over a hot set of users, plus some searches."""
+        rng = random.Random(seed)
+        for _ in range(options.requests):
+            if rng.random() < 0.9:
+                yield 'details', rng.randint(1, 500)
+            else:
+                yield 'search', f"user{rng.randint(1, 50)}@"
+
+    async def run(handler):
+        """Open-loop arrivals at a fixed rate; latency counts from the arrival time."""
+        latencies = []
+
+        async def request(arrival, kind, argument):
+            await handler(kind, argument)
+            latencies.append(time.perf_counter() - arrival)
+
+        tasks = []
+        start = time.perf_counter()
+        for i, (kind, argument) in enumerate(workload(1)):
+            arrival = start + i / options.rate
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(request(arrival, kind, argument)))
+        await asyncio.gather(*tasks)
+        latencies.sort()
+        return latencies
+
+    def report(label, latencies):
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"  {label:10} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'users.db')
+        create_database(path, options.users)
+
+        print(f"LOAD TEST: {options.requests} requests at {options.rate:.0f}/s")
+        print("=" * 50)
+
+        security_issue.configure_pool(path)
+
+        async def blocking(kind, argument):
+            if kind == 'details':
+                security_issue.get_user_details(argument)
+            else:
+                security_issue.search_users(argument)
+
+        report('blocking', asyncio.run(run(blocking)))
+
+        queries = AsyncUserQueries(path)
+
+        async def non_blocking(kind, argument):
+            if kind == 'details':
+                await queries.get_user_details(argument)
+            else:
+                await queries.search_users(argument)
+
+        report('async', asyncio.run(run(non_blocking)))
+        print(f"\n  database calls {queries.calls}, coalesced {queries.coalesced}, "
+              f"cache hits {queries.cache_hits}")
+        queries.close()
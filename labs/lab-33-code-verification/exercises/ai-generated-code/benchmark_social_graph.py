@@ -0,0 +1,256 @@
+"""
+Benchmark Harness for the performance_issue.py Social-Graph Functions
+
+Builds seeded graphs with different degree distributions, sweeps over user
+counts, and times ``find_common_friends``, ``get_friend_recommendations``
+and ``get_mutual_friends_count`` with warmup, repetitions, latency
+percentiles and peak memory. Results are written as JSON so two runs (for
+example before and after a change) can be compared with ``--compare``.
+
+Usage:
+    python benchmark_social_graph.py --users 1000 10000 --output run.json
+    python benchmark_social_graph.py --compare baseline.json --output run.json
+"""
+
+import argparse
+from bisect import bisect_left
+from datetime import datetime, timezone
+import heapq
+from itertools import accumulate
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from performance_issue import (
+    MockDatabase,
+    find_common_friends,
+    get_friend_recommendations,
+    get_mutual_friends_count,
+)
+
+
+def _users(user_count):
+    return [{'id': i, 'name': f'User{i}', 'email': f'user{i}@example.com'}
+            for i in range(1, user_count + 1)]
+
+
+def uniform_graph(user_count, avg_degree, seed=0):
+    """Every user befriends ``avg_degree`` users chosen uniformly at random."""
+    rng = random.Random(seed)
+    degree = min(avg_degree, user_count - 1)
+    edges = []
+    for user_id in range(1, user_count + 1):
+        for friend_id in rng.sample(range(1, user_count + 1), degree):
+            edges.append((user_id, friend_id))
+    return _users(user_count), edges
+
+
+def power_law_graph(user_count, avg_degree, exponent=2.1, seed=0):
+    """
+    Degrees follow a power law and popular users attract more friendships.
+
+    Friend targets are drawn with Zipf weights ``rank ** -1``, so a few
+    users appear in very many friend lists, as in real social graphs.
+    Rejection sampling stalls once a degree nears the user count, so after
+    ``4 * degree`` draws the rest is sampled without replacement from the
+    remaining candidates, with the same weights.
+    """
+    rng = random.Random(seed)
+    alpha = exponent - 1
+    # Mean of a Pareto(alpha) sample is alpha / (alpha - 1)
+    scale = avg_degree * (alpha - 1) / alpha
+    cum_weights = list(accumulate(1 / rank for rank in range(1, user_count + 1)))
+    total = cum_weights[-1]
+    edges = []
+    for user_id in range(1, user_count + 1):
+        degree = min(user_count - 1, max(1, int(scale * rng.paretovariate(alpha))))
+        friends = set()
+        draws = 0
+        while len(friends) < degree and draws < 4 * degree:
+            draws += 1
+            friend_id = bisect_left(cum_weights, rng.random() * total) + 1
+            if friend_id != user_id:
+                friends.add(friend_id)
+        if len(friends) < degree:
+            # Efraimidis-Spirakis: the smallest Exp(1) / weight keys form a
+            # weighted sample without replacement (weight of rank r is 1 / r)
+            candidates = (f for f in range(1, user_count + 1)
+                          if f != user_id and f not in friends)
+            friends.update(heapq.nsmallest(degree - len(friends), candidates,
+                                           key=lambda f: rng.expovariate(1.0) * f))
+        edges.extend((user_id, friend_id) for friend_id in friends)
+    return _users(user_count), edges
+
+
+def celebrity_graph(user_count, avg_degree, celebrities=10, fan_fraction=0.5, seed=0):
+    """
+    Uniform graph plus a few celebrity nodes with huge friend lists.
+
+    Each celebrity is befriended by ``fan_fraction`` of all users and
+    befriends them back, which creates the worst case for 2-hop expansion.
+    """
+    users, edges = uniform_graph(user_count, avg_degree, seed)
+    rng = random.Random(seed + 1)
+    for celebrity_id in rng.sample(range(1, user_count + 1), min(celebrities, user_count)):
+        fans = rng.sample(range(1, user_count + 1), int(user_count * fan_fraction))
+        for fan_id in fans:
+            if fan_id != celebrity_id:
+                edges.append((fan_id, celebrity_id))
+                edges.append((celebrity_id, fan_id))
+    return users, edges
+
+
+GENERATORS = {
+    'uniform': uniform_graph,
+    'power-law': power_law_graph,
+    'celebrity': celebrity_graph,
+}
+
+FUNCTIONS = {
+    'find_common_friends': lambda db, a, b: find_common_friends(a, b, db),
+    'get_friend_recommendations': lambda db, a, b: get_friend_recommendations(a, db),
+    'get_mutual_friends_count': lambda db, a, b: get_mutual_friends_count(a, b, db),
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def time_function(function, database, pairs, warmup, repetitions):
+    """
+    Time ``function`` over ``pairs`` of user ids.
+
+    Returns:
+        Dict of latency statistics in microseconds plus peak traced memory
+        in bytes; memory is measured in a separate pass so tracemalloc does
+        not distort the timings
+    """
+    for user1_id, user2_id in pairs[:warmup]:
+        function(database, user1_id, user2_id)
+
+    samples = []
+    for _ in range(repetitions):
+        for user1_id, user2_id in pairs:
+            start = time.perf_counter()
+            function(database, user1_id, user2_id)
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+
+    tracemalloc.start()
+    for user1_id, user2_id in pairs:
+        function(database, user1_id, user2_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'calls': len(samples),
+        'mean_us': sum(samples) / len(samples),
+        'p50_us': percentile(samples, 0.50),
+        'p90_us': percentile(samples, 0.90),
+        'p99_us': percentile(samples, 0.99),
+        'max_us': samples[-1],
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_sweep(user_counts, distributions, avg_degree, pairs_per_case, warmup,
+              repetitions, seed):
+    """Run every function on every (distribution, user count) combination."""
+    results = []
+    for distribution in distributions:
+        for user_count in user_counts:
+            users, edges = GENERATORS[distribution](user_count, avg_degree, seed=seed)
+            build_start = time.perf_counter()
+            database = MockDatabase(users, edges)
+            build_seconds = time.perf_counter() - build_start
+
+            rng = random.Random(seed)
+            pairs = [(rng.randint(1, user_count), rng.randint(1, user_count))
+                     for _ in range(pairs_per_case)]
+            for name, function in FUNCTIONS.items():
+                stats = time_function(function, database, pairs, warmup, repetitions)
+                results.append({
+                    'distribution': distribution,
+                    'users': user_count,
+                    'edges': len(database.graph),
+                    'build_seconds': build_seconds,
+                    'function': name,
+                    **stats,
+                })
+                print(f"{distribution:10} {user_count:>8} {name:28} "
+                      f"p50 {stats['p50_us']:10.1f}us  p99 {stats['p99_us']:10.1f}us  "
+                      f"peak {stats['peak_memory_bytes'] / 1024:9.1f} KiB")
+    return results
+
+
+def _case_key(result):
+    return result['distribution'], result['users'], result['function']
+
+
+def compare(results, baseline, threshold):
+    """Print p50 ratios against a baseline run and return the regressions."""
+    previous = {_case_key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"\nComparison against baseline (regression if p50 ratio > {threshold:.2f}):")
+    for result in results:
+        old = previous.get(_case_key(result))
+        if old is None:
+            continue
+        ratio = result['p50_us'] / old['p50_us'] if old['p50_us'] else float('inf')
+        flag = 'REGRESSION' if ratio > threshold else ''
+        print(f"  {result['distribution']:10} {result['users']:>8} "
+              f"{result['function']:28} {ratio:6.2f}x {flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the social-graph functions.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--distributions', nargs='+', choices=sorted(GENERATORS),
+                        default=['uniform', 'power-law', 'celebrity'])
+    parser.add_argument('--avg-degree', type=int, default=50)
+    parser.add_argument('--pairs', type=int, default=50, help="user pairs per case")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file from a previous run")
+    parser.add_argument('--threshold', type=float, default=1.25)
+    options = parser.parse_args(argv)
+
+    print("SOCIAL GRAPH BENCHMARK")
+    print("=" * 50)
+    results = run_sweep(options.users, options.distributions, options.avg_degree,
+                        options.pairs, options.warmup, options.repetitions, options.seed)
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {k: v for k, v in vars(options).items()
+                       if k not in ('output', 'compare', 'threshold')},
+        'results': results,
+    }
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {options.output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
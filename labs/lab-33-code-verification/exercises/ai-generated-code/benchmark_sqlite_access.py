@@ -0,0 +1,108 @@
+"""
+Benchmark: Connect-per-Call vs Pooled, Prepared SQLite Access
+
+Compares queries per second of the original access pattern (open
+``sqlite3.connect`` per call, build the SQL text, close) with the pooled,
+parameterized functions in ``security_issue.py``, single-threaded and
+with several threads sharing the pool.
+
+Usage:
+    python benchmark_sqlite_access.py [--users N] [--queries N] [--threads N]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import security_issue
+
+
+def create_database(path, user_count, seed=42):
+    """Create a ``users`` table with ``user_count`` generated rows."""
+    rng = random.Random(seed)
+    roles = ('admin', 'user', 'guest')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, role TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     ((i, f"User {i}", f"user{i}@example.com", rng.choice(roles))
+                      for i in range(1, user_count + 1)))
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call_details(path, user_id):
+    """The original pattern: new connection and new SQL text per call."""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT * FROM users WHERE id = {user_id}").fetchone()
+    finally:
+        conn.close()
+
+
+def connect_per_call_search(path, term):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(f"SELECT id, name, email, role FROM users "
+                            f"WHERE name LIKE '%{term}%' OR email LIKE '%{term}%'").fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def measure(label, function, arguments, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        for argument in arguments:
+            function(argument)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(function, arguments))
+    elapsed = time.perf_counter() - start
+    qps = len(arguments) / elapsed
+    print(f"  {label:38} {qps:10.0f} queries/s")
+    return qps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=4)
+    options = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    ids = [rng.randint(1, options.users) for _ in range(options.queries)]
+    # Selective search terms (exact user numbers) keep the comparison about
+    # per-call overhead rather than result size
+    terms = [f"user{i}@" for i in ids[:max(1, options.queries // 20)]]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'users.db')
+        create_database(path, options.users)
+        security_issue.configure_pool(path, size=options.threads)
+
+        print(f"SQLITE ACCESS BENCHMARK: {options.users} users")
+        print("=" * 60)
+        for threads in sorted({1, options.threads}):
+            print(f"\nget_user_details x{len(ids)}, {threads} thread(s):")
+            base = measure("connect per call", lambda i: connect_per_call_details(path, i),
+                           ids, threads)
+            pooled = measure("pooled + prepared", security_issue.get_user_details, ids, threads)
+            print(f"  speedup: {pooled / base:.1f}x")
+
+            print(f"\nsearch_users x{len(terms)}, {threads} thread(s):")
+            base = measure("connect per call", lambda t: connect_per_call_search(path, t),
+                           terms, threads)
+            pooled = measure("pooled + prepared", security_issue.search_users, terms, threads)
+            print(f"  speedup: {pooled / base:.1f}x")
+
+        security_issue.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Indexed Friendship Graph Store
+
+Array-backed storage for the ``friendships`` and ``users`` tables used by
+``performance_issue.py``.
+
+Adjacency is kept in CSR form (Compressed Sparse Row): every user owns a
+contiguous, sorted slice of one shared ``neighbors`` array, located by
+``offsets[row]`` and ``degrees[row]``. Each slice reserves a little spare
+capacity so that inserting or deleting an edge only shifts the entries of
+that one row instead of rebuilding the whole index.
+
+Complexity:
+    - build from an edge list: O(E log E) once
+    - neighbors(user_id):      O(degree)
+    - has_edge(u, v):          O(log degree)
+    - add_edge / remove_edge:  O(degree) amortized
+    - user lookup by id:       O(1) (hash index)
+"""
+
+from array import array
+from bisect import bisect_left
+
+from friend_intersection import intersect, intersect_count, to_bitset
+
+
+class FriendshipGraph:
+    """
+    Directed friendship graph stored as sorted CSR adjacency arrays.
+
+    Rows are indexed densely (0..n-1); ``row_of`` maps a user id to its
+    row. Neighbor arrays store user ids directly, sorted ascending, so a
+    neighbor slice can be returned to callers as-is.
+
+    Users with at least ``dense_degree`` friends also get a cached bitset
+    of their friend ids, which turns intersections between two such users
+    into a single big-integer AND.
+
+    Args:
+        edges: Iterable of (user_id, friend_id) pairs
+        slack: Fraction of extra capacity reserved per row (default 0.25)
+        dense_degree: Degree from which friend bitsets are cached
+            (default 1024)
+    """
+
+    def __init__(self, edges=(), slack=0.25, dense_degree=1024):
+        self.slack = slack
+        self.dense_degree = dense_degree
+        self._bitsets = {}
+        self.row_of = {}
+        self.row_ids = array('q')
+        self.offsets = array('q')
+        self.degrees = array('q')
+        self.capacities = array('q')
+        self.neighbors = array('q')
+        self.edge_count = 0
+        # Slots left behind by rows that were moved to the end of the array
+        self.garbage = 0
+        self._build(edges)
+
+    def _build(self, edges):
+        """Build the CSR arrays in one pass over a sorted edge list."""
+        adjacency = {}
+        for user_id, friend_id in edges:
+            adjacency.setdefault(user_id, set()).add(friend_id)
+
+        for user_id in sorted(adjacency):
+            friends = sorted(adjacency[user_id])
+            self._append_row(user_id, friends)
+            self.edge_count += len(friends)
+
+    def _capacity_for(self, degree):
+        return degree + max(2, int(degree * self.slack))
+
+    def _append_row(self, user_id, friends):
+        """Append a new row (or a relocated one) at the end of the array."""
+        capacity = self._capacity_for(len(friends))
+        row = self.row_of.get(user_id)
+        if row is None:
+            row = len(self.row_ids)
+            self.row_of[user_id] = row
+            self.row_ids.append(user_id)
+            self.offsets.append(0)
+            self.degrees.append(0)
+            self.capacities.append(0)
+        self.offsets[row] = len(self.neighbors)
+        self.degrees[row] = len(friends)
+        self.capacities[row] = capacity
+        self.neighbors.extend(friends)
+        self.neighbors.extend([0] * (capacity - len(friends)))
+        return row
+
+    def neighbors_of(self, user_id):
+        """Return the sorted friend ids of ``user_id`` (empty if unknown)."""
+        row = self.row_of.get(user_id)
+        if row is None:
+            return array('q')
+        start = self.offsets[row]
+        return self.neighbors[start:start + self.degrees[row]]
+
+    def degree(self, user_id):
+        """Return the number of friends of ``user_id``."""
+        row = self.row_of.get(user_id)
+        return 0 if row is None else self.degrees[row]
+
+    def has_edge(self, user_id, friend_id):
+        """Return True if ``friend_id`` is in the friend list of ``user_id``."""
+        row = self.row_of.get(user_id)
+        if row is None:
+            return False
+        start = self.offsets[row]
+        end = start + self.degrees[row]
+        pos = bisect_left(self.neighbors, friend_id, start, end)
+        return pos < end and self.neighbors[pos] == friend_id
+
+    def bitset(self, user_id):
+        """
+        Return the cached friend bitset of a high-degree user.
+
+        Returns:
+            Int bitset of friend ids, or None when the user has fewer than
+            ``dense_degree`` friends
+        """
+        bits = self._bitsets.get(user_id)
+        if bits is None and self.degree(user_id) >= self.dense_degree:
+            bits = self._bitsets[user_id] = to_bitset(self.neighbors_of(user_id))
+        return bits
+
+    def common_neighbors(self, user1_id, user2_id):
+        """Return the sorted friend ids shared by two users."""
+        return intersect(self.neighbors_of(user1_id), self.neighbors_of(user2_id),
+                         self.bitset(user1_id), self.bitset(user2_id))
+
+    def common_count(self, user1_id, user2_id):
+        """Return the number of friends shared by two users."""
+        return intersect_count(self.neighbors_of(user1_id), self.neighbors_of(user2_id),
+                               self.bitset(user1_id), self.bitset(user2_id))
+
+    def add_edge(self, user_id, friend_id):
+        """
+        Insert the edge (user_id -> friend_id).
+
+        Shifts the tail of the row by one slot when the row still has spare
+        capacity; otherwise the row is moved to the end of the array with
+        grown capacity and its old slots are counted as garbage.
+
+        Returns:
+            True if the edge was inserted, False if it already existed
+        """
+        row = self.row_of.get(user_id)
+        if row is None:
+            self._append_row(user_id, [friend_id])
+            self.edge_count += 1
+            return True
+
+        start = self.offsets[row]
+        degree = self.degrees[row]
+        end = start + degree
+        pos = bisect_left(self.neighbors, friend_id, start, end)
+        if pos < end and self.neighbors[pos] == friend_id:
+            return False
+
+        self._bitsets.pop(user_id, None)
+        if degree == self.capacities[row]:
+            friends = self.neighbors[start:end]
+            friends.insert(pos - start, friend_id)
+            self.garbage += self.capacities[row]
+            self._append_row(user_id, friends)
+        else:
+            self.neighbors[pos + 1:end + 1] = self.neighbors[pos:end]
+            self.neighbors[pos] = friend_id
+            self.degrees[row] = degree + 1
+
+        self.edge_count += 1
+        self._maybe_compact()
+        return True
+
+    def remove_edge(self, user_id, friend_id):
+        """
+        Delete the edge (user_id -> friend_id), keeping the row sorted.
+
+        Returns:
+            True if the edge was removed, False if it did not exist
+        """
+        row = self.row_of.get(user_id)
+        if row is None:
+            return False
+
+        start = self.offsets[row]
+        degree = self.degrees[row]
+        end = start + degree
+        pos = bisect_left(self.neighbors, friend_id, start, end)
+        if pos == end or self.neighbors[pos] != friend_id:
+            return False
+
+        self._bitsets.pop(user_id, None)
+        self.neighbors[pos:end - 1] = self.neighbors[pos + 1:end]
+        self.degrees[row] = degree - 1
+        self.edge_count -= 1
+        return True
+
+    def _maybe_compact(self):
+        """Rewrite the neighbor array once relocated rows waste half of it."""
+        if self.garbage * 2 > len(self.neighbors):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the neighbor array without the garbage left by moved rows."""
+        neighbors = array('q')
+        for row in range(len(self.row_ids)):
+            start = self.offsets[row]
+            degree = self.degrees[row]
+            capacity = self._capacity_for(degree)
+            self.offsets[row] = len(neighbors)
+            self.capacities[row] = capacity
+            neighbors.extend(self.neighbors[start:start + degree])
+            neighbors.extend([0] * (capacity - degree))
+        self.neighbors = neighbors
+        self.garbage = 0
+
+    def edges(self):
+        """Yield every (user_id, friend_id) pair, ordered by user then friend."""
+        for user_id in sorted(self.row_of):
+            for friend_id in self.neighbors_of(user_id):
+                yield user_id, friend_id
+
+    def to_csr(self):
+        """
+        Export the graph as compact, read-only CSR arrays.
+
+        Returns:
+            Tuple (vertex_ids, offsets, neighbors) of ``array('q')``: sorted
+            user ids, ``len(vertex_ids) + 1`` row offsets, and the friend ids
+            of every row without spare capacity
+        """
+        vertex_ids = array('q', sorted(self.row_of))
+        offsets = array('q', [0])
+        neighbors = array('q')
+        for user_id in vertex_ids:
+            neighbors.extend(self.neighbors_of(user_id))
+            offsets.append(len(neighbors))
+        return vertex_ids, offsets, neighbors
+
+    def __len__(self):
+        return self.edge_count
+
+
+class CSRView:
+    """
+    Read-only friendship graph over compact CSR arrays.
+
+    Works on any int64 sequences, including ``memoryview`` casts of shared
+    memory or ``mmap`` buffers, so lookups never copy the underlying data.
+
+    Args:
+        vertex_ids: Sorted user ids that own a row
+        offsets: Row offsets into ``neighbors`` (one more than vertex_ids)
+        neighbors: Sorted friend ids of every row, concatenated
+    """
+
+    def __init__(self, vertex_ids, offsets, neighbors):
+        self.vertex_ids = vertex_ids
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    def _row(self, user_id):
+        row = bisect_left(self.vertex_ids, user_id)
+        if row < len(self.vertex_ids) and self.vertex_ids[row] == user_id:
+            return row
+        return None
+
+    def neighbors_of(self, user_id):
+        """Return the sorted friend ids of ``user_id`` as a zero-copy slice."""
+        row = self._row(user_id)
+        if row is None:
+            return self.neighbors[0:0]
+        return self.neighbors[self.offsets[row]:self.offsets[row + 1]]
+
+    def degree(self, user_id):
+        """Return the number of friends of ``user_id``."""
+        row = self._row(user_id)
+        return 0 if row is None else self.offsets[row + 1] - self.offsets[row]
+
+    def has_edge(self, user_id, friend_id):
+        """Return True if ``friend_id`` is in the friend list of ``user_id``."""
+        row = self._row(user_id)
+        if row is None:
+            return False
+        start, end = self.offsets[row], self.offsets[row + 1]
+        pos = bisect_left(self.neighbors, friend_id, start, end)
+        return pos < end and self.neighbors[pos] == friend_id
+
+    def common_neighbors(self, user1_id, user2_id):
+        """Return the sorted friend ids shared by two users."""
+        return intersect(self.neighbors_of(user1_id), self.neighbors_of(user2_id))
+
+    def common_count(self, user1_id, user2_id):
+        """Return the number of friends shared by two users."""
+        return intersect_count(self.neighbors_of(user1_id), self.neighbors_of(user2_id))
+
+    def release(self):
+        """Release memoryviews so the underlying buffer can be closed."""
+        for view in (self.vertex_ids, self.offsets, self.neighbors):
+            if isinstance(view, memoryview):
+                view.release()
+
+    def __len__(self):
+        return len(self.neighbors)
+
+
+# Packed CSR layout (native int64 words):
+#   [vertex_count, edge_count, vertex_ids..., offsets..., neighbors...]
+_WORD = 8
+
+
+def csr_nbytes(vertex_count, edge_count):
+    """Return the size in bytes of a packed CSR block."""
+    return (2 + vertex_count + vertex_count + 1 + edge_count) * _WORD
+
+
+def pack_csr(buffer, vertex_ids, offsets, neighbors, start=0):
+    """
+    Write CSR arrays into ``buffer`` (bytearray, mmap or shared memory).
+
+    Returns:
+        Number of bytes written
+    """
+    words = array('q', [len(vertex_ids), len(neighbors)])
+    end = start
+    for part in (words, vertex_ids, offsets, neighbors):
+        data = part.tobytes()
+        buffer[end:end + len(data)] = data
+        end += len(data)
+    return end - start
+
+
+def unpack_csr(buffer, start=0):
+    """
+    Map a packed CSR block as a zero-copy ``CSRView``.
+
+    ``start`` must be a multiple of 8 so the int64 casts stay aligned.
+    """
+    header = memoryview(buffer)[start:start + 2 * _WORD].cast('q')
+    vertex_count, edge_count = header[0], header[1]
+    header.release()
+
+    words = memoryview(buffer)[start:start + csr_nbytes(vertex_count, edge_count)].cast('q')
+    ids_end = 2 + vertex_count
+    offsets_end = ids_end + vertex_count + 1
+    view = CSRView(words[2:ids_end], words[ids_end:offsets_end], words[offsets_end:])
+    words.release()
+    return view
+
+
+class UserIndex:
+    """
+    Hash index over the ``users`` table keyed by ``id``.
+
+    Args:
+        users: Iterable of user dicts, each with an ``id`` key
+    """
+
+    def __init__(self, users=()):
+        self.by_id = {user['id']: user for user in users}
+
+    def get(self, user_id):
+        """Return the user record for ``user_id`` or None."""
+        return self.by_id.get(user_id)
+
+    def add(self, user):
+        """Insert or replace a user record."""
+        self.by_id[user['id']] = user
+
+    def remove(self, user_id):
+        """Delete a user record; returns True if it existed."""
+        return self.by_id.pop(user_id, None) is not None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
@@ -0,0 +1,278 @@
+"""
+Memory-Mapped Friendship Graph Snapshots
+
+Binary snapshot of a ``FriendshipGraph`` that can be ``mmap``ed and queried
+in place, so a worker starts in milliseconds and every process on the host
+shares one page-cached copy of the graph.
+
+File layout (native int64 words after the header):
+
+    offset 0   header (64 bytes)
+               magic      8s   b'FGSNAP\\x00\\x01'
+               version    <I   SNAPSHOT_VERSION
+               byteorder  =I   0x01020304 in the producer's native order
+               payload    <Q   size of the packed CSR block in bytes
+               crc32      <I   zlib.crc32 of the packed CSR block
+    offset 64  packed CSR block (see ``friendship_graph.pack_csr``):
+               vertex_count, edge_count, vertex_ids, offsets, neighbors
+
+Command line:
+
+    python graph_snapshot.py write  PATH [--users N] [--degree D]
+    python graph_snapshot.py verify PATH
+    python graph_snapshot.py bench  [--users N] [--degree D]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+import zlib
+
+from friendship_graph import FriendshipGraph, csr_nbytes, pack_csr, unpack_csr
+
+MAGIC = b'FGSNAP\x00\x01'
+SNAPSHOT_VERSION = 1
+# Little-endian header; the byte-order mark at offset 12 is written in the
+# producer's native order (see BYTEORDER)
+HEADER = struct.Struct('<8sI4xQI')
+BYTEORDER = struct.Struct('=I')
+BYTEORDER_OFFSET = 12
+HEADER_SIZE = 64
+_BYTEORDER_MARK = 0x01020304
+_SWAPPED_MARK = 0x04030201
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is truncated, corrupted or incompatible."""
+
+
+def write_snapshot(graph, path):
+    """
+    Write ``graph`` to ``path`` as a snapshot file.
+
+    The file is written next to its destination and renamed into place, so
+    readers never observe a partial snapshot.
+
+    Args:
+        graph: FriendshipGraph to serialize
+        path: Destination file path
+
+    Returns:
+        Size of the snapshot in bytes
+    """
+    vertex_ids, offsets, neighbors = graph.to_csr()
+    payload = bytearray(csr_nbytes(len(vertex_ids), len(neighbors)))
+    pack_csr(payload, vertex_ids, offsets, neighbors)
+
+    header = bytearray(HEADER_SIZE)
+    HEADER.pack_into(header, 0, MAGIC, SNAPSHOT_VERSION, len(payload), zlib.crc32(payload))
+    BYTEORDER.pack_into(header, BYTEORDER_OFFSET, _BYTEORDER_MARK)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return HEADER_SIZE + len(payload)
+
+
+def _read_header(buffer, file_size):
+    if file_size < HEADER_SIZE:
+        raise SnapshotError(f"file too small for a snapshot header ({file_size} bytes)")
+    magic, version, payload_size, crc = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a friendship graph snapshot (bad magic)")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    mark = BYTEORDER.unpack_from(buffer, BYTEORDER_OFFSET)[0]
+    if mark != _BYTEORDER_MARK:
+        if mark != _SWAPPED_MARK:
+            raise SnapshotError(f"invalid byte-order mark {mark:#010x}")
+        producer = 'big' if sys.byteorder == 'little' else 'little'
+        raise SnapshotError(f"snapshot was written on a {producer}-endian host, "
+                            f"this host is {sys.byteorder}-endian")
+    if HEADER_SIZE + payload_size != file_size:
+        raise SnapshotError(f"snapshot is truncated or padded "
+                            f"(expected {HEADER_SIZE + payload_size} bytes, got {file_size})")
+    return payload_size, crc
+
+
+def _open_header(f):
+    """Validate the header of open snapshot file ``f`` before it is mapped."""
+    file_size = os.fstat(f.fileno()).st_size
+    return _read_header(f.read(HEADER_SIZE), file_size)
+
+
+def verify_snapshot(path):
+    """
+    Check the header and checksum of a snapshot file.
+
+    Returns:
+        Dict with ``vertex_count``, ``edge_count``, ``bytes`` and the
+        producer's ``byteorder``
+
+    Raises:
+        SnapshotError: If the file is not a valid snapshot
+    """
+    with open(path, 'rb') as f:
+        payload_size, crc = _open_header(f)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with mm:
+        payload = memoryview(mm)[HEADER_SIZE:]
+        try:
+            if zlib.crc32(payload) != crc:
+                raise SnapshotError("snapshot checksum mismatch")
+            view = unpack_csr(payload)
+            counts = {'vertex_count': len(view.vertex_ids), 'edge_count': len(view.neighbors)}
+            view.release()
+        finally:
+            payload.release()
+    counts['bytes'] = HEADER_SIZE + payload_size
+    counts['byteorder'] = sys.byteorder
+    return counts
+
+
+class GraphSnapshot:
+    """
+    Read-only friendship graph served straight from a memory-mapped snapshot.
+
+    Only the header is validated on open; run ``verify_snapshot`` when the
+    file comes from an untrusted or unreliable source.
+
+    Args:
+        path: Snapshot file written by ``write_snapshot``
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = None
+        try:
+            _open_header(self._file)
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.graph = unpack_csr(self._mmap, HEADER_SIZE)
+        except Exception:
+            if self._mmap is not None:
+                self._mmap.close()
+            self._file.close()
+            raise
+
+    def neighbors_of(self, user_id):
+        """Return the sorted friend ids of ``user_id`` (zero-copy)."""
+        return self.graph.neighbors_of(user_id)
+
+    def common_count(self, user1_id, user2_id):
+        """Return the number of friends shared by two users."""
+        return self.graph.common_count(user1_id, user2_id)
+
+    def close(self):
+        """Unmap the snapshot file."""
+        self.graph.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_snapshot(path):
+    """Open a snapshot for zero-copy queries; see ``GraphSnapshot``."""
+    return GraphSnapshot(path)
+
+
+def generate_edges(user_count, degree, seed=42):
+    """Generate ``degree`` random friendships per user, reproducibly."""
+    import random
+    rng = random.Random(seed)
+    return [(user_id, rng.randint(1, user_count))
+            for user_id in range(1, user_count + 1) for _ in range(degree)]
+
+
+def _probe(mode, path, user_count, degree):
+    """Start up one graph in a fresh process and report time and peak RSS."""
+    edges = generate_edges(user_count, degree) if mode != 'snapshot' else None
+    start = time.perf_counter()
+    if mode == 'list-of-dicts':
+        graph = [{'user_id': u, 'friend_id': f} for u, f in edges]
+        probe = len([f for f in graph if f['user_id'] == 1])
+    elif mode == 'csr-build':
+        graph = FriendshipGraph(edges)
+        probe = len(graph.neighbors_of(1))
+    else:
+        graph = load_snapshot(path)
+        probe = len(graph.neighbors_of(1))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'mode': mode, 'startup_ms': elapsed * 1000,
+                      'peak_rss_mb': _peak_rss_mb(), 'probe': probe}))
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process; VmHWM is reset by exec, unlike ru_maxrss."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is reported in kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def benchmark(user_count, degree, path):
+    """Compare startup time and peak RSS of the three ways to get a graph."""
+    write_snapshot(FriendshipGraph(generate_edges(user_count, degree)), path)
+    print(f"STARTUP BENCHMARK: {user_count} users x {degree} friends")
+    print("=" * 60)
+    print(f"{'mode':16} {'startup (ms)':>14} {'peak RSS (MB)':>15}")
+    for mode in ('list-of-dicts', 'csr-build', 'snapshot'):
+        output = subprocess.run(
+            [sys.executable, __file__, '_probe', mode, path,
+             '--users', str(user_count), '--degree', str(degree)],
+            check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        print(f"{mode:16} {result['startup_ms']:14.1f} {result['peak_rss_mb']:15.1f}")
+    print("\nEdge generation is excluded from the timings but included in the")
+    print("RSS of the two build modes, exactly as a process building from rows would pay it.")
+    os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('command', choices=['write', 'verify', 'bench', '_probe'])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--degree', type=int, default=50)
+    options = parser.parse_intermixed_args(argv)
+
+    if options.command == 'write':
+        graph = FriendshipGraph(generate_edges(options.users, options.degree))
+        size = write_snapshot(graph, options.args[0])
+        print(f"Wrote {options.args[0]}: {len(graph)} edges, {size} bytes")
+    elif options.command == 'verify':
+        try:
+            info = verify_snapshot(options.args[0])
+        except SnapshotError as e:
+            print(f"INVALID: {e}")
+            return 1
+        print(f"OK: {info['vertex_count']} users, {info['edge_count']} edges, {info['bytes']} bytes")
+    elif options.command == 'bench':
+        benchmark(options.users, options.degree,
+                  options.args[0] if options.args else 'friendships.snapshot')
+    else:
+        _probe(options.args[0], options.args[1], options.users, options.degree)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
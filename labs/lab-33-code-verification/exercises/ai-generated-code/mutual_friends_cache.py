@@ -0,0 +1,94 @@
+"""
+Mutual Friend Count Cache
+
+Caches ``|friends(a) & friends(b)|`` for hot user pairs on top of a
+``FriendshipGraph``. Entries are evicted least-recently-used once the
+estimated memory footprint exceeds ``max_bytes``.
+
+Adding or removing an edge (u, v) changes the count of a pair (u, x)
+only when x is also friends with v, so the cache updates just the cached
+pairs involving u, with one O(log degree) membership test each, instead of
+dropping or recomputing anything.
+"""
+
+from collections import OrderedDict
+
+# Estimated bytes per cached pair: OrderedDict node, key tuple, two index
+# set entries and the count
+ENTRY_BYTES = 320
+
+
+class MutualFriendsCache:
+    """
+    LRU cache of pairwise mutual-friend counts with incremental maintenance.
+
+    Args:
+        graph: FriendshipGraph the counts are computed from
+        max_bytes: Memory cap for cached entries (default 8 MiB)
+    """
+
+    def __init__(self, graph, max_bytes=8 * 1024 * 1024):
+        self.graph = graph
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self._counts = OrderedDict()
+        self._pairs_by_user = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.updates = 0
+
+    @staticmethod
+    def _key(user1_id, user2_id):
+        return (user1_id, user2_id) if user1_id <= user2_id else (user2_id, user1_id)
+
+    def get(self, user1_id, user2_id):
+        """Return the mutual-friend count of a pair, computing it on a miss."""
+        key = self._key(user1_id, user2_id)
+        count = self._counts.get(key)
+        if count is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return count
+
+        self.misses += 1
+        count = self.graph.common_count(user1_id, user2_id)
+        self._counts[key] = count
+        for user_id in key:
+            self._pairs_by_user.setdefault(user_id, set()).add(key)
+        if len(self._counts) > self.max_entries:
+            self._evict()
+        return count
+
+    def _evict(self):
+        key, _ = self._counts.popitem(last=False)
+        self.evictions += 1
+        for user_id in key:
+            pairs = self._pairs_by_user.get(user_id)
+            if pairs is not None:
+                pairs.discard(key)
+                if not pairs:
+                    del self._pairs_by_user[user_id]
+
+    def _apply(self, user_id, friend_id, delta):
+        for key in self._pairs_by_user.get(user_id, ()):
+            other = key[1] if key[0] == user_id else key[0]
+            # The pair (u, u) counts u's own degree, which always changes
+            if other == user_id or self.graph.has_edge(other, friend_id):
+                self._counts[key] += delta
+                self.updates += 1
+
+    def edge_added(self, user_id, friend_id):
+        """Update cached pairs after the edge (user_id -> friend_id) was added."""
+        self._apply(user_id, friend_id, 1)
+
+    def edge_removed(self, user_id, friend_id):
+        """Update cached pairs after the edge (user_id -> friend_id) was removed."""
+        self._apply(user_id, friend_id, -1)
+
+    def clear(self):
+        """Drop every cached entry."""
+        self._counts.clear()
+        self._pairs_by_user.clear()
+
+    def __len__(self):
+        return len(self._counts)
@@ -0,0 +1,347 @@
+"""
+Fan-Out Notification Dispatcher (SMS + Email)
+
+``send_notification`` used to build a new Twilio client, send the SMS,
+then open a new SMTP session, serially and per customer. The
+``NotificationDispatcher`` sends a message to many customers at once:
+
+    - contacts are fetched once per batch of customers (one query)
+    - each channel (SMS, email) has its own queue and worker threads, so
+      both channels send concurrently
+    - channel clients are reused: one SMS client for all workers, one
+      long-lived SMTP session per email worker thread
+    - a token bucket caps each channel at its provider's rate limit
+
+``FakeSMSClient`` and ``FakeChannel`` are local stand-ins for tests and
+demos; ``EmailChannel`` also works against
+``notification_queue.LocalSMTPServer``.
+
+Example:
+    dispatcher = NotificationDispatcher(repository, {
+        'sms': SMSChannel(twilio_client, '+15555555555'),
+        'email': EmailChannel(smtp_session_factory('smtp.example.com', 587)),
+    }, rates={'sms': 100})
+    report = dispatcher.dispatch(customer_ids, "Your order has shipped")
+"""
+
+from collections import namedtuple
+from email.mime.text import MIMEText
+import queue
+import smtplib
+import threading
+import time
+
+# Worker sentinel
+_STOP = object()
+
+# Per-channel outcome of one dispatch() call
+ChannelReport = namedtuple('ChannelReport', ['sent', 'failed', 'elapsed', 'per_second'])
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate: Sustained operations per second
+        burst: Bucket capacity (default: one second worth of tokens)
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMSChannel:
+    """
+    Send SMS through one shared Twilio-style client.
+
+    Args:
+        client: Object with ``messages.create(to=, from_=, body=)``
+        sender: Sending phone number
+    """
+
+    address_field = 'phone'
+
+    def __init__(self, client, sender):
+        self.client = client
+        self.sender = sender
+
+    def send(self, address, message, subject):
+        self.client.messages.create(to=address, from_=self.sender, body=message)
+
+    def close(self):
+        pass
+
+
+class EmailChannel:
+    """
+    Send email over one long-lived SMTP session per worker thread.
+
+    Args:
+        open_session: Callable returning a connected ``smtplib.SMTP``
+            (see notification_queue.smtp_session_factory)
+        sender: From address
+    """
+
+    address_field = 'email'
+
+    def __init__(self, open_session, sender='noreply@company.com'):
+        self.open_session = open_session
+        self.sender = sender
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.open_session()
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def send(self, address, message, subject):
+        msg = MIMEText(message, 'plain')
+        msg['From'] = self.sender
+        msg['To'] = address
+        msg['Subject'] = subject
+        try:
+            self._session().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Idle session closed by the server: reconnect once
+            self._local.session = None
+            self._session().send_message(msg)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                try:
+                    session.quit()
+                except (smtplib.SMTPException, OSError):
+                    session.close()
+            self._sessions.clear()
+
+
+class _Campaign:
+    def __init__(self, channels):
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.pending = 0
+        self.start = time.perf_counter()
+        self.finished = {name: self.start for name in channels}
+        self.sent = dict.fromkeys(channels, 0)
+        self.failed = dict.fromkeys(channels, 0)
+
+    def complete(self, channel, ok):
+        with self.lock:
+            if ok:
+                self.sent[channel] += 1
+            else:
+                self.failed[channel] += 1
+            self.finished[channel] = time.perf_counter()
+            self.pending -= 1
+            if self.pending == 0:
+                self.done.notify_all()
+
+
+class NotificationDispatcher:
+    """
+    Send one message to many customers over several channels concurrently.
+
+    Args:
+        repository: Object with ``get_contacts(customer_ids)`` (OrderRepository)
+        channels: Dict of channel name -> channel (``send(address, message,
+            subject)`` and an ``address_field`` naming the Contact field)
+        workers: Worker threads per channel (int, or dict by channel name)
+        rates: Dict of channel name -> messages per second (missing = no limit)
+        contact_batch: Customers per contact query
+        queue_size: Capacity of each channel queue
+    """
+
+    def __init__(self, repository, channels, workers=8, rates=None, contact_batch=1_000,
+                 queue_size=10_000):
+        self.repository = repository
+        self.channels = channels
+        self.contact_batch = contact_batch
+        self.limiters = {name: RateLimiter(rate) for name, rate in (rates or {}).items()}
+        self.errors = []
+        self._queues = {name: queue.Queue(queue_size) for name in channels}
+        self._threads = []
+        for name in channels:
+            count = workers.get(name, 8) if isinstance(workers, dict) else workers
+            for i in range(count):
+                thread = threading.Thread(target=self._run, args=(name,),
+                                          name=f'notify-{name}-{i}', daemon=True)
+                thread.start()
+                self._threads.append((name, thread))
+
+    def dispatch(self, customer_ids, message, subject='Notification'):
+        """
+        Send ``message`` to every customer on every channel they have an address for.
+
+        Blocks until all messages of this call are sent or failed.
+
+        Returns:
+            Dict of channel name -> ChannelReport
+        """
+        campaign = _Campaign(self.channels)
+        customer_ids = list(customer_ids)
+        for offset in range(0, len(customer_ids), self.contact_batch):
+            contacts = self.repository.get_contacts(
+                customer_ids[offset:offset + self.contact_batch])
+            for contact in contacts.values():
+                for name, channel in self.channels.items():
+                    address = getattr(contact, channel.address_field)
+                    if not address:
+                        continue
+                    with campaign.lock:
+                        campaign.pending += 1
+                    self._queues[name].put((campaign, address, message, subject))
+
+        with campaign.lock:
+            while campaign.pending:
+                campaign.done.wait()
+        reports = {}
+        for name in self.channels:
+            elapsed = campaign.finished[name] - campaign.start
+            sent = campaign.sent[name]
+            reports[name] = ChannelReport(sent, campaign.failed[name], elapsed,
+                                          sent / elapsed if elapsed > 0 else 0.0)
+        return reports
+
+    def _run(self, name):
+        channel = self.channels[name]
+        limiter = self.limiters.get(name)
+        work_queue = self._queues[name]
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                return
+            campaign, address, message, subject = item
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                channel.send(address, message, subject)
+                ok = True
+            except Exception as error:
+                ok = False
+                if len(self.errors) < 100:
+                    self.errors.append((name, address, error))
+            campaign.complete(name, ok)
+
+    def close(self):
+        """Stop the workers and close the channel clients."""
+        for name, _ in self._threads:
+            self._queues[name].put(_STOP)
+        for _, thread in self._threads:
+            thread.join()
+        for channel in self.channels.values():
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeSMSClient:
+    """
+    Twilio-style client recording messages instead of sending them.
+
+    Args:
+        latency: Seconds each ``messages.create`` call takes
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []
+        self.messages = self
+
+    def create(self, to, from_, body):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent.append((to, body))
+
+
+class FakeChannel:
+    """
+    Channel recording (address, message) pairs instead of sending them.
+
+    Args:
+        address_field: Contact field holding the address ('phone' or 'email')
+        latency: Seconds each send takes
+    """
+
+    def __init__(self, address_field, latency=0.0):
+        self.address_field = address_field
+        self.latency = latency
+        self.sent = []
+
+    def send(self, address, message, subject):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent.append((address, message))
+
+    def close(self):
+        pass
+
+
+# Campaign benchmark against fake backends
+if __name__ == "__main__":
+    import argparse
+
+    from order_repository import OrderRepository
+
+    parser = argparse.ArgumentParser(description="Bulk notification campaign benchmark.")
+    parser.add_argument('--recipients', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--sms-rate', type=float, default=20_000)
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help="seconds per send on the fake backends")
+    options = parser.parse_args()
+
+    repository = OrderRepository.in_memory()
+    repository.add_customers(
+        (i, f"Customer {i}", f"customer{i}@example.com",
+         f"+1555{i:07d}" if i % 4 else None)     # every 4th customer has no phone
+        for i in range(1, options.recipients + 1))
+
+    print("NOTIFICATION CAMPAIGN")
+    print("=" * 50)
+    print(f"{options.recipients} recipients, {options.workers} workers per channel, "
+          f"{options.latency * 1000:.0f} ms per send, SMS limited to {options.sms_rate:.0f}/s\n")
+
+    sms = FakeSMSClient(latency=options.latency)
+    email = FakeChannel('email', latency=options.latency)
+    with NotificationDispatcher(repository, {'sms': SMSChannel(sms, '+15555555555'),
+                                             'email': email},
+                                workers=options.workers,
+                                rates={'sms': options.sms_rate}) as dispatcher:
+        start = time.perf_counter()
+        reports = dispatcher.dispatch(range(1, options.recipients + 1),
+                                      "Our summer sale starts today!")
+        elapsed = time.perf_counter() - start
+
+    for name, report in reports.items():
+        print(f"  {name:6} {report.sent:7d} sent, {report.failed} failed, "
+              f"{report.per_second:8.0f} msg/s")
+    print(f"\n  campaign finished in {elapsed:.1f} s")
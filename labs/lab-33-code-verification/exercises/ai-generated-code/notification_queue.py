@@ -0,0 +1,397 @@
+"""
+Background SMTP Notification Queue
+
+Sending an email with a fresh ``smtplib.SMTP`` session per message pays
+a TCP connect, EHLO, STARTTLS handshake and login on every send. The
+``NotificationQueue`` moves delivery off the caller's path:
+
+    - ``send()`` only enqueues the message and returns
+    - worker threads each keep one long-lived SMTP session open and send
+      whatever is queued in batches over it
+    - transient failures reconnect and retry with exponential backoff;
+      permanent (5xx) rejections go straight to ``failed``
+    - the queue is bounded, so producers block (or get ``QueueFull``)
+      instead of piling up unbounded memory when SMTP falls behind
+
+``LocalSMTPServer`` is a tiny in-process SMTP server for tests and demos.
+
+Example:
+    notifications = NotificationQueue(smtp_session_factory('localhost', 2525))
+    notifications.send(message)
+    notifications.close()       # delivers everything queued, then stops
+"""
+
+import queue
+import smtplib
+import socketserver
+import threading
+import time
+
+# Signals a worker to stop once the messages queued before it are sent
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """Raised when a message cannot be enqueued within the timeout."""
+
+
+def smtp_session_factory(host, port, username=None, password=None, starttls=False,
+                         timeout=30.0):
+    """
+    Return a callable that opens a ready-to-send SMTP session.
+
+    Args:
+        host, port: SMTP server address
+        username, password: Login credentials (skipped when username is None)
+        starttls: Upgrade the session with STARTTLS before login
+        timeout: Socket timeout in seconds
+    """
+    def open_session():
+        session = smtplib.SMTP(host, port, timeout=timeout)
+        try:
+            if starttls:
+                session.starttls()
+            if username is not None:
+                session.login(username, password)
+        except Exception:
+            session.close()
+            raise
+        return session
+    return open_session
+
+
+def _is_permanent(error):
+    """True for SMTP rejections that retrying cannot fix (5xx replies)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class NotificationQueue:
+    """
+    Deliver email messages from a bounded queue over pooled SMTP sessions.
+
+    Args:
+        open_session: Callable returning a connected (and logged in)
+            ``smtplib.SMTP``-like object, e.g. ``smtp_session_factory(...)``
+        sessions: Number of worker threads, each with its own session
+        batch_size: Maximum messages a worker takes from the queue at once
+        max_pending: Queue capacity; beyond it ``send`` applies backpressure
+        max_retries: Attempts after the first before a message is failed
+        backoff: Base retry delay in seconds, doubled on every attempt
+        idle_timeout: Seconds after which an idle session is checked with NOOP
+    """
+
+    def __init__(self, open_session, sessions=2, batch_size=50, max_pending=10_000,
+                 max_retries=3, backoff=0.5, idle_timeout=60.0):
+        self.open_session = open_session
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        # Guards _closed and _sending, so close() can wait for the send()
+        # calls already past the closed check before queueing the stops
+        self._state = threading.Condition()
+        self._closed = False
+        self._sending = 0
+        self.failed = []
+        self.sent = 0
+        self.retries = 0
+        self.connections = 0
+        self.rejected = 0
+        self._workers = [threading.Thread(target=self._run, name=f'smtp-sender-{i}',
+                                          daemon=True)
+                         for i in range(sessions)]
+        for worker in self._workers:
+            worker.start()
+
+    def send(self, message, block=True, timeout=None):
+        """
+        Enqueue an ``email.message.Message`` for delivery and return.
+
+        Args:
+            message: Message with its From/To headers set
+            block: Wait for room when the queue is full
+            timeout: Maximum seconds to wait when blocking (None = forever)
+
+        Raises:
+            QueueFull: The queue stayed full (or ``block`` is False)
+        """
+        with self._state:
+            if self._closed:
+                raise RuntimeError("notification queue is closed")
+            self._sending += 1
+        try:
+            self._queue.put(message, block, timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"{self._queue.maxsize} notifications pending") from None
+        finally:
+            with self._state:
+                self._sending -= 1
+                if not self._sending:
+                    self._state.notify_all()
+
+    def pending(self):
+        """Approximate number of queued, not yet delivered messages."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every message enqueued so far is sent or failed."""
+        self._queue.join()
+
+    def close(self):
+        """Deliver the queued messages, then stop the workers and their sessions."""
+        with self._state:
+            if self._closed:
+                return
+            self._closed = True
+            # Messages must be queued ahead of the stop sentinels
+            while self._sending:
+                self._state.wait()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_batch(self):
+        """Take up to batch_size items; returns (batch, stop)."""
+        item = self._queue.get()
+        if item is _STOP:
+            self._queue.task_done()
+            return [], True
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.task_done()
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        session = None
+        last_used = time.monotonic()
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if not batch:
+                continue
+            if session is not None and time.monotonic() - last_used > self.idle_timeout:
+                session = self._check(session)
+            session = self._deliver(session, batch)
+            last_used = time.monotonic()
+        self._discard(session)
+
+    def _deliver(self, session, batch):
+        """Send a batch over ``session``, reconnecting as needed; returns the session."""
+        for message in batch:
+            try:
+                session = self._send(session, message)
+            finally:
+                # Done even if sending raised, so flush() and close() return
+                self._queue.task_done()
+        return session
+
+    def _send(self, session, message):
+        """Send one message with retries, recording a failure; returns the session."""
+        attempts = 0
+        while True:
+            try:
+                if session is None:
+                    session = self.open_session()
+                    with self._lock:
+                        self.connections += 1
+                session.send_message(message)
+            except (smtplib.SMTPException, OSError) as error:
+                if self._broken(error):
+                    session = self._discard(session)
+                if _is_permanent(error) or attempts >= self.max_retries:
+                    self._fail(message, error)
+                    return session
+                attempts += 1
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempts - 1))
+                continue
+            except Exception as error:
+                # Not an SMTP problem (e.g. a message without recipients):
+                # retrying cannot help, and the session state is unknown
+                self._fail(message, error)
+                return self._discard(session)
+            with self._lock:
+                self.sent += 1
+            return session
+
+    @staticmethod
+    def _broken(error):
+        """True if the session cannot be reused after ``error``."""
+        return (isinstance(error, smtplib.SMTPServerDisconnected)
+                or not isinstance(error, smtplib.SMTPException))
+
+    def _fail(self, message, error):
+        with self._lock:
+            self.failed.append((message, error))
+
+    def _check(self, session):
+        try:
+            session.noop()
+            return session
+        except (smtplib.SMTPException, OSError):
+            return self._discard(session)
+
+    def _discard(self, session):
+        if session is not None:
+            try:
+                session.quit()
+            except Exception:
+                session.close()
+        return None
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP conversation: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connect_delay)
+        self.reply('220 localhost ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command in (b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.receive_data()
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def receive_data(self):
+        server = self.server
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b'.\r\n':
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        with server.lock:
+            server.received += 1
+            fail = server.fail_every and server.received % server.fail_every == 0
+            if not fail:
+                server.messages.append(b''.join(lines))
+        self.reply('451 Try again later' if fail else '250 Message accepted')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    In-process SMTP server on 127.0.0.1 that stores received messages.
+
+    Args:
+        connect_delay: Seconds to stall each new connection (simulates the
+            TCP + TLS handshake of a remote server)
+        fail_every: Answer every n-th DATA with a transient 451 (0 = never)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay=0.0, fail_every=0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.connect_delay = connect_delay
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.received = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Demonstration: per-message sessions vs the background queue
+if __name__ == "__main__":
+    from email.message import EmailMessage
+
+    def confirmation(order_id):
+        message = EmailMessage()
+        message['From'] = 'noreply@company.com'
+        message['To'] = f'customer{order_id}@example.com'
+        message['Subject'] = 'Order Confirmation'
+        message.set_content(f"Your order #{order_id} has been processed.")
+        return message
+
+    count = 300
+    handshake = 0.02
+
+    print("SMTP NOTIFICATION QUEUE")
+    print("=" * 50)
+    print(f"{count} messages, {handshake * 1000:.0f} ms simulated handshake per connection\n")
+
+    with LocalSMTPServer(connect_delay=handshake) as server:
+        start = time.perf_counter()
+        for order_id in range(count):
+            session = smtplib.SMTP('127.0.0.1', server.port)
+            session.send_message(confirmation(order_id))
+            session.quit()
+        elapsed = time.perf_counter() - start
+        print(f"  session per message : {elapsed / count * 1000:7.2f} ms per order on the "
+              f"caller, {server.connections} connections")
+
+    with LocalSMTPServer(connect_delay=handshake, fail_every=50) as server:
+        notifications = NotificationQueue(smtp_session_factory('127.0.0.1', server.port),
+                                          sessions=2, backoff=0.01)
+        start = time.perf_counter()
+        for order_id in range(count):
+            notifications.send(confirmation(order_id))
+        enqueued = time.perf_counter() - start
+        notifications.close()
+        delivered = time.perf_counter() - start
+        print(f"  background queue    : {enqueued / count * 1000:7.2f} ms per order on the "
+              f"caller, {server.connections} connections")
+        print(f"                        all delivered after {delivered:.2f} s: "
+              f"{notifications.sent} sent, {notifications.retries} retried "
+              f"(451 every 50th), {len(notifications.failed)} failed")
@@ -0,0 +1,297 @@
+"""
+Pipelined Order Processor
+
+``OrderProcessor.process_orders`` still runs every order through its
+stages one after the other, so throughput is bounded by the slowest
+external call. ``OrderPipeline`` splits processing into stages connected
+by bounded queues, each served by its own worker pool:
+
+    fetch   -> reader threads load batches of orders with one JOIN
+    handle  -> I/O threads run the per-order side effects (log, email)
+    commit  -> a single DB writer stores receipts and marks orders
+               processed in batched transactions
+
+Every stage retries a failed step with exponential backoff. Fetch and
+commit are safe to repeat: receipts overwrite and the status update can
+be applied twice. The handle stage records which side effects of an
+order already succeeded (see ``OrderProcessor.handle_order``), so a retry
+only repeats the failed ones and never logs or emails an order twice.
+Orders already 'processed' are skipped, and an order id submitted again
+while still in flight is ignored. ``close()`` waits for running
+``submit()`` calls, then drains the pipeline stage by stage, so every
+accepted order is committed or reported as failed.
+
+Example:
+    with OrderPipeline(processor, io_workers=16) as pipeline:
+        pipeline.submit(order_ids)
+    print(pipeline.stats())
+"""
+
+import queue
+import threading
+import time
+
+# Worker sentinel: the upstream stage has drained
+_STOP = object()
+
+
+class OrderPipeline:
+    """
+    Process orders through fetch, handle and commit stages concurrently.
+
+    Args:
+        processor: OrderProcessor providing ``repository``, ``handle_order``
+            and ``commit_orders``
+        fetch_workers: Reader threads
+        io_workers: Threads running the side effects of single orders
+        fetch_batch: Order ids loaded per query
+        commit_batch: Orders per commit transaction
+        commit_interval: Maximum seconds a handled order waits for its commit
+        queue_size: Capacity of each inter-stage queue (backpressure)
+        max_retries: Retries of a failed step before the order is failed
+        backoff: Base retry delay in seconds, doubled on every attempt
+    """
+
+    def __init__(self, processor, fetch_workers=1, io_workers=8, fetch_batch=200,
+                 commit_batch=500, commit_interval=0.05, queue_size=1_000,
+                 max_retries=2, backoff=0.05):
+        self.processor = processor
+        self.fetch_batch = fetch_batch
+        self.commit_batch = commit_batch
+        self.commit_interval = commit_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._closed = False
+        # close() waits on this until no submit() is queueing ids
+        self._submitters = threading.Condition(self._lock)
+        self._submitting = 0
+        self.submitted = 0
+        self.processed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.missing = []
+        self.failed = []
+
+        self._fetch_queue = queue.Queue(queue_size)
+        self._handle_queue = queue.Queue(queue_size)
+        self._commit_queue = queue.Queue(queue_size)
+        self._stages = [
+            (self._fetch_queue, self._start(self._fetch_worker, 'fetch', fetch_workers)),
+            (self._handle_queue, self._start(self._handle_worker, 'handle', io_workers)),
+            (self._commit_queue, self._start(self._commit_worker, 'commit', 1)),
+        ]
+
+    @staticmethod
+    def _start(target, name, count):
+        threads = [threading.Thread(target=target, name=f'order-{name}-{i}', daemon=True)
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def submit(self, order_ids):
+        """
+        Queue order ids for processing; blocks while the fetch queue is full.
+
+        Returns:
+            Number of ids accepted (ids already in flight are ignored)
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("order pipeline is closed")
+            self._submitting += 1
+        try:
+            accepted = 0
+            batch = []
+            for order_id in order_ids:
+                with self._lock:
+                    if order_id in self._inflight:
+                        continue
+                    self._inflight.add(order_id)
+                    self.submitted += 1
+                accepted += 1
+                batch.append(order_id)
+                if len(batch) == self.fetch_batch:
+                    self._fetch_queue.put(batch)
+                    batch = []
+            if batch:
+                self._fetch_queue.put(batch)
+            return accepted
+        finally:
+            with self._lock:
+                self._submitting -= 1
+                if not self._submitting:
+                    self._submitters.notify_all()
+
+    def close(self):
+        """Stop accepting orders, drain every stage in order and stop the workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Batches still being submitted must be queued ahead of _STOP
+            while self._submitting:
+                self._submitters.wait()
+        for work_queue, threads in self._stages:
+            for _ in threads:
+                work_queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        """Return counters and current queue depths as a dict."""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'processed': self.processed,
+                'skipped': self.skipped,
+                'missing': len(self.missing),
+                'failed': len(self.failed),
+                'retries': self.retries,
+                'in_flight': len(self._inflight),
+                'queued': {name: work_queue.qsize() for name, work_queue in
+                           zip(('fetch', 'handle', 'commit'),
+                               (self._fetch_queue, self._handle_queue, self._commit_queue))},
+            }
+
+    def _attempt(self, stage, order_ids, function, *args):
+        """Run ``function(*args)`` with retries; on final failure fail ``order_ids``."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return True, function(*args)
+            except Exception as error:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        for order_id in order_ids:
+                            self.failed.append((order_id, stage, error))
+                            self._inflight.discard(order_id)
+                    return False, None
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _fetch_worker(self):
+        repository = self.processor.repository
+        while True:
+            batch = self._fetch_queue.get()
+            if batch is _STOP:
+                return
+            ok, orders = self._attempt('fetch', batch, repository.get_orders, batch)
+            if not ok:
+                continue
+            for order_id in batch:
+                order = orders.get(order_id)
+                if order is None or order.status == 'processed':
+                    with self._lock:
+                        if order is None:
+                            self.missing.append(order_id)
+                        else:
+                            self.skipped += 1
+                        self._inflight.discard(order_id)
+                    continue
+                self._handle_queue.put(order)
+
+    def _handle_worker(self):
+        while True:
+            order = self._handle_queue.get()
+            if order is _STOP:
+                return
+            # Steps that succeeded are recorded in done and not retried
+            done = set()
+            ok, _ = self._attempt('handle', [order.order_id], self.processor.handle_order,
+                                  order, done)
+            if ok:
+                self._commit_queue.put(order)
+
+    def _commit_worker(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                order = self._commit_queue.get(timeout=timeout)
+            except queue.Empty:
+                order = None
+            if order is not None and order is not _STOP:
+                pending.append(order)
+                if deadline is None:
+                    deadline = time.monotonic() + self.commit_interval
+                if len(pending) < self.commit_batch:
+                    continue
+            if pending:
+                self._commit(pending)
+                pending = []
+            deadline = None
+            if order is _STOP:
+                return
+
+    def _commit(self, orders):
+        order_ids = [order.order_id for order in orders]
+        ok, _ = self._attempt('commit', order_ids, self.processor.commit_orders, orders)
+        if ok:
+            with self._lock:
+                self.processed += len(orders)
+                self._inflight.difference_update(order_ids)
+
+
+# Benchmark: sequential processing vs the pipeline with growing I/O pools
+if __name__ == "__main__":
+    import tempfile
+
+    from order_repository import OrderRepository
+    from receipt_store import SegmentReceiptStore
+    from testability_issue import OrderProcessor
+
+    count = 2_000
+    smtp_latency = 0.005
+
+    class BlockingMailer:
+        """Stand-in for a synchronous SMTP send taking a fixed time."""
+        def send(self, message):
+            time.sleep(smtp_latency)
+
+    class MemoryLog:
+        def __init__(self):
+            self.lines = []
+
+        def write(self, line):
+            self.lines.append(line)
+
+    def build_processor(directory):
+        repository = OrderRepository.in_memory()
+        repository.add_customers((i, f"Customer {i}", f"customer{i}@example.com",
+                                  f"+1555{i:07d}") for i in range(1, 201))
+        repository.add_orders((i, i % 200 + 1, 'pending', 10.0 + i % 90, 1.0, 'FR')
+                              for i in range(1, count + 1))
+        return OrderProcessor(repository, BlockingMailer(), MemoryLog(),
+                              SegmentReceiptStore(directory))
+
+    print("PIPELINED ORDER PROCESSING")
+    print("=" * 50)
+    print(f"{count} orders, {smtp_latency * 1000:.0f} ms blocking email send per order\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        processor = build_processor(directory)
+        result = processor.process_orders(range(1, count + 1))
+        print(f"  sequential        : {result.orders_per_second:8.0f} orders/s")
+        processor.close()
+
+    for io_workers in (1, 4, 16, 64):
+        with tempfile.TemporaryDirectory() as directory:
+            processor = build_processor(directory)
+            start = time.perf_counter()
+            with OrderPipeline(processor, io_workers=io_workers) as pipeline:
+                pipeline.submit(range(1, count + 1))
+            elapsed = time.perf_counter() - start
+            stats = pipeline.stats()
+            print(f"  pipeline, {io_workers:2d} I/O  : {stats['processed'] / elapsed:8.0f} orders/s "
+                  f"({stats['processed']} processed, {stats['failed']} failed)")
+            processor.close()
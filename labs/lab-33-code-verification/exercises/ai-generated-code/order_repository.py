@@ -0,0 +1,152 @@
+"""
+Order Repository
+
+Data access for ``OrderProcessor`` behind one injectable object. All SQL
+is constant and parameterized, runs on pooled connections, and has bulk
+variants: a batch of orders and their customers is fetched with one JOIN,
+and a batch of status updates is applied in one transaction.
+
+For tests, ``OrderRepository.in_memory()`` returns a repository backed by
+a private in-memory SQLite database with the expected schema.
+"""
+
+from collections import namedtuple
+
+from sqlite_pool import ConnectionPool
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS customers (
+           id INTEGER PRIMARY KEY, name TEXT, email TEXT, phone TEXT)""",
+    """CREATE TABLE IF NOT EXISTS orders (
+           id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id),
+           status TEXT, total REAL, weight REAL, destination TEXT)""",
+]
+
+# An order joined with the customer fields order processing needs
+OrderRecord = namedtuple('OrderRecord', [
+    'order_id', 'customer_id', 'status', 'total', 'customer_name', 'customer_email',
+])
+
+Contact = namedtuple('Contact', ['customer_id', 'phone', 'email'])
+
+
+class OrderNotFound(LookupError):
+    """Raised when an order id does not exist."""
+
+
+# SQLite accepts at most 32766 bound parameters per statement
+MAX_BATCH = 32_000
+
+
+def _placeholders(count):
+    return ', '.join('?' * count)
+
+
+class OrderRepository:
+    """
+    Orders and customers stored in SQLite, accessed through a connection pool.
+
+    Args:
+        pool: ConnectionPool for the orders database
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    def in_memory(cls):
+        """Return a repository on a fresh in-memory database (for tests)."""
+        # One connection: every ':memory:' connection is a separate database
+        repository = cls(ConnectionPool(':memory:', size=1))
+        repository.create_schema()
+        return repository
+
+    def create_schema(self):
+        with self.pool.connection() as conn, conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def get_orders(self, order_ids):
+        """
+        Fetch orders with their customer in one JOIN per MAX_BATCH ids.
+
+        Args:
+            order_ids: Iterable of order ids
+
+        Returns:
+            Dict mapping order id to OrderRecord; unknown ids and orders
+            without a customer are omitted
+        """
+        order_ids = list(order_ids)
+        if not order_ids:
+            return {}
+        orders = {}
+        with self.pool.connection() as conn:
+            for start in range(0, len(order_ids), MAX_BATCH):
+                batch = order_ids[start:start + MAX_BATCH]
+                sql = ("SELECT o.id, o.customer_id, o.status, o.total, c.name, c.email "
+                       "FROM orders o JOIN customers c ON c.id = o.customer_id "
+                       f"WHERE o.id IN ({_placeholders(len(batch))})")
+                for row in conn.execute(sql, batch):
+                    orders[row[0]] = OrderRecord(*row)
+        return orders
+
+    def get_order(self, order_id):
+        """Return the OrderRecord of one order, or None."""
+        return self.get_orders([order_id]).get(order_id)
+
+    def mark_processed(self, order_ids):
+        """
+        Set ``status = 'processed'`` for all ``order_ids`` in one transaction.
+
+        Returns:
+            Number of orders updated
+        """
+        with self.pool.connection() as conn, conn:
+            cursor = conn.executemany("UPDATE orders SET status = 'processed' WHERE id = ?",
+                                      ((order_id,) for order_id in order_ids))
+            return cursor.rowcount
+
+    def get_shipping_details(self, order_id):
+        """
+        Return (weight, destination) of an order.
+
+        Raises:
+            OrderNotFound: If there is no order ``order_id``
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT weight, destination FROM orders WHERE id = ?",
+                               (order_id,)).fetchone()
+        if row is None:
+            raise OrderNotFound(f"order {order_id} does not exist")
+        return row
+
+    def get_contacts(self, customer_ids):
+        """
+        Fetch phone and email of many customers with one query.
+
+        Returns:
+            Dict mapping customer id to Contact
+        """
+        customer_ids = list(customer_ids)
+        if not customer_ids:
+            return {}
+        contacts = {}
+        with self.pool.connection() as conn:
+            for start in range(0, len(customer_ids), MAX_BATCH):
+                batch = customer_ids[start:start + MAX_BATCH]
+                sql = (f"SELECT id, phone, email FROM customers "
+                       f"WHERE id IN ({_placeholders(len(batch))})")
+                for row in conn.execute(sql, batch):
+                    contacts[row[0]] = Contact(*row)
+        return contacts
+
+    def add_customers(self, customers):
+        """Insert (id, name, email, phone) rows in one transaction."""
+        with self.pool.connection() as conn, conn:
+            conn.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)", customers)
+
+    def add_orders(self, orders):
+        """Insert (id, customer_id, status, total, weight, destination) rows."""
+        with self.pool.connection() as conn, conn:
+            conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)", orders)
@@ -3,10 +3,25 @@ AI-Generated Code Sample with Performance Issue
 
 Problem: Find common friends between two users in a social network.
 
-This code was generated by an AI assistant but contains serious
-performance anti-patterns that will cause problems at scale.
+The friend lists live in an indexed CSR graph, so one lookup costs
+O(degree) and a two-user intersection O(d1 + d2) (galloping or bitsets
+for skewed or dense lists). Every function issues a constant number of
+batched queries, independent of how many friends are involved:
+
+    find_common_friends          2 queries, O(d1 + d2)
+    get_friend_recommendations   3 queries, O(sum of friend degrees + c log k)
+    get_mutual_friends_count     1 COUNT query (optionally cached)
 """
 
+import re
+import time
+
+from friend_intersection import intersect
+from friendship_graph import FriendshipGraph, UserIndex
+from mutual_friends_cache import MutualFriendsCache
+from scoring import top_scored
+
+
 def get_user_friends(user_id, database):
     """Fetch all friends for a given user from database."""
     query = f"SELECT friend_id FROM friendships WHERE user_id = {user_id}"
@@ -21,186 +36,305 @@ def get_user_details(user_id, database):
     return result[0] if result else None
 
 
+def _id_list(ids):
+    return ', '.join(str(int(i)) for i in ids)
+
+
+def get_friends_many(user_ids, database):
+    """
+    Fetch the friend lists of many users with a single query.
+
+    Args:
+        user_ids: Iterable of user IDs
+        database: Database connection
+
+    Returns:
+        Dict mapping each requested user ID to its sorted list of friend IDs
+        (users without friends map to an empty list)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    friends = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return friends
+    query = (f"SELECT user_id, friend_id FROM friendships "
+             f"WHERE user_id IN ({_id_list(user_ids)}) ORDER BY user_id, friend_id")
+    for row in database.execute(query):
+        friends[row['user_id']].append(row['friend_id'])
+    return friends
+
+
+def get_user_details_many(user_ids, database):
+    """
+    Fetch the records of many users with a single query.
+
+    Args:
+        user_ids: Iterable of user IDs
+        database: Database connection
+
+    Returns:
+        Dict mapping user ID to user record (unknown IDs are omitted)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    query = f"SELECT * FROM users WHERE id IN ({_id_list(user_ids)})"
+    return {user['id']: user for user in database.execute(query)}
+
+
 def find_common_friends(user1_id, user2_id, database):
     """
     Find common friends between two users.
-    
-    PERFORMANCE ISSUE: This implementation has O(n²) complexity and
-    includes N+1 query problems that will crash with large datasets.
-    
+
+    Issues exactly two queries: one batch query for both friend lists and
+    one batch query for the details of the common friends.
+
     Args:
         user1_id: First user ID
         user2_id: Second user ID
         database: Database connection
-        
+
     Returns:
-        List of common friend user objects
+        List of common friend user objects, ordered by user ID
     """
-    # PERFORMANCE ISSUE 1: N+1 query problem
-    # Fetches user1's friends one by one instead of batch query
-    user1_friends = get_user_friends(user1_id, database)
-    user2_friends = get_user_friends(user2_id, database)
-    
-    common_friend_ids = []
-    
-    # PERFORMANCE ISSUE 2: Nested loop with O(n²) complexity
-    # For each friend of user1, loops through ALL friends of user2
-    for friend1 in user1_friends:
-        for friend2 in user2_friends:
-            if friend1 == friend2:
-                common_friend_ids.append(friend1)
-    
-    # PERFORMANCE ISSUE 3: Another N+1 query problem!
-    # Fetches details for each common friend individually
-    # instead of a single batch query
-    common_friends = []
-    for friend_id in common_friend_ids:
-        friend_details = get_user_details(friend_id, database)
-        if friend_details:
-            common_friends.append(friend_details)
-    
-    return common_friends
+    friends = get_friends_many([user1_id, user2_id], database)
+    common_friend_ids = intersect(friends[user1_id], friends[user2_id])
+
+    details = get_user_details_many(common_friend_ids, database)
+    return [details[f] for f in common_friend_ids if f in details]
 
 
-def get_friend_recommendations(user_id, database):
+def _recommendation_scores(user_id, database, deadline):
+    """Count mutual friends for every 2-hop candidate, querying friend lists."""
+    user_friends = get_user_friends(user_id, database)
+    excluded = set(user_friends)
+    excluded.add(user_id)
+
+    friends_of_friends = get_friends_many(user_friends, database)
+
+    scores = {}
+    for friend_id in user_friends:
+        for candidate_id in friends_of_friends[friend_id]:
+            if candidate_id not in excluded:
+                scores[candidate_id] = scores.get(candidate_id, 0) + 1
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+    return scores
+
+
+def get_friend_recommendations(user_id, database, limit=10, time_budget=None,
+                               graph=None, executor=None):
     """
     Recommend potential friends (friends of friends who aren't already friends).
-    
-    PERFORMANCE ISSUE: Extremely inefficient for users with many friends.
+
+    Every 2-hop candidate is scored by its number of mutual friends with the
+    user, counted in a hash map. The best ``limit`` candidates are selected
+    with a bounded heap and only their details are fetched, so a request
+    costs three queries regardless of how many friends the user has.
+
+    Args:
+        user_id: User to recommend friends for
+        database: Database connection
+        limit: Number of recommendations to return (None returns all)
+        time_budget: Optional budget in seconds for scoring; when it runs
+            out, the best candidates scored so far are returned
+        graph: Optional ``sharded_graph.ShardedFriendshipGraph`` holding the
+            friendships; scoring then runs on its shards instead of querying
+            friend lists (``time_budget`` does not apply)
+        executor: Optional ProcessPoolExecutor fanning the sharded scoring
+            out per shard
+
+    Returns:
+        List of user records, each with an added ``mutual_friends`` score,
+        ordered by descending score then ascending user ID
     """
-    # Get user's current friends
-    user_friends = get_user_friends(user_id, database)
-    
-    potential_friends = []
-    
-    # PERFORMANCE ISSUE 4: Triple nested loop! O(n³) complexity!
-    # For large networks, this could iterate millions of times
-    for friend_id in user_friends:
-        friends_of_friend = get_user_friends(friend_id, database)
-        
-        for potential_friend_id in friends_of_friend:
-            # Check if already a friend or already in recommendations
-            is_current_friend = False
-            for existing_friend_id in user_friends:
-                if potential_friend_id == existing_friend_id:
-                    is_current_friend = True
-                    break
-            
-            # PERFORMANCE ISSUE 5: Linear search instead of set lookup
-            is_already_recommended = False
-            for recommended in potential_friends:
-                if recommended == potential_friend_id:
-                    is_already_recommended = True
-                    break
-            
-            if not is_current_friend and not is_already_recommended and potential_friend_id != user_id:
-                # PERFORMANCE ISSUE 6: Another database query in the loop!
-                details = get_user_details(potential_friend_id, database)
-                potential_friends.append(details)
-    
-    return potential_friends
+    if graph is not None:
+        scores = graph.recommendation_scores(user_id, executor)
+    else:
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        scores = _recommendation_scores(user_id, database, deadline)
+
+    top = top_scored(scores, limit)
+
+    details = get_user_details_many([candidate_id for candidate_id, _ in top], database)
+    return [dict(details[candidate_id], mutual_friends=score)
+            for candidate_id, score in top if candidate_id in details]
 
 
 def get_mutual_friends_count(user1_id, user2_id, database):
     """
     Get count of mutual friends between two users.
-    
-    PERFORMANCE ISSUE: Fetches entire datasets just to count.
+
+    Uses a single COUNT query, so neither friend lists nor user records are
+    materialized.
     """
-    # PERFORMANCE ISSUE 7: Loads all data into memory just to count
-    # A simple COUNT query would be much faster
-    common = find_common_friends(user1_id, user2_id, database)
-    return len(common)
+    query = (f"SELECT COUNT(*) AS count FROM friendships f1 "
+             f"JOIN friendships f2 ON f1.friend_id = f2.friend_id "
+             f"WHERE f1.user_id = {user1_id} AND f2.user_id = {user2_id}")
+    result = database.execute(query)
+    return result[0]['count'] if result else 0
 
 
 # Mock database for demonstration
+_USER_ID = re.compile(r'user_id = (-?\d+)')
+_ID = re.compile(r'\bid = (-?\d+)')
+_IN_LIST = re.compile(r'\bIN \(([-\d, ]+)\)')
+_COUNT_COMMON = re.compile(
+    r'COUNT\(\*\).*f1\.user_id = (-?\d+) AND f2\.user_id = (-?\d+)', re.DOTALL)
+_INSERT_FRIENDSHIP = re.compile(
+    r'INSERT INTO friendships \(user_id, friend_id\) VALUES \((-?\d+), (-?\d+)\)')
+_DELETE_FRIENDSHIP = re.compile(
+    r'DELETE FROM friendships WHERE user_id = (-?\d+) AND friend_id = (-?\d+)')
+
+
 class MockDatabase:
-    def __init__(self):
-        # Create test data: 1000 users, each with 50-200 friends
+    """
+    In-memory stand-in for the social network database.
+
+    Friendships live in a CSR ``FriendshipGraph`` and users in a hash
+    ``UserIndex``, so the string ``execute(query)`` interface answers each
+    lookup in O(degree) or O(1) instead of scanning every row.
+
+    COUNT queries for mutual friends are served from a
+    ``MutualFriendsCache`` when ``mutual_cache_bytes`` is set; edge inserts
+    and deletes keep the cached counts up to date.
+
+    Args:
+        users: Optional list of user dicts (default: 1000 generated users)
+        friendships: Optional iterable of (user_id, friend_id) pairs
+            (default: 50-200 random friends for the first 100 users)
+        mutual_cache_bytes: Optional memory cap enabling the mutual-friend
+            count cache
+    """
+
+    def __init__(self, users=None, friendships=None, mutual_cache_bytes=None):
         import random
-        self.users = [{'id': i, 'name': f'User{i}', 'email': f'user{i}@example.com'} 
-                      for i in range(1, 1001)]
-        
-        self.friendships = []
-        for user_id in range(1, 101):  # First 100 users
-            friend_count = random.randint(50, 200)
-            friends = random.sample(range(1, 1001), friend_count)
-            for friend_id in friends:
-                self.friendships.append({'user_id': user_id, 'friend_id': friend_id})
-    
+        if users is None:
+            users = [{'id': i, 'name': f'User{i}', 'email': f'user{i}@example.com'}
+                     for i in range(1, 1001)]
+
+        if friendships is None:
+            friendships = []
+            for user_id in range(1, 101):  # First 100 users
+                friend_count = random.randint(50, 200)
+                friends = random.sample(range(1, 1001), friend_count)
+                for friend_id in friends:
+                    friendships.append((user_id, friend_id))
+
+        self.users = UserIndex(users)
+        self.graph = FriendshipGraph(friendships)
+        self.mutual_cache = None
+        if mutual_cache_bytes is not None:
+            self.mutual_cache = MutualFriendsCache(self.graph, mutual_cache_bytes)
+
+    def add_friendship(self, user_id, friend_id):
+        """Insert one friendship edge without rebuilding the index."""
+        added = self.graph.add_edge(user_id, friend_id)
+        if added and self.mutual_cache is not None:
+            self.mutual_cache.edge_added(user_id, friend_id)
+        return added
+
+    def remove_friendship(self, user_id, friend_id):
+        """Delete one friendship edge without rebuilding the index."""
+        removed = self.graph.remove_edge(user_id, friend_id)
+        if removed and self.mutual_cache is not None:
+            self.mutual_cache.edge_removed(user_id, friend_id)
+        return removed
+
+    def mutual_friends_count(self, user1_id, user2_id):
+        """Count common friends, through the cache when it is enabled."""
+        if self.mutual_cache is not None:
+            return self.mutual_cache.get(user1_id, user2_id)
+        return self.graph.common_count(user1_id, user2_id)
+
     def execute(self, query):
         # Simple query parser for demo
+        match = _INSERT_FRIENDSHIP.search(query)
+        if match:
+            self.add_friendship(int(match.group(1)), int(match.group(2)))
+            return []
+        match = _DELETE_FRIENDSHIP.search(query)
+        if match:
+            self.remove_friendship(int(match.group(1)), int(match.group(2)))
+            return []
+        match = _COUNT_COMMON.search(query)
+        if match:
+            count = self.mutual_friends_count(int(match.group(1)), int(match.group(2)))
+            return [{'count': count}]
+        match = _IN_LIST.search(query)
+        if match:
+            ids = [int(i) for i in match.group(1).split(',')]
+            if 'FROM friendships' in query:
+                return [{'user_id': user_id, 'friend_id': friend_id}
+                        for user_id in sorted(set(ids))
+                        for friend_id in self.graph.neighbors_of(user_id)]
+            users = (self.users.get(user_id) for user_id in ids)
+            return [user for user in users if user]
         if 'FROM friendships' in query:
-            user_id = int(query.split('user_id = ')[1])
-            return [f for f in self.friendships if f['user_id'] == user_id]
+            user_id = int(_USER_ID.search(query).group(1))
+            return [{'user_id': user_id, 'friend_id': friend_id}
+                    for friend_id in self.graph.neighbors_of(user_id)]
         elif 'FROM users' in query:
-            user_id = int(query.split('id = ')[1])
-            return [u for u in self.users if u['id'] == user_id]
+            user_id = int(_ID.search(query).group(1))
+            user = self.users.get(user_id)
+            return [user] if user else []
         return []
 
 
 # Performance demonstration
 if __name__ == "__main__":
-    import time
-    
     print("PERFORMANCE ISSUE DEMONSTRATION")
     print("="*50)
     
     db = MockDatabase()
     
-    print(f"\nTest database:")
-    print(f"  - 1000 users")
-    print(f"  - ~8000 friendships")
-    print(f"  - Average 80 friends per user")
+    print("\nTest database:")
+    print(f"  - {len(db.users)} users")
+    print(f"  - {len(db.graph)} friendships")
+    print("  - 50-200 friends for each of the first 100 users")
     
     # Test 1: Find common friends (small dataset)
     print("\n1. Finding common friends (user 1 and user 2):")
-    start = time.time()
+    start = time.perf_counter()
     common = find_common_friends(1, 2, db)
-    elapsed = time.time() - start
+    elapsed = time.perf_counter() - start
     print(f"   Found {len(common)} common friends")
     print(f"   Time: {elapsed:.4f} seconds")
-    print(f"   Database queries: ~{len(common) + 2} (N+1 problem)")
+    print("   Database queries: 2 (batched)")
     
-    # Test 2: Friend recommendations (very slow)
-    print("\n2. Getting friend recommendations (user 1):")
-    print("   WARNING: This will be VERY slow due to O(n³) complexity...")
-    start = time.time()
-    try:
-        # Set a timeout since this could run for minutes
-        import signal
-        signal.alarm(5)  # 5-second timeout
-        recommendations = get_friend_recommendations(1, db)
-        signal.alarm(0)
-        elapsed = time.time() - start
-        print(f"   Found {len(recommendations)} recommendations")
-        print(f"   Time: {elapsed:.4f} seconds")
-    except:
-        print(f"   TIMEOUT after 5 seconds!")
-        print(f"   This demonstrates catastrophic performance issues")
+    # Test 2: Top-K friend recommendations
+    print("\n2. Getting top 5 friend recommendations (user 1):")
+    print("   Database queries: 3 (batched)")
+    start = time.perf_counter()
+    recommendations = get_friend_recommendations(1, db, limit=5, time_budget=5.0)
+    elapsed = time.perf_counter() - start
+    for user in recommendations:
+        print(f"   {user['name']}: {user['mutual_friends']} mutual friends")
+    print(f"   Time: {elapsed:.4f} seconds")
     
-    # Test 3: Count mutual friends (wasteful)
-    print("\n3. Counting mutual friends (inefficient):")
-    start = time.time()
+    # Test 3: Count mutual friends
+    print("\n3. Counting mutual friends:")
+    start = time.perf_counter()
     count = get_mutual_friends_count(1, 2, db)
-    elapsed = time.time() - start
+    elapsed = time.perf_counter() - start
     print(f"   Count: {count}")
     print(f"   Time: {elapsed:.4f} seconds")
-    print(f"   Note: Loaded all friend data just to count!")
+    print("   Note: Single COUNT query, no user records loaded")
     
     print("\n" + "="*50)
     print("VERIFICATION TASK:")
-    print("1. Identify all O(n²) or worse algorithms")
-    print("2. Find N+1 query problems")
-    print("3. What data structures would improve performance?")
-    print("   Hint: Sets for membership testing O(1) vs O(n)")
-    print("   Hint: Hash maps for lookups")
-    print("   Hint: Batch database queries")
-    print("4. How should this be optimized?")
-    print("   - Use set intersection for common friends: O(n)")
-    print("   - Batch database queries to avoid N+1")
-    print("   - Use COUNT queries instead of fetching data")
-    print("   - Use hash-based lookups instead of nested loops")
-    print("5. Estimate performance with 10,000 users:")
-    print("   Current: Minutes to hours")
-    print("   Optimized: Milliseconds")
+    print("1. Confirm no O(n²) algorithms remain (the original used nested loops)")
+    print("2. Confirm the query counts above do not grow with the number of friends")
+    print("3. Data structures now in use:")
+    print("   - CSR adjacency arrays: friend list lookup in O(degree)")
+    print("   - Hash index on users.id: O(1) user lookups")
+    print("   - Sorted-list merge, galloping or bitsets for intersections")
+    print("4. Optimizations applied:")
+    print("   - Sorted intersection for common friends: O(d1 + d2)")
+    print("   - Batched IN (...) queries instead of N+1")
+    print("   - COUNT queries instead of fetching data")
+    print("   - Hash-based lookups instead of nested loops")
+    print("\nFor scaling numbers across graph sizes and degree distributions, run:")
+    print("   python benchmark_social_graph.py --users 1000 10000 100000 --output results.json")
+    print("\n5. Estimate performance with 10,000 users:")
+    print("   Baseline (nested loops, N+1 queries): minutes to hours")
+    print("   Current (indexed graph, batched queries): milliseconds")
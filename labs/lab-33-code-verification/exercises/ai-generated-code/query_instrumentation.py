@@ -0,0 +1,327 @@
+"""
+Query-Count and Latency Instrumentation for the Database Layer
+
+Wraps ``database.execute`` (the ``MockDatabase`` interface used by
+``performance_issue.py``) and ``sqlite3`` connections (``security_issue.py``,
+``testability_issue.py``) to record, for every query:
+
+    - the call site that issued it (first frame outside this module)
+    - its latency, bucketed into a power-of-two histogram
+    - its shape: the SQL text with literals replaced by ``?``
+
+Inside ``request_profile()`` the same data is collected per logical request
+and repeated same-shape queries are flagged as N+1 suspects.
+
+Example:
+    >>> db = InstrumentedDatabase(MockDatabase())
+    >>> with request_profile('recommendations') as profile:
+    ...     get_friend_recommendations(1, db)
+    >>> print(profile.report())
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?")
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_active_profile = ContextVar('active_profile', default=None)
+
+
+def normalize_query(sql):
+    """Return the shape of a query: literals become ``?``, IN lists ``IN (?)``."""
+    shape = _LITERALS.sub('?', sql)
+    # The remaining passes are rarely needed; skip them on the hot path
+    if '(' in shape:
+        shape = _IN_LIST.sub('IN (?)', shape)
+    if '  ' in shape or '\n' in shape or '\t' in shape:
+        shape = _WHITESPACE.sub(' ', shape).strip()
+    return shape
+
+
+def _call_site():
+    """Describe the first stack frame outside this module as 'file:line func'."""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return '<unknown>'
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"
+
+
+class QueryStats:
+    """
+    Aggregated query counts and latencies.
+
+    ``histogram[b]`` counts queries whose latency in microseconds has
+    bit length ``b``, i.e. bucket b covers [2**(b-1), 2**b) microseconds.
+
+    Safe to share between threads (pool connections, async readers):
+    ``record`` and the read methods hold a lock; use ``snapshot()`` for a
+    consistent copy of the counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.by_site = Counter()
+        self.seconds_by_site = Counter()
+        self.by_shape = Counter()
+        self.histogram = Counter()
+
+    def record(self, site, shape, seconds):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.by_site[site] += 1
+            self.seconds_by_site[site] += seconds
+            self.by_shape[shape] += 1
+            self.histogram[int(seconds * 1e6).bit_length()] += 1
+
+    def reset(self):
+        """Zero every counter."""
+        with self._lock:
+            self._clear()
+
+    def snapshot(self):
+        """Return a ``QueryStats`` copy of the counters taken under the lock."""
+        copy = QueryStats()
+        with self._lock:
+            copy.count = self.count
+            copy.total_seconds = self.total_seconds
+            copy.by_site = Counter(self.by_site)
+            copy.seconds_by_site = Counter(self.seconds_by_site)
+            copy.by_shape = Counter(self.by_shape)
+            copy.histogram = Counter(self.histogram)
+        return copy
+
+    def n_plus_one_suspects(self, threshold):
+        """Return {shape: count} for shapes executed at least ``threshold`` times."""
+        with self._lock:
+            return {shape: count for shape, count in self.by_shape.items()
+                    if count >= threshold}
+
+    def histogram_rows(self):
+        """Return (low_us, high_us, count) for every non-empty latency bucket."""
+        with self._lock:
+            histogram = sorted(self.histogram.items())
+        return [(0 if bucket == 0 else 1 << (bucket - 1), 1 << bucket, count)
+                for bucket, count in histogram]
+
+
+class RequestProfile(QueryStats):
+    """
+    Queries issued inside one ``request_profile()`` block.
+
+    Args:
+        name: Label of the logical request
+        n_plus_one_threshold: Same-shape query count flagged as N+1
+    """
+
+    def __init__(self, name, n_plus_one_threshold=5):
+        super().__init__()
+        self.name = name
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.elapsed_seconds = 0.0
+
+    @property
+    def n_plus_one(self):
+        return self.n_plus_one_suspects(self.n_plus_one_threshold)
+
+    def report(self):
+        """Return a human-readable summary of the request."""
+        stats = self.snapshot()
+        lines = [f"Request '{self.name}': {stats.count} queries, "
+                 f"{stats.total_seconds * 1000:.2f} ms in database "
+                 f"of {self.elapsed_seconds * 1000:.2f} ms total"]
+        lines.append("  Queries by call site:")
+        for site, count in stats.by_site.most_common():
+            lines.append(f"    {count:6d}  {stats.seconds_by_site[site] * 1000:9.2f} ms  {site}")
+        lines.append("  Latency histogram:")
+        for low, high, count in stats.histogram_rows():
+            lines.append(f"    {low:>8}-{high:<8} us  {count}")
+        for shape, count in stats.n_plus_one_suspects(self.n_plus_one_threshold).items():
+            lines.append(f"  N+1 SUSPECT ({count}x): {shape}")
+        return '\n'.join(lines)
+
+
+# Process-wide totals across all requests
+global_stats = QueryStats()
+
+
+def _record(sql, seconds):
+    site = _call_site()
+    shape = normalize_query(sql)
+    global_stats.record(site, shape, seconds)
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.record(site, shape, seconds)
+
+
+@contextmanager
+def request_profile(name, n_plus_one_threshold=5):
+    """
+    Collect the queries of one logical request.
+
+    Yields:
+        RequestProfile that is complete once the block exits
+    """
+    profile = RequestProfile(name, n_plus_one_threshold)
+    token = _active_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.elapsed_seconds = time.perf_counter() - start
+        _active_profile.reset(token)
+
+
+class InstrumentedDatabase:
+    """
+    Wrap any object exposing ``execute(query)`` and record every call.
+
+    Other attributes are forwarded to the wrapped database.
+    """
+
+    def __init__(self, database):
+        self._database = database
+
+    def execute(self, query):
+        start = time.perf_counter()
+        try:
+            return self._database.execute(query)
+        finally:
+            _record(query, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+
+class InstrumentedCursor:
+    """
+    ``sqlite3.Cursor`` wrapper recording ``execute``/``executemany``.
+    Attribute writes such as ``row_factory`` are forwarded to the real
+    cursor.
+    """
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, parameters)
+        finally:
+            _record(sql, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_parameters)
+        finally:
+            _record(sql, time.perf_counter() - start)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+class InstrumentedConnection:
+    """
+    ``sqlite3.Connection`` wrapper whose cursors and shortcut ``execute``
+    calls are recorded. Attribute writes such as ``row_factory`` are
+    forwarded to the real connection.
+    """
+
+    def __init__(self, connection):
+        object.__setattr__(self, '_connection', connection)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+def instrumented_connect(*args, **kwargs):
+    """Drop-in replacement for ``sqlite3.connect`` returning a recorded connection."""
+    return InstrumentedConnection(sqlite3.connect(*args, **kwargs))
+
+
+def instrument_sqlite(module):
+    """
+    Route the ``connect`` hook of ``security_issue`` or ``testability_issue``
+    through ``instrumented_connect``.
+
+    Returns:
+        The previous connection factory, to restore with
+        ``module.connect = previous``
+    """
+    previous = module.connect
+    module.connect = instrumented_connect
+    # Pooled connections were opened by the previous factory; start afresh
+    if hasattr(module, 'close_pool'):
+        module.close_pool()
+    return previous
+
+
+# Demonstration
+if __name__ == "__main__":
+    from performance_issue import MockDatabase, get_friend_recommendations, get_user_friends
+
+    db = InstrumentedDatabase(MockDatabase())
+
+    print("QUERY INSTRUMENTATION DEMONSTRATION")
+    print("=" * 50)
+
+    with request_profile('get_friend_recommendations') as profile:
+        get_friend_recommendations(1, db)
+    print(profile.report())
+
+    print()
+    with request_profile('naive friends-of-friends') as profile:
+        for friend_id in get_user_friends(1, db):
+            get_user_friends(friend_id, db)
+    print(profile.report())
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        db.execute("SELECT * FROM users WHERE id = 1")
+    per_call = (time.perf_counter() - start) / 10_000
+    print(f"\nInstrumented execute(): {per_call * 1e6:.1f} us per call including the query")
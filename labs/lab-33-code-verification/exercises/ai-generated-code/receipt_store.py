@@ -0,0 +1,362 @@
+"""
+Receipt Store Backends
+
+Writing one small ``order_{id}.txt`` file per order creates millions of
+tiny files: one inode, directory entry and open/close per receipt. This
+module stores receipts behind one interface with three backends:
+
+    - ``SegmentReceiptStore``: records appended to large segment files,
+      with an in-memory order id -> (segment, offset) index rebuilt by
+      scanning and checksumming the records on open
+    - ``SQLiteReceiptStore``: one BLOB row per receipt in an SQLite table
+    - ``FileReceiptStore``: the original file-per-receipt layout
+
+Every backend has ``put_many(receipts)`` for batch writes (one write call
+or one transaction per batch), ``put``, ``get(order_id)`` for random
+reads and ``close``. Writing a receipt again replaces the earlier one.
+
+Example:
+    store = open_receipt_store('segment', '/var/receipts')
+    store.put_many([(42, format_receipt(order))])
+    store.get(42)
+"""
+
+import os
+import re
+import struct
+import threading
+import zlib
+
+from sqlite_pool import ConnectionPool
+
+# Segment record header: order id, payload length, crc32 of the payload
+RECORD = struct.Struct('<qII')
+SEGMENT_SUFFIX = '.seg'
+_SEGMENT_NAME = re.compile(r'(\d+)' + re.escape(SEGMENT_SUFFIX))
+_RECEIPT_NAME = re.compile(r'order_-?\d+\.txt')
+
+
+def format_receipt(order):
+    """Return the receipt text of an OrderRecord."""
+    return (f"Order ID: {order.order_id}\n"
+            f"Customer: {order.customer_name}\n"
+            f"Total: ${order.total}\n")
+
+
+def _encode(receipts):
+    for order_id, text in receipts:
+        yield order_id, text.encode('utf-8') if isinstance(text, str) else bytes(text)
+
+
+class SegmentReceiptStore:
+    """
+    Append-only segment files with an order id -> offset index.
+
+    Opening the store checks every record against its crc32. In the last
+    segment, a torn or corrupt record (crash mid-write) and everything after
+    it are truncated away; in earlier segments it raises ValueError. A
+    failed write is truncated off the segment before the error propagates,
+    so the file and the index stay in step. Replaced receipts stay in their
+    segment until it is deleted; there is no compaction.
+
+    Args:
+        directory: Directory holding the ``*.seg`` files (created if missing)
+        segment_bytes: Start a new segment once the active one reaches this size
+        sync: fsync after every batch (durable, but much slower)
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, sync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._index = {}
+        self._readers = {}
+        segments = sorted(int(match.group(1)) for match in map(_SEGMENT_NAME.fullmatch,
+                                                               os.listdir(directory))
+                          if match)
+        for number in segments:
+            self._scan(number, last=number == segments[-1])
+        self._active = segments[-1] if segments else 1
+        # Unbuffered: a failed write leaves no bytes behind in a buffer
+        self._writer = open(self._path(self._active), 'ab', buffering=0)
+        self._size = self._writer.seek(0, os.SEEK_END)
+
+    def _path(self, number):
+        return os.path.join(self.directory, f"{number:06d}{SEGMENT_SUFFIX}")
+
+    def _scan(self, number, last):
+        """Index every record of one segment whose checksum matches."""
+        path = self._path(number)
+        end = os.path.getsize(path)
+        offset = 0
+        with open(path, 'rb') as f:
+            while offset + RECORD.size <= end:
+                order_id, length, crc = RECORD.unpack(f.read(RECORD.size))
+                if offset + RECORD.size + length > end:
+                    break
+                if zlib.crc32(f.read(length)) != crc:
+                    break
+                self._index[order_id] = (number, offset + RECORD.size, length)
+                offset += RECORD.size + length
+        if offset != end:
+            if not last:
+                raise ValueError(f"corrupt receipt segment {path} at offset {offset}")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+
+    def put_many(self, receipts):
+        """
+        Append (order_id, text) receipts with one write per segment touched.
+
+        Returns:
+            Number of receipts written
+        """
+        count = 0
+        with self._lock:
+            chunks = []
+            pending = []
+            position = self._size
+            for order_id, payload in _encode(receipts):
+                if position > 0 and position + RECORD.size + len(payload) > self.segment_bytes:
+                    self._append(chunks, pending)
+                    self._roll()
+                    chunks, pending, position = [], [], 0
+                chunks.append(RECORD.pack(order_id, len(payload), zlib.crc32(payload)))
+                chunks.append(payload)
+                pending.append((order_id, position + RECORD.size, len(payload)))
+                position += RECORD.size + len(payload)
+                count += 1
+            self._append(chunks, pending)
+        return count
+
+    def _append(self, chunks, pending):
+        if not chunks:
+            return
+        data = memoryview(b''.join(chunks))
+        try:
+            written = 0
+            while written < len(data):
+                written += self._writer.write(data[written:])
+            if self.sync:
+                os.fsync(self._writer.fileno())
+        except BaseException:
+            # Drop the partial write so offsets computed from _size stay valid
+            os.ftruncate(self._writer.fileno(), self._size)
+            raise
+        self._size += len(data)
+        for order_id, offset, length in pending:
+            self._index[order_id] = (self._active, offset, length)
+
+    def _roll(self):
+        writer = open(self._path(self._active + 1), 'ab', buffering=0)
+        self._writer.close()
+        self._writer = writer
+        self._active += 1
+        self._size = 0
+
+    def put(self, order_id, text):
+        self.put_many([(order_id, text)])
+
+    def get(self, order_id):
+        """Return the receipt text of ``order_id``, or None."""
+        with self._lock:
+            location = self._index.get(order_id)
+            if location is None:
+                return None
+            number, offset, length = location
+            reader = self._readers.get(number)
+            if reader is None:
+                reader = self._readers[number] = open(self._path(number), 'rb')
+            reader.seek(offset - RECORD.size)
+            header = reader.read(RECORD.size)
+            payload = reader.read(length)
+        if zlib.crc32(payload) != RECORD.unpack(header)[2]:
+            raise ValueError(f"receipt {order_id} failed its checksum")
+        return payload.decode('utf-8')
+
+    def __contains__(self, order_id):
+        return order_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        with self._lock:
+            self._writer.close()
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLiteReceiptStore:
+    """
+    Receipts as BLOB rows of a ``receipts`` table.
+
+    Args:
+        database: SQLite database path
+        pool_size: Pooled connections for concurrent readers
+    """
+
+    def __init__(self, database, pool_size=4):
+        self.pool = ConnectionPool(database, size=pool_size)
+        with self.pool.connection() as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS receipts "
+                         "(order_id INTEGER PRIMARY KEY, body BLOB NOT NULL)")
+
+    def put_many(self, receipts):
+        """Insert or replace (order_id, text) receipts in one transaction."""
+        rows = list(_encode(receipts))
+        with self.pool.connection() as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO receipts VALUES (?, ?)", rows)
+        return len(rows)
+
+    def put(self, order_id, text):
+        self.put_many([(order_id, text)])
+
+    def get(self, order_id):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT body FROM receipts WHERE order_id = ?",
+                               (order_id,)).fetchone()
+        return None if row is None else bytes(row[0]).decode('utf-8')
+
+    def __contains__(self, order_id):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM receipts WHERE order_id = ?",
+                                (order_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM receipts").fetchone()[0]
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FileReceiptStore:
+    """
+    One ``order_{id}.txt`` file per receipt (the original layout).
+
+    Args:
+        directory: Directory holding the receipt files (created if missing)
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, order_id):
+        return os.path.join(self.directory, f'order_{order_id}.txt')
+
+    def put_many(self, receipts):
+        count = 0
+        for order_id, payload in _encode(receipts):
+            with open(self._path(order_id), 'wb') as f:
+                f.write(payload)
+            count += 1
+        return count
+
+    def put(self, order_id, text):
+        self.put_many([(order_id, text)])
+
+    def get(self, order_id):
+        try:
+            with open(self._path(order_id), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, order_id):
+        return os.path.exists(self._path(order_id))
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if _RECEIPT_NAME.fullmatch(name))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+RECEIPT_BACKENDS = {
+    'segment': SegmentReceiptStore,
+    'sqlite': SQLiteReceiptStore,
+    'file': FileReceiptStore,
+}
+
+
+def open_receipt_store(backend, path, **options):
+    """
+    Open a receipt store by backend name.
+
+    Args:
+        backend: 'segment', 'sqlite' or 'file'
+        path: Directory (segment, file) or database path (sqlite)
+        options: Extra backend arguments, e.g. segment_bytes=...
+    """
+    try:
+        factory = RECEIPT_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"unknown receipt backend {backend!r}; "
+                         f"choose from {sorted(RECEIPT_BACKENDS)}") from None
+    return factory(path, **options)
+
+
+# Benchmark: batch writes and random reads per backend
+if __name__ == "__main__":
+    import argparse
+    import random
+    import tempfile
+    import time
+    from order_repository import OrderRecord
+
+    parser = argparse.ArgumentParser(description="Benchmark receipt store backends.")
+    parser.add_argument('--receipts', type=int, default=50_000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--reads', type=int, default=20_000)
+    options = parser.parse_args()
+
+    receipts = [(i, format_receipt(OrderRecord(i, i % 1000, 'processed', 10.0 + i % 90,
+                                               f"Customer {i % 1000}", '')))
+                for i in range(1, options.receipts + 1)]
+    lookups = random.Random(1).choices(range(1, options.receipts + 1), k=options.reads)
+
+    print("RECEIPT STORE BACKENDS")
+    print("=" * 50)
+    print(f"{options.receipts} receipts in batches of {options.batch}, "
+          f"{options.reads} random reads\n")
+
+    for backend in ('file', 'segment', 'sqlite'):
+        with tempfile.TemporaryDirectory() as directory:
+            path = directory if backend != 'sqlite' else os.path.join(directory, 'receipts.db')
+            store = open_receipt_store(backend, path)
+            start = time.perf_counter()
+            for offset in range(0, len(receipts), options.batch):
+                store.put_many(receipts[offset:offset + options.batch])
+            write = time.perf_counter() - start
+            start = time.perf_counter()
+            for order_id in lookups:
+                store.get(order_id)
+            read = time.perf_counter() - start
+            assert store.get(lookups[0]) == receipts[lookups[0] - 1][1]
+            store.close()
+            files = sum(len(names) for _, _, names in os.walk(directory))
+            print(f"  {backend:8} write {len(receipts) / write:9.0f}/s   "
+                  f"read {len(lookups) / read:9.0f}/s   {files} files")
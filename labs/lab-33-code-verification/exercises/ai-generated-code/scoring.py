@@ -0,0 +1,36 @@
+"""
+Recommendation Ranking
+
+Candidates are ranked by mutual-friend score, highest first, with ties
+broken by the lowest user ID. The in-process
+(``performance_issue.get_friend_recommendations``) and sharded
+(``sharded_graph.ShardedFriendshipGraph``) recommenders both rank here, so
+they return identical orderings.
+"""
+
+import heapq
+
+
+def by_score(item):
+    """Rank (candidate_id, score) pairs by score, then by lowest user ID."""
+    candidate_id, score = item
+    return score, -candidate_id
+
+
+def top_scored(scores, limit=None):
+    """
+    Return the best (candidate_id, score) pairs of ``scores``, best first.
+
+    Args:
+        scores: Dict mapping candidate id to score
+        limit: Number of pairs to return (None returns all); selected with a
+            bounded heap
+
+    Raises:
+        ValueError: If ``limit`` is negative
+    """
+    if limit is None:
+        return sorted(scores.items(), key=by_score, reverse=True)
+    if limit < 0:
+        raise ValueError(f"limit must be None or >= 0, got {limit}")
+    return heapq.nlargest(limit, scores.items(), key=by_score)
@@ -3,134 +3,310 @@ AI-Generated Code Sample with Security Issue
 
 Problem: User search functionality for an admin dashboard.
 
-This code was generated by an AI assistant but contains a critical
-SQL injection vulnerability.
+This code was generated by an AI assistant. Its SQL injection flaws
+have been fixed: every query is a constant SQL text with the search term,
+role filter and user id bound as parameters, and LIKE wildcards in the
+search term are escaped, so user input is always matched as literal
+text. Access control is still missing (see ``get_user_details``).
 """
 
+from collections import namedtuple
 import sqlite3
+import threading
 
-def search_users(search_term, role_filter=None):
+from sqlite_pool import ConnectionPool
+import user_search_index
+
+# Connection factory used by the query functions. Replace it (for example
+# with query_instrumentation.instrumented_connect) to observe every query.
+connect = sqlite3.connect
+
+DATABASE_PATH = 'users.db'
+
+# Constant SQL texts: each pooled connection compiles them once and then
+# reuses the prepared statement for every call
+SEARCH_SQL = ("SELECT id, name, email, role FROM users "
+              "WHERE (name LIKE ? ESCAPE '\\' "
+              "OR email LIKE ? ESCAPE '\\')")
+SEARCH_BY_ROLE_SQL = SEARCH_SQL + " AND role = ?"
+USER_DETAILS_SQL = "SELECT * FROM users WHERE id = ?"
+# Keyset pagination: resume after the last id seen instead of OFFSET
+SEARCH_PAGE_SQL = SEARCH_SQL + " AND id > ? ORDER BY id LIMIT ?"
+SEARCH_PAGE_BY_ROLE_SQL = (SEARCH_BY_ROLE_SQL
+                           + " AND id > ? ORDER BY id LIMIT ?")
+
+# Lightweight, immutable row for streamed results (no per-row dict)
+UserRow = namedtuple('UserRow', ['id', 'name', 'email', 'role'])
+
+
+def _user_row(cursor, row):
+    return UserRow(*row)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _connect(*args, **kwargs):
+    # Look up the hook at call time so a replaced factory is honoured
+    return connect(*args, **kwargs)
+
+
+def configure_pool(database=DATABASE_PATH, size=4, pragmas=None):
+    """
+    Replace the shared connection pool used by the query functions.
+
+    Args:
+        database: SQLite database path
+        size: Maximum number of pooled connections
+        pragmas: PRAGMA overrides,
+            e.g. {'cache_size': -262144, 'mmap_size': 0}
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(database, size=size, pragmas=pragmas,
+                               connect=_connect)
+        return _pool
+
+
+def close_pool():
+    """Close the shared pool; the next query opens a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use."""
+    global _pool
+    pool = _pool
+    if pool is None:
+        # Double-checked: only one of several first callers builds the pool
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_PATH, connect=_connect)
+            pool = _pool
+    return pool
+
+
+def _like_pattern(term):
+    """Match ``term`` as a literal substring, escaping LIKE wildcards."""
+    escaped = (term.replace('\\', '\\\\')
+               .replace('%', '\\%').replace('_', '\\_'))
+    return f"%{escaped}%"
+
+
+def search_users(search_term, role_filter=None, pool=None):
     """
     Search for users in the database by name or email.
-    
+
     Args:
         search_term: String to search for in user names or emails
         role_filter: Optional role to filter by ('admin', 'user', 'guest')
-        
+        pool: ConnectionPool to query (default: the shared ``get_pool()``)
+
     Returns:
         List of matching user records
-        
+
     Examples:
         >>> search_users("john")
-        [{'id': 1, 'name': 'John Doe', 'email': 'john@example.com', 'role': 'user'}]
+        [{'id': 1, 'name': 'John Doe', 'email': 'john@example.com',
+          'role': 'user'}]
         >>> search_users("admin", role_filter="admin")
-        [{'id': 2, 'name': 'Admin User', 'email': 'admin@example.com', 'role': 'admin'}]
+        [{'id': 2, 'name': 'Admin User', 'email': 'admin@example.com',
+          'role': 'admin'}]
     """
-    # Connect to database
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # SECURITY ISSUE: SQL Injection vulnerability
-    # Building SQL query with string concatenation instead of parameterized queries
-    query = f"SELECT id, name, email, role FROM users WHERE name LIKE '%{search_term}%' OR email LIKE '%{search_term}%'"
-    
-    # SECURITY ISSUE 2: Additional vulnerability in role filter
+    pattern = _like_pattern(search_term)
+    if role_filter:
+        sql, params = SEARCH_BY_ROLE_SQL, (pattern, pattern, role_filter)
+    else:
+        sql, params = SEARCH_SQL, (pattern, pattern)
+
+    with (pool or get_pool()).connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        try:
+            cursor.execute(sql, params)
+            results = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+
+    return [{'id': row['id'], 'name': row['name'], 'email': row['email'],
+             'role': row['role']}
+            for row in results]
+
+
+def search_users_indexed(search_term, role_filter=None, limit=50, pool=None):
+    """
+    Ranked search for users through the FTS5 trigram index.
+
+    Same matching rules as ``search_users`` (case-insensitive substring of
+    name or email), but answered from ``users_fts`` instead of a full table
+    scan, best matches first. Terms shorter than three characters cannot
+    use the trigram index and fall back to ``search_users``.
+
+    Requires ``user_search_index.create_search_index`` to have been run
+    once on the database.
+
+    Args:
+        search_term: String to search for in user names or emails
+        role_filter: Optional role to filter by ('admin', 'user', 'guest')
+        limit: Maximum number of results (None for all)
+        pool: ConnectionPool to query (default: the shared ``get_pool()``)
+
+    Returns:
+        List of matching user records, best match first
+    """
+    if len(search_term) < user_search_index.MIN_TERM_LENGTH:
+        results = search_users(search_term, role_filter, pool)
+        return results if limit is None else results[:limit]
+
+    with (pool or get_pool()).connection() as conn:
+        rows = user_search_index.search(conn, search_term, role_filter,
+                                        -1 if limit is None else limit)
+    return [{'id': user_id, 'name': name, 'email': email, 'role': role}
+            for user_id, name, email, role in rows]
+
+
+def search_users_page(search_term, role_filter=None, after_id=0, limit=100,
+                      pool=None):
+    """
+    Fetch one page of ``search_users`` results, ordered by id.
+
+    Args:
+        search_term: String to search for in user names or emails
+        role_filter: Optional role to filter by
+        after_id: Return only users with an id greater than this
+        limit: Maximum number of rows in the page
+        pool: ConnectionPool to query (default: the shared ``get_pool()``)
+
+    Returns:
+        Tuple (rows, next_after_id): list of UserRow, and the ``after_id``
+        for the next page, or None when this was the last page
+
+    Raises:
+        ValueError: If ``limit`` is less than 1
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+    pattern = _like_pattern(search_term)
     if role_filter:
-        query += f" AND role = '{role_filter}'"
-    
-    # SECURITY ISSUE 3: No input validation or sanitization
-    # An attacker could inject: "' OR '1'='1" to bypass filters
-    # Or: "'; DROP TABLE users; --" to delete data
-    
-    try:
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        # Convert to list of dicts
-        users = []
-        for row in results:
-            users.append({
-                'id': row['id'],
-                'name': row['name'],
-                'email': row['email'],
-                'role': row['role']
-            })
-        
-        return users
-    
-    except Exception as e:
-        # SECURITY ISSUE 4: Exposing internal error details
-        print(f"Database error: {e}")
-        print(f"Query was: {query}")  # Leaking query structure
-        return []
-    
-    finally:
-        conn.close()
-
-
-def get_user_details(user_id):
+        sql = SEARCH_PAGE_BY_ROLE_SQL
+        params = (pattern, pattern, role_filter, after_id, limit)
+    else:
+        sql, params = SEARCH_PAGE_SQL, (pattern, pattern, after_id, limit)
+
+    with (pool or get_pool()).connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = _user_row
+        rows = cursor.execute(sql, params).fetchall()
+
+    next_after_id = rows[-1].id if len(rows) == limit else None
+    return rows, next_after_id
+
+
+def iter_search_users(search_term, role_filter=None, after_id=0, limit=None,
+                      batch_size=500, pool=None):
+    """
+    Stream ``search_users`` results in id order, one batch at a time.
+
+    Each batch is a separate keyset query, so at most ``batch_size`` rows
+    are in memory at once and no pooled connection is held between
+    batches.
+
+    Args:
+        search_term: String to search for in user names or emails
+        role_filter: Optional role to filter by
+        after_id: Start after this user id (resume a previous stream)
+        limit: Maximum total number of rows to yield (None for all)
+        batch_size: Rows fetched per query
+        pool: ConnectionPool to query (default: the shared ``get_pool()``)
+
+    Yields:
+        UserRow tuples
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        rows, after_id = search_users_page(search_term, role_filter,
+                                           after_id, size, pool)
+        yield from rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if after_id is None:
+            return
+
+
+def get_user_details(user_id, pool=None):
     """
     Get detailed information for a specific user.
-    
-    SECURITY ISSUE 5: No authentication/authorization check
+
+    SECURITY ISSUE: No authentication/authorization check
     Anyone can access any user's details
+
+    Args:
+        user_id: Id of the user
+        pool: ConnectionPool to query (default: the shared ``get_pool()``)
     """
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    # SECURITY ISSUE 6: Another SQL injection point
-    query = f"SELECT * FROM users WHERE id = {user_id}"
-    
-    cursor.execute(query)
-    result = cursor.fetchone()
-    conn.close()
-    
-    return result
+    with (pool or get_pool()).connection() as conn:
+        return conn.execute(USER_DETAILS_SQL, (user_id,)).fetchone()
 
 
-# Demonstration of vulnerabilities
+# Demonstration: injection attempts are matched as literal text
 if __name__ == "__main__":
-    print("SECURITY VULNERABILITY DEMONSTRATION")
-    print("="*50)
-    
+    print("SECURITY DEMONSTRATION")
+    print("=" * 50)
+
     # Setup test database
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
     cursor.execute('''CREATE TABLE IF NOT EXISTS users
-                     (id INTEGER PRIMARY KEY, name TEXT, email TEXT, role TEXT)''')
+                     (id INTEGER PRIMARY KEY, name TEXT, email TEXT,
+                      role TEXT)''')
     cursor.execute("DELETE FROM users")  # Clear existing
-    cursor.execute("INSERT INTO users VALUES (1, 'John Doe', 'john@example.com', 'user')")
-    cursor.execute("INSERT INTO users VALUES (2, 'Jane Admin', 'jane@example.com', 'admin')")
-    cursor.execute("INSERT INTO users VALUES (3, 'Bob Guest', 'bob@example.com', 'guest')")
+    cursor.executemany("INSERT INTO users VALUES (?, ?, ?, ?)", [
+        (1, 'John Doe', 'john@example.com', 'user'),
+        (2, 'Jane Admin', 'jane@example.com', 'admin'),
+        (3, 'Bob Guest', 'bob@example.com', 'guest'),
+    ])
     conn.commit()
+    user_search_index.create_search_index(conn)
     conn.close()
-    
+
     # Normal usage
     print("\n1. Normal search:")
     results = search_users("John")
     print(f"   Results: {results}")
-    
-    # SQL Injection Attack 1: Bypass filters
-    print("\n2. SQL Injection - Bypass filter:")
+    print(f"   Indexed: {search_users_indexed('john')}")
+
+    # Filter bypass attempt
+    print("\n2. Injection attempt - bypass filter:")
     malicious_input = "' OR '1'='1"
     results = search_users(malicious_input)
     print(f"   Input: {malicious_input}")
-    print(f"   Results (should be empty, returns all): {len(results)} users")
-    
-    # SQL Injection Attack 2: Union-based injection
-    print("\n3. SQL Injection - Union attack:")
-    union_attack = "' UNION SELECT id, 'HACKED', email, role FROM users WHERE '1'='1"
-    try:
-        results = search_users(union_attack)
-        print(f"   Attack succeeded: {results}")
-    except Exception as e:
-        print(f"   Attack caused error: {e}")
-    
-    print("\n" + "="*50)
+    print(f"   Results (bound as a parameter, expected 0): {len(results)}")
+
+    # Union-based attempt
+    print("\n3. Injection attempt - union:")
+    union_attack = ("' UNION SELECT id, 'HACKED', email, role FROM users "
+                    "WHERE '1'='1")
+    results = search_users(union_attack)
+    print(f"   Results (bound as a parameter, expected []): {results}")
+
+    # LIKE wildcards are escaped too
+    print("\n4. Wildcard input:")
+    print(f"   search_users('%') returns {len(search_users('%'))} users "
+          "(only names or emails containing a literal '%')")
+
+    print("\n" + "=" * 50)
     print("VERIFICATION TASK:")
-    print("1. Identify all SQL injection vulnerabilities")
-    print("2. What input validation is missing?")
-    print("3. What security best practices are violated?")
-    print("4. How should parameterized queries be used?")
+    print("1. Check that every query binds user input as a parameter")
+    print("2. Why must the LIKE pattern escape '%', '_' and '\\'?")
+    print("3. What authorization check is missing in get_user_details?")
+    print("4. What does a database error reveal to the caller?")
     print("5. What other security issues exist?")
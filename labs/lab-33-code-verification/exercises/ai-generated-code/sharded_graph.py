@@ -0,0 +1,238 @@
+"""
+Sharded Friendship Graph with Process-Pool Query Fan-out
+
+Hash-partitions the friendship table by ``user_id`` into N shards. Each
+shard is a packed CSR block (see ``friendship_graph.pack_csr``) stored in
+``multiprocessing.shared_memory``, so worker processes attach to the same
+physical pages instead of receiving a pickled copy of the graph.
+
+Two ways to use a ``ProcessPoolExecutor``:
+
+    - ``recommend(user_id, executor=...)`` fans the 2-hop expansion of a
+      single user out per shard and merges the partial scores
+    - ``recommend_many(user_ids, executor=...)`` spreads whole requests
+      across workers; this is the mode whose throughput scales with cores
+
+``performance_issue.get_friend_recommendations(..., graph=sharded)``
+scores candidates on the shards and fetches only the winners' details.
+Both rank candidates with ``scoring.top_scored``.
+
+Pool workers attach to the shards on first use and detach when the pool
+shuts its workers down.
+
+Run this module directly for a throughput benchmark.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+
+from friendship_graph import FriendshipGraph, csr_nbytes, pack_csr, unpack_csr
+from scoring import top_scored
+
+# Shards attached by the current (worker) process, keyed by segment name
+_ATTACHED = {}
+
+
+def _attach(names):
+    """Return CSR views of the named shards, attaching on first use."""
+    views = []
+    for name in names:
+        entry = _ATTACHED.get(name)
+        if entry is None:
+            if not _ATTACHED:
+                # Runs when the worker process exits, e.g. on pool shutdown
+                util.Finalize(None, _detach_all, exitpriority=10)
+            # Pool workers share the parent's resource tracker, so attaching
+            # here does not schedule a second unlink of the segment
+            segment = shared_memory.SharedMemory(name=name)
+            entry = _ATTACHED[name] = (segment, unpack_csr(segment.buf))
+        views.append(entry[1])
+    return views
+
+
+def _detach_all():
+    """Release and close every shard attached by this process."""
+    while _ATTACHED:
+        _, (segment, view) = _ATTACHED.popitem()
+        view.release()
+        segment.close()
+
+
+def _count_two_hop(shards, friend_ids, excluded):
+    """Count friends-of-friends reached through ``friend_ids``."""
+    num_shards = len(shards)
+    scores = {}
+    for friend_id in friend_ids:
+        for candidate_id in shards[friend_id % num_shards].neighbors_of(friend_id):
+            if candidate_id not in excluded:
+                scores[candidate_id] = scores.get(candidate_id, 0) + 1
+    return scores
+
+
+def _recommend(shards, user_id, limit):
+    num_shards = len(shards)
+    friend_ids = shards[user_id % num_shards].neighbors_of(user_id).tolist()
+    excluded = set(friend_ids)
+    excluded.add(user_id)
+    scores = _count_two_hop(shards, friend_ids, excluded)
+    return top_scored(scores, limit)
+
+
+def _scores_task(names, friend_ids, excluded):
+    return _count_two_hop(_attach(names), friend_ids, excluded)
+
+
+def _recommend_task(names, user_ids, limit):
+    shards = _attach(names)
+    return [_recommend(shards, user_id, limit) for user_id in user_ids]
+
+
+class ShardedFriendshipGraph:
+    """
+    Friendship graph hash-partitioned across shared-memory CSR shards.
+
+    User ``u`` lives in shard ``u % num_shards``. The creating process owns
+    the shared memory segments; call ``close()`` (or use the instance as a
+    context manager) to release and unlink them.
+
+    Args:
+        edges: Iterable of (user_id, friend_id) pairs
+        num_shards: Number of partitions (default 8)
+    """
+
+    def __init__(self, edges, num_shards=8):
+        self.num_shards = num_shards
+        partitions = [[] for _ in range(num_shards)]
+        for user_id, friend_id in edges:
+            partitions[user_id % num_shards].append((user_id, friend_id))
+
+        self._segments = []
+        self.shards = []
+        for partition in partitions:
+            vertex_ids, offsets, neighbors = FriendshipGraph(partition).to_csr()
+            size = csr_nbytes(len(vertex_ids), len(neighbors))
+            segment = shared_memory.SharedMemory(create=True, size=size)
+            pack_csr(segment.buf, vertex_ids, offsets, neighbors)
+            self._segments.append(segment)
+            self.shards.append(unpack_csr(segment.buf))
+        self.names = tuple(segment.name for segment in self._segments)
+
+    def shard_of(self, user_id):
+        """Return the shard index owning ``user_id``."""
+        return user_id % self.num_shards
+
+    def neighbors_of(self, user_id):
+        """Return the sorted friend ids of ``user_id``."""
+        return self.shards[self.shard_of(user_id)].neighbors_of(user_id)
+
+    def recommendation_scores(self, user_id, executor=None):
+        """
+        Count mutual friends for every 2-hop candidate of ``user_id``.
+
+        With an executor, the user's friends are grouped by owning shard and
+        each group is expanded in a worker; partial score maps are summed.
+
+        Returns:
+            Dict mapping candidate id to mutual-friend count
+        """
+        friend_ids = self.neighbors_of(user_id).tolist()
+        excluded = set(friend_ids)
+        excluded.add(user_id)
+        if executor is None:
+            return _count_two_hop(self.shards, friend_ids, excluded)
+
+        groups = [[] for _ in range(self.num_shards)]
+        for friend_id in friend_ids:
+            groups[self.shard_of(friend_id)].append(friend_id)
+        futures = [executor.submit(_scores_task, self.names, group, excluded)
+                   for group in groups if group]
+
+        scores = {}
+        for future in futures:
+            for candidate_id, count in future.result().items():
+                scores[candidate_id] = scores.get(candidate_id, 0) + count
+        return scores
+
+    def recommend(self, user_id, limit=10, executor=None):
+        """
+        Return the top ``limit`` (candidate_id, mutual_friends) pairs, or
+        all of them when ``limit`` is None.
+
+        Ranked like ``get_friend_recommendations``: descending score, then
+        ascending user ID.
+        """
+        scores = self.recommendation_scores(user_id, executor)
+        return top_scored(scores, limit)
+
+    def recommend_many(self, user_ids, limit=10, executor=None, chunk_size=64):
+        """
+        Answer many recommendation requests, one chunk of users per task.
+
+        Returns:
+            List of ``recommend`` results in the order of ``user_ids``
+        """
+        user_ids = list(user_ids)
+        if executor is None:
+            return [_recommend(self.shards, user_id, limit) for user_id in user_ids]
+
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        futures = [executor.submit(_recommend_task, self.names, chunk, limit)
+                   for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+    def close(self):
+        """Release the views and unlink the shared memory segments."""
+        for view in self.shards:
+            view.release()
+        self.shards = []
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Throughput benchmark
+if __name__ == "__main__":
+    import os
+    import random
+    import time
+
+    random.seed(42)
+    user_count = 200_000
+    print("SHARDED GRAPH THROUGHPUT")
+    print("=" * 50)
+    print(f"Building graph: {user_count} users, ~20 friends each...")
+    edges = [(user_id, random.randint(1, user_count))
+             for user_id in range(1, user_count + 1) for _ in range(20)]
+
+    cpu_count = os.cpu_count() or 1
+    queries = random.sample(range(1, user_count + 1), 2_000)
+    with ShardedFriendshipGraph(edges, num_shards=max(8, cpu_count)) as graph:
+        del edges
+        start = time.perf_counter()
+        baseline = graph.recommend_many(queries)
+        serial = len(queries) / (time.perf_counter() - start)
+        print(f"\n  in-process: {serial:10.0f} requests/s")
+
+        workers = 1
+        while workers <= cpu_count:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                graph.recommend_many(queries[:workers * 64], executor=executor)  # warm up
+                start = time.perf_counter()
+                results = graph.recommend_many(queries, executor=executor)
+                elapsed = time.perf_counter() - start
+            assert results == baseline
+            rate = len(queries) / elapsed
+            print(f"  {workers:3d} workers: {rate:9.0f} requests/s ({rate / serial:.2f}x)")
+            workers *= 2
+
+        with ProcessPoolExecutor(max_workers=cpu_count) as executor:
+            user_id = queries[0]
+            assert graph.recommend(user_id, executor=executor) == baseline[0]
+            print(f"\n  per-shard fan-out for user {user_id} matches in-process result")
@@ -0,0 +1,392 @@
+"""
+Cached, Batched Shipping Quotes
+
+``calculate_shipping_cost`` used to make one blocking HTTPS request per
+order, on a new connection every time, although many orders repeat a
+(weight, destination) pair. ``ShippingQuoteService`` fixes this in
+three steps:
+
+    - quotes are cached by a normalized key (destination upper-cased;
+      the exact weight, or the weight rounded up to the carrier's
+      pricing bracket when ``bucket`` is set) for ``ttl`` seconds
+    - concurrent misses are collected for up to ``batch_window`` seconds
+      and sent as one upstream batch request; concurrent callers asking
+      for the same key share one pending result
+    - ``ShippingAPI`` keeps one keep-alive HTTP connection per thread
+      (``http.client``) instead of reconnecting for every request
+
+``StubShippingServer`` is a local HTTP server implementing the API for
+tests and demos.
+
+API (JSON over POST):
+    /calculate        {"weight": 2.5, "destination": "FR"} -> {"cost": 7.5}
+    /calculate/batch  {"quotes": [{...}, ...]}              -> {"costs": [...]}
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class ShippingAPIError(Exception):
+    """Raised when the shipping API answers with an error status."""
+
+
+def quote_key(weight, destination, bucket=None):
+    """
+    Normalize a quote request to its cache key.
+
+    With ``bucket`` set, the weight is rounded up to the next multiple of
+    ``bucket`` kilograms and that weight is what gets quoted. Only use the
+    bracket the carrier itself prices by: then every weight in a bracket
+    costs the same and the rounding does not change any price.
+
+    Returns:
+        (weight, normalized destination) tuple
+    """
+    if bucket:
+        weight = math.ceil(weight / bucket) * bucket
+    return (float(weight), destination.strip().upper())
+
+
+class ShippingAPI:
+    """
+    Client of the shipping API over persistent HTTP/1.1 connections.
+
+    Args:
+        base_url: e.g. 'https://api.shippingcompany.com'
+        api_key: Value of the API-Key header
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, base_url, api_key=None, timeout=10.0):
+        parts = urlsplit(base_url)
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = []
+        self.requests = 0
+        self.connections = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connection_class(self.host, timeout=self.timeout)
+            with self._lock:
+                self._open.append(conn)
+                self.connections += 1
+        return conn
+
+    def _post(self, path, payload):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['API-Key'] = self.api_key
+        # Quotes are safe to resend: retry once on a connection the
+        # server closed while it sat idle in keep-alive
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request('POST', self.prefix + path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+                continue
+            with self._lock:
+                self.requests += 1
+            if response.status != 200:
+                raise ShippingAPIError(f"{path}: HTTP {response.status} {data[:200]!r}")
+            return json.loads(data)
+
+    def quote(self, weight, destination):
+        """Return the cost of one shipment."""
+        return self._post('/calculate', {'weight': weight, 'destination': destination})['cost']
+
+    def quote_many(self, keys):
+        """Return the costs of many (weight, destination) pairs with one request."""
+        quotes = [{'weight': weight, 'destination': destination} for weight, destination in keys]
+        return self._post('/calculate/batch', {'quotes': quotes})['costs']
+
+    def close(self):
+        """Close the connections of every thread."""
+        with self._lock:
+            for conn in self._open:
+                conn.close()
+            self._open.clear()
+
+
+class _Batch:
+    def __init__(self):
+        self.keys = []
+        self.full = threading.Event()
+
+
+class ShippingQuoteService:
+    """
+    Cache and batch shipping quotes in front of a ShippingAPI.
+
+    The first caller missing the cache becomes the batch leader: it waits
+    up to ``batch_window`` seconds (less once ``max_batch`` keys are
+    queued), then sends every queued key in one upstream request.
+
+    Args:
+        api: Object with ``quote_many(keys) -> costs`` (e.g. ShippingAPI)
+        ttl: Seconds a quote stays cached
+        bucket: Carrier pricing bracket in kilograms; weights are rounded
+            up to it before quoting (None quotes the exact weight)
+        batch_window: Seconds to collect concurrent misses
+        max_batch: Maximum keys per upstream request
+        max_entries: Maximum cached quotes (least recently used evicted)
+    """
+
+    def __init__(self, api, ttl=300.0, bucket=None, batch_window=0.005, max_batch=100,
+                 max_entries=10_000):
+        self.api = api
+        self.ttl = ttl
+        self.bucket = bucket
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._batch = _Batch()
+        self._latencies = deque(maxlen=10_000)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_keys = 0
+
+    def quote(self, weight, destination):
+        """Return the shipping cost for ``weight`` kg to ``destination``."""
+        start = time.perf_counter()
+        key = quote_key(weight, destination, self.bucket)
+        leader = None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                self._latencies.append(time.perf_counter() - start)
+                return entry[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                batch = self._batch
+                batch.keys.append(key)
+                if len(batch.keys) == 1:
+                    leader = batch
+                if len(batch.keys) >= self.max_batch:
+                    self._batch = _Batch()
+                    batch.full.set()
+
+        if leader is not None:
+            self._dispatch(leader)
+        cost = future.result()
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return cost
+
+    def _dispatch(self, batch):
+        batch.full.wait(self.batch_window)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = _Batch()
+            keys = batch.keys
+        try:
+            costs = self.api.quote_many(keys)
+            if len(costs) != len(keys):
+                raise ShippingAPIError(f"expected {len(keys)} costs, got {len(costs)}")
+        except Exception as error:
+            with self._lock:
+                futures = [self._inflight.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(error)
+            return
+
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_keys += len(keys)
+            futures = []
+            for key, cost in zip(keys, costs):
+                self._cache[key] = (expires, cost)
+                self._cache.move_to_end(key)
+                futures.append(self._inflight.pop(key))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        for future, cost in zip(futures, costs):
+            future.set_result(cost)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Close the upstream API's connections."""
+        close = getattr(self.api, 'close', None)
+        if close is not None:
+            close()
+
+    def metrics(self):
+        """
+        Return a dict of counters, cache hit rate, mean upstream batch size
+        and p50/p99 ``quote()`` latency in milliseconds.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'upstream_calls': self.upstream_calls,
+                'mean_batch': self.upstream_keys / self.upstream_calls if self.upstream_calls else 0.0,
+                'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+            }
+
+
+# The stub carrier prices by 0.5 kg bracket, like real carriers
+STUB_BRACKET = 0.5
+
+
+def _stub_cost(quote):
+    weight = math.ceil(float(quote['weight']) / STUB_BRACKET) * STUB_BRACKET
+    return round(4.0 + 1.5 * weight + (len(quote['destination']) % 5), 2)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+        if self.path.endswith('/calculate/batch'):
+            result = {'costs': [_stub_cost(quote) for quote in payload['quotes']]}
+        elif self.path.endswith('/calculate'):
+            result = {'cost': _stub_cost(payload)}
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubShippingServer(ThreadingHTTPServer):
+    """
+    Local shipping API on 127.0.0.1 with a fixed per-request latency,
+    pricing by STUB_BRACKET weight brackets.
+
+    Args:
+        latency: Seconds each request takes to answer
+    """
+
+    daemon_threads = True
+    # listen() backlog: the default of 5 resets connections when many
+    # clients connect at once (the benchmark opens one per order)
+    request_queue_size = 128
+
+    def __init__(self, latency=0.02):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+# Benchmark: one request per order vs the cached, batched service
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    import random
+
+    orders = 2_000
+    threads = 16
+    rng = random.Random(7)
+    destinations = ['FR', 'DE', 'ES', 'IT', 'US', 'GB', 'NL', 'BE']
+    shipments = [(round(rng.uniform(0.1, 10.0), 2), rng.choice(destinations))
+                 for _ in range(orders)]
+
+    print("SHIPPING QUOTES")
+    print("=" * 50)
+    print(f"{orders} orders on {threads} threads, 20 ms API latency\n")
+
+    with StubShippingServer(latency=0.02) as server:
+        def naive(shipment):
+            conn = http.client.HTTPConnection(server.server_address[0],
+                                              server.server_address[1])
+            conn.request('POST', '/calculate',
+                         json.dumps({'weight': shipment[0], 'destination': shipment[1]}),
+                         {'Content-Type': 'application/json'})
+            cost = json.loads(conn.getresponse().read())['cost']
+            conn.close()
+            return cost
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(naive, shipments))
+        elapsed = time.perf_counter() - start
+        print(f"  request per order : {orders / elapsed:8.0f} quotes/s, "
+              f"{server.requests} requests, {server.connections} connections")
+
+    with StubShippingServer(latency=0.02) as server:
+        # Bucketing by the carrier's own bracket keeps every price exact
+        service = ShippingQuoteService(ShippingAPI(server.url), bucket=STUB_BRACKET)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(lambda shipment: service.quote(*shipment), shipments))
+        elapsed = time.perf_counter() - start
+        metrics = service.metrics()
+        print(f"  quote service     : {orders / elapsed:8.0f} quotes/s, "
+              f"{server.requests} requests, {server.connections} connections")
+        print(f"                      hit rate {metrics['hit_rate']:.0%}, "
+              f"{metrics['coalesced']} coalesced, mean batch {metrics['mean_batch']:.1f}, "
+              f"p50 {metrics['p50_ms']:.2f} ms, p99 {metrics['p99_ms']:.2f} ms")
+        service.close()
@@ -0,0 +1,91 @@
+"""Tests for the coalescing, cached async user queries."""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from async_user_queries import AsyncUserQueries
+import security_issue
+
+
+@pytest.fixture
+def users_db(tmp_path):
+    path = str(tmp_path / 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, role TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)", [
+        (1, 'John Doe', 'john@example.com', 'user'),
+        (2, 'Jane Admin', 'jane@example.com', 'admin'),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_identical_reads_are_coalesced_and_cached(users_db):
+    queries = AsyncUserQueries(users_db, cache_ttl=60)
+
+    async def scenario():
+        first = await asyncio.gather(*(queries.get_user_details(1) for _ in range(5)))
+        again = await queries.get_user_details(1)
+        return first, again
+
+    try:
+        first, again = asyncio.run(scenario())
+    finally:
+        queries.close()
+    assert all(row[1] == 'John Doe' for row in first) and again[1] == 'John Doe'
+    assert queries.calls == 1
+    assert queries.coalesced + queries.cache_hits == 5
+
+
+def test_read_overlapping_a_write_is_not_cached(users_db, monkeypatch):
+    queries = AsyncUserQueries(users_db, cache_ttl=60)
+    original = security_issue.get_user_details
+    release = threading.Event()
+    calls = []
+
+    def gated_details(user_id, pool=None):
+        row = original(user_id, pool)
+        calls.append(row)
+        if len(calls) == 1:
+            release.wait(5)     # hold the pre-write read in flight
+        return row
+
+    monkeypatch.setattr(security_issue, 'get_user_details', gated_details)
+
+    async def scenario():
+        stale = asyncio.create_task(queries.get_user_details(1))
+        while not calls:
+            await asyncio.sleep(0.001)
+        await queries.execute_write("UPDATE users SET name = ? WHERE id = ?", ('Renamed', 1))
+        # Must not join the pre-write read still in flight
+        fresh = await queries.get_user_details(1)
+        release.set()
+        old = await stale
+        # The pre-write result must not have been cached
+        after = await queries.get_user_details(1)
+        return old, fresh, after
+
+    try:
+        old, fresh, after = asyncio.run(scenario())
+    finally:
+        release.set()
+        queries.close()
+    assert old[1] == 'John Doe'
+    assert fresh[1] == 'Renamed'
+    assert after[1] == 'Renamed'
+
+
+def test_instances_leave_the_shared_pool_alone(users_db):
+    shared = security_issue.configure_pool(users_db)
+    try:
+        queries = AsyncUserQueries(users_db)
+        asyncio.run(queries.search_users('john'))
+        queries.close()
+        assert security_issue.get_pool() is shared
+        assert security_issue.search_users('jane')[0]['id'] == 2
+    finally:
+        security_issue.close_pool()
@@ -0,0 +1,46 @@
+"""Tests for the adaptive friend-list intersection engine."""
+
+from array import array
+import random
+
+import pytest
+
+import friend_intersection
+from friend_intersection import (bitset_ids, choose_strategy, gallop_count, intersect,
+                                 intersect_count, to_bitset)
+
+
+def sorted_sample(rng, universe, size):
+    return array('q', sorted(rng.sample(range(universe), size)))
+
+
+@pytest.mark.parametrize('size_a, size_b', [(0, 10), (50, 60), (20, 5000), (3000, 40)])
+def test_every_strategy_matches_set_intersection(size_a, size_b):
+    rng = random.Random(size_a * 31 + size_b)
+    a, b = sorted_sample(rng, 20_000, size_a), sorted_sample(rng, 20_000, size_b)
+    expected = sorted(set(a) & set(b))
+    assert intersect(a, b) == expected
+    assert intersect(a, b, to_bitset(a), to_bitset(b)) == expected
+    assert intersect_count(a, b) == len(expected)
+    assert intersect_count(a, b, to_bitset(a), to_bitset(b)) == len(expected)
+    small, large = sorted((a, b), key=len)
+    assert gallop_count(small, large) == len(expected)
+
+
+def test_skewed_count_gallops_without_building_the_list(monkeypatch):
+    rng = random.Random(7)
+    small, large = sorted_sample(rng, 100_000, 20), sorted_sample(rng, 100_000, 20_000)
+    assert choose_strategy(len(small), len(large)) == 'gallop'
+
+    def fail(*args):
+        raise AssertionError("intersect_count built the result list")
+
+    monkeypatch.setattr(friend_intersection, 'gallop_intersect', fail)
+    assert intersect_count(small, large) == len(set(small) & set(large))
+
+
+def test_bitset_round_trip_and_negative_ids():
+    assert bitset_ids(to_bitset([0, 7, 8, 1000])) == [0, 7, 8, 1000]
+    assert to_bitset([]) == 0
+    with pytest.raises(ValueError):
+        to_bitset([3, -1])
@@ -0,0 +1,115 @@
+"""Tests for the CSR FriendshipGraph against a set-based reference."""
+
+import random
+
+from friendship_graph import CSRView, FriendshipGraph, UserIndex, csr_nbytes, pack_csr, unpack_csr
+
+
+def reference_of(edges):
+    adjacency = {}
+    for user_id, friend_id in edges:
+        adjacency.setdefault(user_id, set()).add(friend_id)
+    return adjacency
+
+
+def assert_matches(graph, reference):
+    assert len(graph) == sum(len(friends) for friends in reference.values())
+    assert list(graph.edges()) == [(user_id, friend_id) for user_id in sorted(reference)
+                                   for friend_id in sorted(reference[user_id])]
+    for user_id, friends in reference.items():
+        assert list(graph.neighbors_of(user_id)) == sorted(friends)
+        assert graph.degree(user_id) == len(friends)
+
+
+def random_edges(rng, count, users=30):
+    return [(rng.randint(1, users), rng.randint(1, users)) for _ in range(count)]
+
+
+def test_build_deduplicates_and_sorts_rows():
+    graph = FriendshipGraph([(2, 9), (1, 5), (2, 3), (1, 5), (1, 4)])
+    assert_matches(graph, {1: {4, 5}, 2: {3, 9}})
+    assert graph.has_edge(2, 3) and not graph.has_edge(3, 2)
+    assert list(graph.neighbors_of(404)) == [] and graph.degree(404) == 0
+
+
+def test_random_inserts_and_deletes_match_a_set_reference():
+    rng = random.Random(7)
+    edges = random_edges(rng, 200)
+    graph = FriendshipGraph(edges, slack=0)
+    reference = reference_of(edges)
+
+    for user_id, friend_id in random_edges(rng, 3000):
+        friends = reference.setdefault(user_id, set())
+        if rng.random() < 0.6:
+            assert graph.add_edge(user_id, friend_id) == (friend_id not in friends)
+            friends.add(friend_id)
+        else:
+            assert graph.remove_edge(user_id, friend_id) == (friend_id in friends)
+            friends.discard(friend_id)
+        assert graph.has_edge(user_id, friend_id) == (friend_id in friends)
+
+    assert_matches(graph, reference)
+
+
+def test_relocated_rows_are_compacted():
+    graph = FriendshipGraph([(1, 2)], slack=0)
+    reference = {1: {2}}
+    for friend_id in range(3, 200):
+        graph.add_edge(1, friend_id)
+        graph.add_edge(friend_id, 1)
+        reference[1].add(friend_id)
+        reference[friend_id] = {1}
+        # Compaction runs as soon as garbage exceeds half the array
+        assert graph.garbage * 2 <= len(graph.neighbors)
+
+    assert_matches(graph, reference)
+    graph.compact()
+    assert graph.garbage == 0
+    assert_matches(graph, reference)
+
+
+def test_removing_every_edge_leaves_empty_rows():
+    graph = FriendshipGraph([(1, 2), (1, 3)])
+    assert graph.remove_edge(1, 2) and graph.remove_edge(1, 3)
+    assert not graph.remove_edge(1, 3) and not graph.remove_edge(5, 1)
+    assert len(graph) == 0 and list(graph.edges()) == []
+    assert graph.add_edge(1, 3) and list(graph.neighbors_of(1)) == [3]
+
+
+def test_cached_bitsets_follow_edge_changes():
+    graph = FriendshipGraph([(1, f) for f in range(10, 20)] + [(2, f) for f in range(15, 25)],
+                            dense_degree=4)
+    assert graph.bitset(1) is not None
+    assert graph.common_count(1, 2) == 5
+    graph.add_edge(1, 21)
+    graph.remove_edge(2, 15)
+    assert graph.common_count(1, 2) == 5
+    assert list(graph.common_neighbors(1, 2)) == [16, 17, 18, 19, 21]
+
+
+def test_csr_export_and_packed_view_match_the_graph():
+    rng = random.Random(3)
+    graph = FriendshipGraph(random_edges(rng, 300))
+    graph.remove_edge(*next(graph.edges()))
+    vertex_ids, offsets, neighbors = graph.to_csr()
+    assert list(vertex_ids) == sorted(graph.row_of)
+    assert len(offsets) == len(vertex_ids) + 1 and offsets[-1] == len(neighbors) == len(graph)
+
+    buffer = bytearray(8 + csr_nbytes(len(vertex_ids), len(neighbors)))
+    assert pack_csr(buffer, vertex_ids, offsets, neighbors, start=8) == len(buffer) - 8
+    views = [CSRView(vertex_ids, offsets, neighbors), unpack_csr(buffer, 8)]
+    for view in views:
+        for user_id in range(0, 32):
+            assert list(view.neighbors_of(user_id)) == list(graph.neighbors_of(user_id))
+            assert view.degree(user_id) == graph.degree(user_id)
+            assert view.common_count(user_id, 1) == graph.common_count(user_id, 1)
+        assert view.has_edge(*next(graph.edges())) and not view.has_edge(1, 404)
+    views[1].release()
+
+
+def test_user_index():
+    users = UserIndex([{'id': 1, 'name': 'Ada'}])
+    users.add({'id': 2, 'name': 'Bob'})
+    assert users.get(2)['name'] == 'Bob' and users.get(3) is None
+    assert users.remove(1) and not users.remove(1)
+    assert len(users) == 1 and [user['id'] for user in users] == [2]
@@ -0,0 +1,85 @@
+"""Tests for writing, verifying and mapping friendship graph snapshots."""
+
+import struct
+
+import pytest
+
+from friendship_graph import FriendshipGraph
+from graph_snapshot import (BYTEORDER_OFFSET, HEADER, HEADER_SIZE, MAGIC, SnapshotError,
+                            generate_edges, load_snapshot, main, verify_snapshot,
+                            write_snapshot)
+
+
+@pytest.fixture
+def graph():
+    return FriendshipGraph(generate_edges(50, 4))
+
+
+@pytest.fixture
+def snapshot(graph, tmp_path):
+    path = tmp_path / 'graph.snapshot'
+    write_snapshot(graph, str(path))
+    return path
+
+
+def rewrite(path, offset, data):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def test_snapshot_round_trips_the_graph(graph, snapshot):
+    info = verify_snapshot(str(snapshot))
+    assert info['edge_count'] == len(graph)
+    assert info['bytes'] == snapshot.stat().st_size
+    assert not (snapshot.parent / 'graph.snapshot.tmp').exists()
+    with load_snapshot(str(snapshot)) as loaded:
+        for user_id in range(0, 52):
+            assert list(loaded.neighbors_of(user_id)) == list(graph.neighbors_of(user_id))
+            assert loaded.common_count(user_id, 1) == graph.common_count(user_id, 1)
+
+
+@pytest.mark.parametrize('size', [0, HEADER_SIZE - 1, HEADER_SIZE, HEADER_SIZE + 8])
+def test_truncated_snapshot_is_rejected(snapshot, size):
+    with open(snapshot, 'r+b') as f:
+        f.truncate(size)
+    with pytest.raises(SnapshotError):
+        verify_snapshot(str(snapshot))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(snapshot))
+
+
+def test_padded_snapshot_is_rejected(snapshot):
+    with open(snapshot, 'ab') as f:
+        f.write(b'\0' * 8)
+    with pytest.raises(SnapshotError, match="truncated or padded"):
+        load_snapshot(str(snapshot))
+
+
+def test_corrupted_payload_fails_the_checksum(snapshot):
+    rewrite(snapshot, snapshot.stat().st_size - 3, b'\xff')
+    with pytest.raises(SnapshotError, match="checksum"):
+        verify_snapshot(str(snapshot))
+    assert main(['verify', str(snapshot)]) == 1
+
+
+def test_bad_magic_and_version_are_rejected(snapshot):
+    rewrite(snapshot, 0, b'PK\x03\x04')
+    with pytest.raises(SnapshotError, match="magic"):
+        verify_snapshot(str(snapshot))
+    rewrite(snapshot, 0, MAGIC)
+    rewrite(snapshot, 8, struct.pack('<I', 99))
+    with pytest.raises(SnapshotError, match="version 99"):
+        load_snapshot(str(snapshot))
+
+
+def test_snapshot_from_other_byte_order_is_rejected(snapshot):
+    with open(snapshot, 'rb') as f:
+        header = f.read(HEADER.size)
+    mark = header[BYTEORDER_OFFSET:BYTEORDER_OFFSET + 4]
+    rewrite(snapshot, BYTEORDER_OFFSET, mark[::-1])
+    with pytest.raises(SnapshotError, match="endian host"):
+        load_snapshot(str(snapshot))
+    rewrite(snapshot, BYTEORDER_OFFSET, b'\0\0\0\0')
+    with pytest.raises(SnapshotError, match="byte-order mark"):
+        verify_snapshot(str(snapshot))
@@ -0,0 +1,77 @@
+"""Tests for MutualFriendsCache maintenance under edge changes."""
+
+import random
+
+from friendship_graph import FriendshipGraph
+from mutual_friends_cache import ENTRY_BYTES, MutualFriendsCache
+from performance_issue import MockDatabase, get_mutual_friends_count
+
+
+def random_edges(rng, count, users=15):
+    return [(rng.randint(1, users), rng.randint(1, users)) for _ in range(count)]
+
+
+def test_cached_counts_follow_random_edge_changes():
+    rng = random.Random(11)
+    graph = FriendshipGraph(random_edges(rng, 60))
+    cache = MutualFriendsCache(graph)
+    pairs = [(a, b) for a in range(1, 16) for b in range(a, 16)]
+    for a, b in pairs:
+        cache.get(a, b)
+
+    for user_id, friend_id in random_edges(rng, 500):
+        if rng.random() < 0.5:
+            if graph.add_edge(user_id, friend_id):
+                cache.edge_added(user_id, friend_id)
+        elif graph.remove_edge(user_id, friend_id):
+            cache.edge_removed(user_id, friend_id)
+
+    misses = cache.misses
+    for a, b in pairs:
+        assert cache.get(b, a) == graph.common_count(a, b), (a, b)
+    assert cache.misses == misses
+    assert cache.updates > 0
+
+
+def test_pair_with_itself_counts_the_degree():
+    graph = FriendshipGraph([(1, 2), (1, 3)])
+    cache = MutualFriendsCache(graph)
+    assert cache.get(1, 1) == 2
+    graph.add_edge(1, 4)
+    cache.edge_added(1, 4)
+    assert cache.get(1, 1) == 3
+
+
+def test_least_recently_used_pairs_are_evicted():
+    graph = FriendshipGraph([(1, 9), (2, 9), (3, 9)])
+    cache = MutualFriendsCache(graph, max_bytes=2 * ENTRY_BYTES)
+    cache.get(1, 2)
+    cache.get(1, 3)
+    cache.get(1, 2)
+    cache.get(2, 3)
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.hits == 1
+
+    # The evicted pair (1, 3) is recomputed from the current graph
+    for user_id in (1, 3):
+        graph.add_edge(user_id, 8)
+        cache.edge_added(user_id, 8)
+    misses = cache.misses
+    assert cache.get(1, 3) == 2 and cache.misses == misses + 1
+    cache.clear()
+    assert len(cache) == 0 and cache.get(1, 2) == 1
+
+
+def test_mock_database_keeps_the_cache_in_step():
+    database = MockDatabase([{'id': i, 'name': f'User{i}'} for i in range(1, 6)],
+                            [(1, 3), (2, 3), (1, 4)], mutual_cache_bytes=1024 * 1024)
+    assert get_mutual_friends_count(1, 2, database) == 1
+    database.execute("INSERT INTO friendships (user_id, friend_id) VALUES (2, 4)")
+    assert get_mutual_friends_count(2, 1, database) == 2
+    database.execute("DELETE FROM friendships WHERE user_id = 1 AND friend_id = 3")
+    assert get_mutual_friends_count(1, 2, database) == 1
+    # Duplicate inserts and missing deletes leave the count alone
+    database.add_friendship(2, 4)
+    database.remove_friendship(1, 3)
+    assert get_mutual_friends_count(1, 2, database) == 1
+    assert database.mutual_cache.misses == 1
@@ -0,0 +1,84 @@
+"""Tests for the rate-limited fan-out notification dispatcher."""
+
+import time
+
+from notification_dispatcher import (FakeChannel, FakeSMSClient, NotificationDispatcher,
+                                     RateLimiter, SMSChannel)
+from order_repository import OrderRepository
+
+
+def customers(count):
+    repository = OrderRepository.in_memory()
+    # Every 3rd customer has no phone number
+    repository.add_customers((i, f"Customer {i}", f"customer{i}@example.com",
+                              f"+1555{i:07d}" if i % 3 else None)
+                             for i in range(1, count + 1))
+    return repository
+
+
+class CountingRepository:
+    def __init__(self, repository):
+        self.repository = repository
+        self.batches = []
+
+    def get_contacts(self, customer_ids):
+        self.batches.append(list(customer_ids))
+        return self.repository.get_contacts(customer_ids)
+
+
+class FailingChannel(FakeChannel):
+    def send(self, address, message, subject):
+        if address.startswith('customer2@'):
+            raise OSError("mailbox unavailable")
+        super().send(address, message, subject)
+
+
+def test_rate_limiter_paces_after_the_burst():
+    limiter = RateLimiter(20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # One token up front, then one every 50 ms
+    assert time.monotonic() - start >= 0.18
+
+
+def test_rate_limiter_allows_a_full_burst_at_once():
+    limiter = RateLimiter(1000, burst=50)
+    start = time.monotonic()
+    for _ in range(50):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05
+
+
+def test_dispatch_caps_the_limited_channel_only():
+    sms = FakeSMSClient()
+    email = FakeChannel('email')
+    with NotificationDispatcher(customers(15), {'sms': SMSChannel(sms, '+15550000000'),
+                                                'email': email},
+                                workers=4, rates={'sms': 5}) as dispatcher:
+        reports = dispatcher.dispatch(range(1, 16), "Sale!")
+    # 10 phones: a burst of 5, then 5 more at 5 per second
+    assert reports['sms'].sent == 10 == len(sms.sent)
+    assert reports['sms'].elapsed >= 0.9
+    assert reports['email'].sent == 15 == len(email.sent)
+    assert reports['email'].elapsed < 0.5
+
+
+def test_dispatch_batches_contact_lookups_and_skips_missing_addresses():
+    repository = CountingRepository(customers(10))
+    sms = FakeChannel('phone')
+    with NotificationDispatcher(repository, {'sms': sms}, workers=2,
+                                contact_batch=4) as dispatcher:
+        reports = dispatcher.dispatch(range(1, 11), "Hello")
+    assert [len(batch) for batch in repository.batches] == [4, 4, 2]
+    assert reports['sms'].sent == 7 and reports['sms'].failed == 0
+    assert sorted(address for address, _ in sms.sent) == sorted(
+        f"+1555{i:07d}" for i in range(1, 11) if i % 3)
+
+
+def test_dispatch_counts_failed_sends():
+    with NotificationDispatcher(customers(3), {'email': FailingChannel('email')},
+                                workers=2) as dispatcher:
+        reports = dispatcher.dispatch([1, 2, 3], "Hello")
+    assert reports['email'].sent == 2 and reports['email'].failed == 1
+    assert [address for _, address, _ in dispatcher.errors] == ['customer2@example.com']
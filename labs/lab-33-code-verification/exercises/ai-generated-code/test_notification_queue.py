@@ -0,0 +1,192 @@
+"""Tests for the background SMTP NotificationQueue."""
+
+from email.message import EmailMessage
+import smtplib
+import threading
+import time
+
+import pytest
+
+from notification_queue import (
+    LocalSMTPServer,
+    NotificationQueue,
+    QueueFull,
+    smtp_session_factory,
+)
+
+
+def message(number):
+    msg = EmailMessage()
+    msg['From'] = 'noreply@company.com'
+    msg['To'] = f'customer{number}@example.com'
+    msg['Subject'] = 'Order Confirmation'
+    msg.set_content(f"Your order #{number} has been processed.")
+    return msg
+
+
+class FakeSession:
+    """SMTP session stand-in running ``behaviour(message)`` on every send."""
+
+    def __init__(self, behaviour=None):
+        self.behaviour = behaviour
+        self.sent = []
+
+    def send_message(self, msg):
+        if self.behaviour is not None:
+            self.behaviour(msg)
+        self.sent.append(msg)
+
+    def noop(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def finishes(function, timeout=5):
+    """Run ``function`` in a thread; True if it returned within ``timeout``."""
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_delivers_over_one_session_and_retries_transient_failures():
+    with LocalSMTPServer(fail_every=3) as server:
+        notifications = NotificationQueue(smtp_session_factory('127.0.0.1', server.port),
+                                          sessions=1, backoff=0)
+        for number in range(10):
+            notifications.send(message(number))
+        notifications.close()
+
+        assert notifications.sent == 10
+        assert notifications.failed == []
+        assert notifications.retries >= 3
+        # 451 replies are retried on the same session
+        assert server.connections == 1
+        assert len(server.messages) == 10
+
+
+def test_gives_up_after_max_retries():
+    def always_busy(msg):
+        raise smtplib.SMTPResponseException(451, b'Try again later')
+
+    session = FakeSession(always_busy)
+    notifications = NotificationQueue(lambda: session, sessions=1, max_retries=2, backoff=0)
+    notifications.send(message(1))
+    notifications.close()
+
+    assert notifications.sent == 0
+    assert notifications.retries == 2
+    assert len(notifications.failed) == 1
+
+
+def test_permanent_rejection_is_not_retried():
+    def refuse(msg):
+        raise smtplib.SMTPRecipientsRefused({msg['To']: (550, b'No such user')})
+
+    notifications = NotificationQueue(lambda: FakeSession(refuse), sessions=1, backoff=0)
+    notifications.send(message(1))
+    notifications.close()
+
+    assert notifications.retries == 0
+    assert [msg['To'] for msg, _ in notifications.failed] == ['customer1@example.com']
+
+
+def test_broken_connection_reconnects():
+    sessions = []
+
+    def open_session():
+        if not sessions:
+            def disconnect(msg):
+                raise smtplib.SMTPServerDisconnected("idle timeout")
+            sessions.append(FakeSession(disconnect))
+        else:
+            sessions.append(FakeSession())
+        return sessions[-1]
+
+    notifications = NotificationQueue(open_session, sessions=1, backoff=0)
+    notifications.send(message(1))
+    notifications.close()
+
+    assert notifications.sent == 1
+    assert notifications.connections == 2
+
+
+def test_full_queue_applies_backpressure():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(msg):
+        started.set()
+        release.wait(5)
+
+    notifications = NotificationQueue(lambda: FakeSession(slow), sessions=1, batch_size=1,
+                                      max_pending=2, backoff=0)
+    notifications.send(message(0))
+    assert started.wait(5)              # the worker holds message 0
+    notifications.send(message(1))
+    notifications.send(message(2))
+    with pytest.raises(QueueFull):
+        notifications.send(message(3), block=False)
+    with pytest.raises(QueueFull):
+        notifications.send(message(3), timeout=0.01)
+    assert notifications.rejected == 2
+
+    release.set()
+    notifications.close()
+    assert notifications.sent == 3
+
+
+def test_unexpected_send_error_fails_the_message_and_keeps_the_worker():
+    def reject_missing_recipients(msg):
+        if msg['To'] is None:
+            raise ValueError("message has no recipients")
+
+    notifications = NotificationQueue(lambda: FakeSession(reject_missing_recipients),
+                                      sessions=1, backoff=0)
+    broken = message(1)
+    del broken['To']
+    notifications.send(broken)
+    notifications.send(message(2))
+
+    assert finishes(notifications.flush)
+    assert finishes(notifications.close)
+    assert notifications.sent == 1
+    assert isinstance(notifications.failed[0][1], ValueError)
+
+
+def test_send_after_close_is_refused():
+    notifications = NotificationQueue(FakeSession, sessions=1)
+    notifications.close()
+    with pytest.raises(RuntimeError):
+        notifications.send(message(1))
+
+
+
+def test_send_racing_close_is_delivered():
+    # Regression: a send() that passed the closed check while close() ran
+    # queued its message behind the stop sentinels, where no worker took it
+    session = FakeSession()
+    notifications = NotificationQueue(lambda: session, sessions=1)
+    put = notifications._queue.put
+    entered = threading.Event()
+
+    def slow_put(item, *args):
+        if isinstance(item, EmailMessage):
+            entered.set()
+            time.sleep(0.2)     # close() runs while this send is in flight
+        put(item, *args)
+
+    notifications._queue.put = slow_put
+    msg = message(1)
+    sender = threading.Thread(target=notifications.send, args=(msg,))
+    sender.start()
+    entered.wait(5)
+    assert finishes(notifications.close)
+    sender.join()
+    assert finishes(notifications.flush, timeout=1)
+    assert session.sent == [msg]
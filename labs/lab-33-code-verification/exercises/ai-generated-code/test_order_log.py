@@ -0,0 +1,102 @@
+"""Tests for the BufferedLogWriter order log."""
+
+import os
+import threading
+
+import pytest
+
+from order_log import BufferedLogWriter
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def finishes(function, timeout=5):
+    """Run ``function`` in a thread; True if it returned within ``timeout``."""
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_lines_are_written_in_order_on_flush_and_close(tmp_path):
+    path = tmp_path / 'orders.log'
+    log = BufferedLogWriter(str(path), flush_interval=60)
+    log.write("order 1\n")
+    log.write("order 2\n")
+    log.flush()
+    assert read(path) == "order 1\norder 2\n"
+    log.write("order 3\n")
+    log.close()
+    assert read(path) == "order 1\norder 2\norder 3\n"
+    assert log.written == 3
+
+
+def test_rotates_before_exceeding_max_bytes(tmp_path):
+    path = tmp_path / 'orders.log'
+    with BufferedLogWriter(str(path), max_bytes=100, backup_count=2, buffer_size=1) as log:
+        for order_id in range(30):
+            log.write(f"order {order_id:04d}\n")      # 11 bytes per line
+    assert log.rotations > 2
+    assert sorted(os.listdir(tmp_path)) == ['orders.log', 'orders.log.1', 'orders.log.2']
+    assert all(os.path.getsize(tmp_path / name) <= 100 for name in os.listdir(tmp_path))
+    assert read(path).endswith("order 0029\n")
+
+
+def test_drop_policy_counts_lines_it_discards(tmp_path):
+    release = threading.Event()
+    log = BufferedLogWriter(str(tmp_path / 'orders.log'), max_pending=2, overflow='drop',
+                            buffer_size=1)
+    original = log._write
+
+    def slow_write(chunks):
+        release.wait(5)
+        original(chunks)
+
+    log._write = slow_write
+    accepted = [log.write(f"order {i}\n") for i in range(20)]
+    release.set()
+    log.close()
+    assert accepted.count(False) == log.dropped > 0
+    assert log.written == accepted.count(True)
+
+
+def test_rejects_non_str_lines(tmp_path):
+    with BufferedLogWriter(str(tmp_path / 'orders.log')) as log:
+        with pytest.raises(TypeError):
+            log.write(b"order 1\n")
+        with pytest.raises(TypeError):
+            log.write(42)
+
+
+def test_flush_after_close_returns(tmp_path):
+    log = BufferedLogWriter(str(tmp_path / 'orders.log'))
+    log.close()
+    assert finishes(log.flush)
+    with pytest.raises(RuntimeError):
+        log.write("late\n")
+
+
+def test_write_errors_are_recorded_and_the_writer_recovers(tmp_path):
+    path = tmp_path / 'orders.log'
+    # Rotation renames orders.log to orders.log.1: make that fail
+    blocker = tmp_path / 'orders.log.1'
+    blocker.mkdir()
+    (blocker / 'keep').write_text('x')
+
+    log = BufferedLogWriter(str(path), max_bytes=20, backup_count=1, buffer_size=1)
+    log.write("order 0001 processed\n")       # 21 bytes: first write, no rotation
+    log.write("order 0002 processed\n")       # needs a rotation, which fails
+    assert finishes(log.flush)
+    assert log.lost == 1
+    assert isinstance(log.errors[0], OSError)
+
+    (blocker / 'keep').unlink()
+    blocker.rmdir()
+    log.write("order 0003 processed\n")
+    assert finishes(log.flush)
+    assert finishes(log.close)
+    assert read(path) == "order 0003 processed\n"
+    assert read(tmp_path / 'orders.log.1') == "order 0001 processed\n"
@@ -0,0 +1,182 @@
+"""Tests for the staged OrderPipeline."""
+
+import threading
+import time
+
+import pytest
+
+from order_pipeline import OrderPipeline
+from order_repository import OrderRepository
+from testability_issue import OrderProcessor
+
+
+class RecordingQueue:
+    """NotificationQueue stand-in keeping the queued messages."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SMTP down")
+        self.sent.append(message)
+
+
+class MemoryLog:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+class MemoryReceipts:
+    def __init__(self):
+        self.receipts = {}
+
+    def put_many(self, receipts):
+        self.receipts.update(receipts)
+
+
+def seeded_repository(count):
+    repository = OrderRepository.in_memory()
+    repository.add_customers([(1, 'Ada', 'ada@example.com', None)])
+    repository.add_orders((i, 1, 'pending', 10.0 + i, 1.0, 'FR') for i in range(1, count + 1))
+    return repository
+
+
+def statuses(repository):
+    with repository.pool.connection() as conn:
+        return dict(conn.execute("SELECT id, status FROM orders"))
+
+
+def make_processor(repository, processor_class=OrderProcessor, notifications=None):
+    return processor_class(repository, notifications or RecordingQueue(), MemoryLog(),
+                           MemoryReceipts())
+
+
+def make_pipeline(processor, **options):
+    options.setdefault('io_workers', 2)
+    options.setdefault('backoff', 0)
+    return OrderPipeline(processor, **options)
+
+
+def finishes(function, timeout=5):
+    thread = threading.Thread(target=function, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_close_drains_every_accepted_order():
+    repository = seeded_repository(100)
+    processor = make_processor(repository)
+    pipeline = make_pipeline(processor, fetch_batch=7, commit_batch=10, commit_interval=60)
+    assert pipeline.submit(range(1, 101)) == 100
+    assert finishes(pipeline.close)
+
+    stats = pipeline.stats()
+    assert stats['processed'] == 100
+    assert sorted(processor.receipts.receipts) == list(range(1, 101))
+    assert set(statuses(repository).values()) == {'processed'}
+    assert stats['in_flight'] == 0 and stats['failed'] == 0
+    with pytest.raises(RuntimeError):
+        pipeline.submit([1])
+
+
+def test_already_processed_and_unknown_orders_are_not_handled():
+    repository = seeded_repository(5)
+    repository.mark_processed([1, 2])
+    processor = make_processor(repository)
+    with make_pipeline(processor) as pipeline:
+        pipeline.submit([1, 2, 3, 4, 5, 404])
+
+    stats = pipeline.stats()
+    assert (stats['processed'], stats['skipped'], stats['missing']) == (3, 2, 1)
+    assert pipeline.missing == [404]
+    assert sorted(processor.receipts.receipts) == [3, 4, 5]
+    assert len(processor.notifications.sent) == 3
+
+
+def test_failed_fetch_is_retried():
+    repository = seeded_repository(3)
+    get_orders = repository.get_orders
+    calls = []
+
+    def flaky_get_orders(order_ids):
+        calls.append(list(order_ids))
+        if len(calls) == 1:
+            raise ConnectionError("database restarting")
+        return get_orders(order_ids)
+
+    repository.get_orders = flaky_get_orders
+    with make_pipeline(make_processor(repository)) as pipeline:
+        pipeline.submit([1, 2, 3])
+
+    stats = pipeline.stats()
+    assert (stats['processed'], stats['retries'], stats['failed']) == (3, 1, 0)
+    assert len(calls) == 2
+
+
+def test_failures_are_reported_per_stage():
+    class FailingProcessor(OrderProcessor):
+        def handle_order(self, order, done=None):
+            if order.order_id == 2:
+                raise RuntimeError("bad address")
+            super().handle_order(order, done)
+
+        def commit_orders(self, orders):
+            if any(order.order_id == 3 for order in orders):
+                raise RuntimeError("disk full")
+            super().commit_orders(orders)
+
+    repository = seeded_repository(3)
+    processor = make_processor(repository, FailingProcessor)
+    with make_pipeline(processor, max_retries=2, commit_batch=1) as pipeline:
+        pipeline.submit([1, 2, 3])
+
+    stats = pipeline.stats()
+    assert [(order_id, stage) for order_id, stage, _ in sorted(pipeline.failed)] == \
+        [(2, 'handle'), (3, 'commit')]
+    assert (stats['processed'], stats['failed'], stats['retries']) == (1, 2, 4)
+    assert stats['in_flight'] == 0
+    assert statuses(repository) == {1: 'processed', 2: 'pending', 3: 'pending'}
+
+
+def test_handle_retry_does_not_repeat_successful_side_effects():
+    # Regression: a failed email retried the whole handle step, writing
+    # the order log line once per attempt
+    repository = seeded_repository(1)
+    processor = make_processor(repository, notifications=RecordingQueue(failures=2))
+    with make_pipeline(processor, max_retries=2) as pipeline:
+        pipeline.submit([1])
+
+    assert pipeline.stats()['processed'] == 1
+    assert len(processor.order_log.lines) == 1
+    assert len(processor.notifications.sent) == 1
+
+
+def test_submit_racing_close_is_processed():
+    # Regression: submit() checked _closed without the lock, so close()
+    # could queue the stop sentinel ahead of a batch still being submitted
+    repository = seeded_repository(3)
+    processor = make_processor(repository)
+    pipeline = make_pipeline(processor)
+    put = pipeline._fetch_queue.put
+
+    def slow_put(item, *args, **kwargs):
+        if isinstance(item, list):
+            time.sleep(0.2)
+        put(item, *args, **kwargs)
+
+    pipeline._fetch_queue.put = slow_put
+    submitter = threading.Thread(target=pipeline.submit, args=([1, 2, 3],))
+    submitter.start()
+    time.sleep(0.05)
+    assert finishes(pipeline.close)
+    submitter.join(5)
+
+    assert pipeline.stats()['processed'] == 3
+    assert set(statuses(repository).values()) == {'processed'}
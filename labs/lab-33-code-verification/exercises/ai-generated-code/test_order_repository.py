@@ -0,0 +1,147 @@
+"""Tests for OrderRepository and the batched unit of work of OrderProcessor."""
+
+import sqlite3
+
+import pytest
+
+from order_repository import MAX_BATCH, Contact, OrderNotFound, OrderRecord, OrderRepository
+from testability_issue import OrderProcessor
+
+
+class RecordingQueue:
+    """NotificationQueue stand-in keeping the queued messages."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+class MemoryLog:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+class MemoryReceipts:
+    def __init__(self):
+        self.receipts = {}
+
+    def put_many(self, receipts):
+        self.receipts.update(receipts)
+
+
+@pytest.fixture
+def repository():
+    repository = OrderRepository.in_memory()
+    repository.add_customers([
+        (1, 'Ada', 'ada@example.com', '+15550000001'),
+        (2, 'Bob', 'bob@example.com', None),
+    ])
+    repository.add_orders((i, 1 + i % 2, 'pending', 10.0 * i, 1.5, 'FR') for i in range(1, 11))
+    return repository
+
+
+def statuses(repository):
+    with repository.pool.connection() as conn:
+        return dict(conn.execute("SELECT id, status FROM orders"))
+
+
+def test_get_orders_joins_customers_and_omits_unknown_ids(repository):
+    orders = repository.get_orders([1, 2, 99])
+    assert sorted(orders) == [1, 2]
+    assert orders[1] == OrderRecord(1, 2, 'pending', 10.0, 'Bob', 'bob@example.com')
+    assert repository.get_order(99) is None
+    assert repository.get_orders([]) == {}
+
+
+def test_get_orders_splits_large_inputs_into_batches(repository):
+    # Regression: more than MAX_BATCH ids raised ValueError
+    repository.add_orders([(MAX_BATCH + 3, 1, 'pending', 5.0, 1.0, 'DE')])
+    orders = repository.get_orders(range(MAX_BATCH + 5))
+    assert sorted(orders) == list(range(1, 11)) + [MAX_BATCH + 3]
+
+
+def test_get_contacts_and_shipping_details(repository):
+    assert repository.get_contacts([1, 2, 3]) == {
+        1: Contact(1, '+15550000001', 'ada@example.com'),
+        2: Contact(2, None, 'bob@example.com'),
+    }
+    assert repository.get_shipping_details(3) == (1.5, 'FR')
+    with pytest.raises(OrderNotFound):
+        repository.get_shipping_details(99)
+
+
+def test_shipping_cost_of_an_unknown_order_is_not_found(repository):
+    # Regression: unpacking the missing row raised TypeError
+    processor = OrderProcessor(repository, shipping=object())
+    with pytest.raises(OrderNotFound, match="order 99"):
+        processor.calculate_shipping_cost(99)
+
+
+def test_mark_processed_commits_in_one_transaction(repository):
+    assert repository.mark_processed([1, 2, 3]) == 3
+    assert [order_id for order_id, status in statuses(repository).items()
+            if status == 'processed'] == [1, 2, 3]
+
+
+def test_mark_processed_rolls_back_on_error(repository):
+    def ids():
+        yield 4
+        yield 5
+        raise RuntimeError("connection lost mid-batch")
+
+    with pytest.raises(RuntimeError):
+        repository.mark_processed(ids())
+    assert set(statuses(repository).values()) == {'pending'}
+
+
+def test_add_orders_rolls_back_a_failed_batch(repository):
+    with pytest.raises(sqlite3.IntegrityError):
+        repository.add_orders([(11, 1, 'pending', 1.0, 1.0, 'FR'),
+                               (1, 1, 'pending', 1.0, 1.0, 'FR')])    # duplicate id
+    assert repository.get_order(11) is None
+
+
+def make_processor(repository, processor_class=OrderProcessor):
+    return processor_class(repository, RecordingQueue(), MemoryLog(), MemoryReceipts())
+
+
+def test_process_orders_commits_batches_and_reports_missing(repository):
+    processor = make_processor(repository)
+    result = processor.process_orders([1, 2, 3, 42, 4], batch_size=2)
+
+    assert result.processed == 4
+    assert result.missing == [42]
+    assert sorted(processor.receipts.receipts) == [1, 2, 3, 4]
+    assert len(processor.notifications.sent) == 4
+    assert [status for order_id, status in sorted(statuses(repository).items())][:5] == \
+        ['processed'] * 4 + ['pending']
+
+
+def test_process_orders_commits_handled_orders_before_a_failure(repository):
+    class FailingProcessor(OrderProcessor):
+        def handle_order(self, order, done=None):
+            if order.order_id == 3:
+                raise RuntimeError("SMTP down")
+            super().handle_order(order, done)
+
+    processor = make_processor(repository, FailingProcessor)
+    with pytest.raises(RuntimeError):
+        processor.process_orders([1, 2, 3, 4], batch_size=10)
+
+    # Orders 1 and 2 finished their side effects, so their unit of work
+    # committed; 3 failed and 4 was never reached
+    current = statuses(repository)
+    assert [current[i] for i in (1, 2, 3, 4)] == ['processed', 'processed', 'pending', 'pending']
+    assert sorted(processor.receipts.receipts) == [1, 2]
+
+
+def test_process_order_returns_false_for_unknown_order(repository):
+    processor = make_processor(repository)
+    assert processor.process_order(1) is True
+    assert processor.process_order(404) is False
+    assert processor.notifications.sent[0]['To'] == 'bob@example.com'
@@ -0,0 +1,82 @@
+"""Tests for the batched social graph queries and the indexed MockDatabase."""
+
+import pytest
+
+from performance_issue import (MockDatabase, find_common_friends, get_friend_recommendations,
+                               get_friends_many, get_mutual_friends_count,
+                               get_user_details_many, get_user_friends)
+
+USERS = [{'id': i, 'name': f'User{i}', 'email': f'user{i}@example.com'} for i in range(1, 21)]
+
+
+class CountingDatabase(MockDatabase):
+    """MockDatabase recording every query it executes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(query)
+        return super().execute(query)
+
+
+@pytest.fixture
+def database():
+    friendships = [(1, f) for f in (2, 3, 4, 5, 6)] + [(2, f) for f in (4, 5, 6, 7)]
+    return CountingDatabase(USERS, friendships)
+
+
+def test_friends_many_is_one_query_for_any_number_of_users(database):
+    friends = get_friends_many([2, 1, 2, 9], database)
+    assert friends == {2: [4, 5, 6, 7], 1: [2, 3, 4, 5, 6], 9: []}
+    assert len(database.queries) == 1
+    assert get_friends_many([], database) == {}
+    assert len(database.queries) == 1
+
+
+def test_user_details_many_omits_unknown_ids(database):
+    details = get_user_details_many([3, 404, 3], database)
+    assert details == {3: USERS[2]}
+    assert len(database.queries) == 1
+
+
+def test_single_row_queries(database):
+    assert get_user_friends(1, database) == [2, 3, 4, 5, 6]
+    assert get_user_friends(404, database) == []
+
+
+def test_common_friends_costs_two_queries(database):
+    common = find_common_friends(1, 2, database)
+    assert [user['id'] for user in common] == [4, 5, 6]
+    assert len(database.queries) == 2
+
+
+def test_mutual_friends_count_is_one_query(database):
+    assert get_mutual_friends_count(1, 2, database) == 3
+    assert len(database.queries) == 1
+
+
+def test_edge_queries_update_the_index(database):
+    database.execute("INSERT INTO friendships (user_id, friend_id) VALUES (2, 3)")
+    database.execute("DELETE FROM friendships WHERE user_id = 1 AND friend_id = 6")
+    assert get_friends_many([1, 2], database) == {1: [2, 3, 4, 5], 2: [3, 4, 5, 6, 7]}
+    assert get_mutual_friends_count(1, 2, database) == 3
+
+
+def test_recommendations_rank_by_mutual_friends_then_id(database):
+    database.add_friendship(3, 7)
+    database.add_friendship(3, 8)
+    database.add_friendship(4, 7)
+    database.add_friendship(4, 1)
+    database.add_friendship(5, 9)
+    database.add_friendship(6, 9)
+    database.add_friendship(5, 8)
+    recommendations = get_friend_recommendations(1, database, limit=2)
+    assert [(user['id'], user['mutual_friends']) for user in recommendations] == [(7, 3), (8, 2)]
+    assert recommendations[0]['name'] == 'User7'
+    assert len(database.queries) == 3
+
+    everyone = get_friend_recommendations(1, database, limit=None)
+    assert [user['id'] for user in everyone] == [7, 8, 9]
+    assert get_friend_recommendations(1, database, limit=0) == []
@@ -0,0 +1,42 @@
+"""Tests for the query-count and latency instrumentation."""
+
+import threading
+
+from query_instrumentation import QueryStats, normalize_query
+
+
+def test_normalize_query_replaces_literals_and_in_lists():
+    assert normalize_query("SELECT * FROM users WHERE id IN (1, 2, 3) AND name = 'x'") == \
+        "SELECT * FROM users WHERE id IN (?) AND name = ?"
+
+
+def test_concurrent_records_are_not_lost():
+    stats = QueryStats()
+    threads_count, per_thread = 8, 5000
+    start = threading.Barrier(threads_count)
+
+    def record():
+        start.wait()
+        for _ in range(per_thread):
+            stats.record('site', 'SELECT ?', 0.000_01)
+
+    threads = [threading.Thread(target=record) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = threads_count * per_thread
+    assert stats.count == total
+    assert stats.by_site['site'] == stats.by_shape['SELECT ?'] == total
+    assert sum(count for _, _, count in stats.histogram_rows()) == total
+
+
+def test_snapshot_is_a_copy_and_reset_clears():
+    stats = QueryStats()
+    stats.record('a.py:1 f', 'SELECT ?', 0.002)
+    snapshot = stats.snapshot()
+    stats.record('a.py:1 f', 'SELECT ?', 0.002)
+    assert snapshot.count == 1 and snapshot.by_shape['SELECT ?'] == 1
+    assert stats.n_plus_one_suspects(2) == {'SELECT ?': 2}
+    stats.reset()
+    assert stats.count == 0 and not stats.by_site and stats.histogram_rows() == []
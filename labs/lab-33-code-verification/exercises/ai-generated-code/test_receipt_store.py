@@ -0,0 +1,115 @@
+"""Tests for the receipt store backends."""
+
+import os
+
+import pytest
+
+from receipt_store import RECORD, SegmentReceiptStore, open_receipt_store
+
+
+def receipt(order_id, size=40):
+    return f"Order ID: {order_id}\n".ljust(size, '.')
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.seg'))
+
+
+@pytest.mark.parametrize('backend', ['segment', 'sqlite', 'file'])
+def test_put_get_replace_and_len(tmp_path, backend):
+    path = tmp_path / 'receipts'
+    if backend == 'sqlite':
+        path.mkdir()
+        path = path / 'receipts.db'
+    with open_receipt_store(backend, str(path)) as store:
+        assert store.put_many([(1, receipt(1)), (2, receipt(2))]) == 2
+        store.put(1, "replaced")
+        assert store.get(1) == "replaced"
+        assert store.get(2) == receipt(2)
+        assert store.get(3) is None
+        assert 2 in store and 3 not in store
+        assert len(store) == 2
+
+
+def test_segments_roll_over_and_reopen(tmp_path):
+    record = RECORD.size + len(receipt(0))
+    with SegmentReceiptStore(str(tmp_path), segment_bytes=3 * record) as store:
+        store.put_many((i, receipt(i)) for i in range(1, 8))
+        store.put(8, receipt(8))
+    assert segment_files(tmp_path) == ['000001.seg', '000002.seg', '000003.seg']
+    with SegmentReceiptStore(str(tmp_path), segment_bytes=3 * record) as store:
+        assert len(store) == 8
+        assert [store.get(i) for i in range(1, 9)] == [receipt(i) for i in range(1, 9)]
+        store.put(9, receipt(9))
+        assert store.get(9) == receipt(9)
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        store.put_many([(1, receipt(1)), (2, receipt(2))])
+    path = tmp_path / '000001.seg'
+    good = RECORD.size + len(receipt(1))
+    with open(path, 'r+b') as f:
+        f.truncate(good + RECORD.size + 5)
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        assert store.get(1) == receipt(1) and 2 not in store
+        assert os.path.getsize(path) == good
+
+
+def test_corrupt_tail_record_is_dropped_on_open(tmp_path):
+    # Regression: the scan trusted the length prefix and indexed the record
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        store.put_many([(1, receipt(1)), (2, receipt(2)), (3, receipt(3))])
+    path = tmp_path / '000001.seg'
+    record = RECORD.size + len(receipt(1))
+    with open(path, 'r+b') as f:
+        f.seek(record + RECORD.size + 3)    # payload of receipt 2
+        f.write(b'X')
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        assert store.get(1) == receipt(1)
+        assert 2 not in store and 3 not in store
+        assert os.path.getsize(path) == record
+
+
+def test_failed_write_keeps_file_and_index_in_step(tmp_path):
+    # Regression: a partial write left bytes the offsets did not account for
+    store = SegmentReceiptStore(str(tmp_path))
+    store.put(1, receipt(1))
+    writer = store._writer
+
+    class FullDisk:
+        def write(self, data):
+            writer.write(bytes(data[:len(data) // 2]))
+            raise OSError(28, "No space left on device")
+
+        def fileno(self):
+            return writer.fileno()
+
+    store._writer = FullDisk()
+    with pytest.raises(OSError):
+        store.put_many([(2, receipt(2)), (3, receipt(3))])
+    store._writer = writer
+    assert 2 not in store
+    store.put(4, receipt(4))
+    assert store.get(4) == receipt(4)
+    store.close()
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        assert sorted(store._index) == [1, 4]
+        assert store.get(4) == receipt(4)
+
+
+def test_unrelated_seg_files_are_ignored(tmp_path):
+    (tmp_path / 'notes.seg').write_text("not a segment")
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        store.put(1, receipt(1))
+    with SegmentReceiptStore(str(tmp_path)) as store:
+        assert store.get(1) == receipt(1)
+    assert segment_files(tmp_path) == ['000001.seg', 'notes.seg']
+
+
+def test_file_store_creates_its_directory(tmp_path):
+    directory = tmp_path / 'nested' / 'receipts'
+    with open_receipt_store('file', str(directory)) as store:
+        store.put(7, receipt(7))
+        (directory / 'README').write_text("not a receipt")
+        assert len(store) == 1
@@ -0,0 +1,100 @@
+"""Tests for the pooled, parameterized user search in security_issue.py."""
+
+import sqlite3
+import threading
+
+import pytest
+
+import query_instrumentation
+import security_issue
+
+
+@pytest.fixture
+def users_db(tmp_path):
+    path = str(tmp_path / 'users.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, role TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)", [
+        (1, 'John Doe', 'john@example.com', 'user'),
+        (2, 'Jane Admin', 'jane@example.com', 'admin'),
+        (3, 'Bob Guest', 'bob@example.com', 'guest'),
+        (4, 'Johanna 100%', 'johanna@example.com', 'user'),
+    ])
+    conn.commit()
+    conn.close()
+    security_issue.configure_pool(path)
+    yield path
+    security_issue.close_pool()
+
+
+@pytest.fixture
+def instrumented(users_db):
+    previous = query_instrumentation.instrument_sqlite(security_issue)
+    security_issue.configure_pool(users_db)     # reopen through the hook
+    yield
+    security_issue.connect = previous
+    security_issue.close_pool()
+
+
+def test_search_binds_input_as_literal_text(users_db):
+    assert security_issue.search_users("' OR '1'='1") == []
+    assert [user['id'] for user in security_issue.search_users('%')] == [4]
+    assert [user['id'] for user in security_issue.search_users('Joh')] == [1, 4]
+    assert security_issue.search_users('j', role_filter='admin')[0]['name'] == 'Jane Admin'
+
+
+def test_instrumented_search_keeps_row_factory(instrumented):
+    with query_instrumentation.request_profile('search') as profile:
+        users = security_issue.search_users('john')
+        rows, next_after_id = security_issue.search_users_page('example', limit=2)
+
+    assert users == [{'id': 1, 'name': 'John Doe', 'email': 'john@example.com', 'role': 'user'}]
+    assert [row.id for row in rows] == [1, 2]
+    assert next_after_id == 2
+    assert profile.count >= 2
+
+
+def test_keyset_pages_cover_all_matches(users_db):
+    rows, next_after_id = security_issue.search_users_page('example', limit=3)
+    assert [row.id for row in rows] == [1, 2, 3] and next_after_id == 3
+    rows, next_after_id = security_issue.search_users_page('example', after_id=3, limit=3)
+    assert [row.id for row in rows] == [4] and next_after_id is None
+    assert [row.id for row in security_issue.iter_search_users('example', batch_size=2)] \
+        == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_search_users_page_rejects_empty_limit(users_db, limit):
+    with pytest.raises(ValueError):
+        security_issue.search_users_page('example', limit=limit)
+
+
+def test_get_pool_creates_one_pool_under_concurrent_first_use(monkeypatch):
+    security_issue.close_pool()
+    created = []
+
+    class SlowPool:
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            threading.Event().wait(0.01)    # widen the race window
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(security_issue, 'ConnectionPool', SlowPool)
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def first_use():
+        barrier.wait()
+        pools.append(security_issue.get_pool())
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    security_issue.close_pool()
+
+    assert len(created) == 1
+    assert all(pool is created[0] for pool in pools)
@@ -0,0 +1,71 @@
+"""Tests for the shared-memory sharded friendship graph."""
+
+from concurrent.futures import ProcessPoolExecutor
+import random
+
+import pytest
+
+import sharded_graph
+from sharded_graph import ShardedFriendshipGraph
+
+
+def random_edges(users=200, degree=6, seed=3):
+    rng = random.Random(seed)
+    edges = set()
+    for user_id in range(1, users + 1):
+        for friend_id in rng.sample(range(1, users + 1), degree):
+            if friend_id != user_id:
+                edges.add((user_id, friend_id))
+                edges.add((friend_id, user_id))
+    return sorted(edges)
+
+
+def reference_scores(edges, user_id):
+    friends = {}
+    for a, b in edges:
+        friends.setdefault(a, set()).add(b)
+    own = friends.get(user_id, set())
+    scores = {}
+    for friend_id in own:
+        for candidate_id in friends.get(friend_id, ()):
+            if candidate_id != user_id and candidate_id not in own:
+                scores[candidate_id] = scores.get(candidate_id, 0) + 1
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+@pytest.fixture
+def edges():
+    return random_edges()
+
+
+def test_recommend_matches_reference_ranking(edges):
+    with ShardedFriendshipGraph(edges, num_shards=4) as graph:
+        for user_id in (1, 50, 200):
+            expected = reference_scores(edges, user_id)
+            assert graph.recommend(user_id, limit=5) == expected[:5]
+            assert graph.recommend(user_id, limit=None) == expected
+            assert graph.recommend_many([user_id], limit=None) == [expected]
+
+
+def test_negative_limit_is_rejected(edges):
+    with ShardedFriendshipGraph(edges, num_shards=2) as graph:
+        with pytest.raises(ValueError):
+            graph.recommend(1, limit=-1)
+
+
+def test_process_pool_matches_in_process(edges):
+    with ShardedFriendshipGraph(edges, num_shards=4) as graph:
+        expected = graph.recommend_many(range(1, 41))
+        with ProcessPoolExecutor(2) as executor:
+            assert graph.recommend_many(range(1, 41), executor=executor, chunk_size=8) == expected
+            assert graph.recommend(7, executor=executor) == expected[6]
+
+
+def test_detach_releases_attached_shards(edges):
+    graph = ShardedFriendshipGraph(edges, num_shards=2)
+    # Attach in this process the way a pool worker does
+    sharded_graph._recommend_task(graph.names, [1], 3)
+    assert set(sharded_graph._ATTACHED) == set(graph.names)
+    sharded_graph._detach_all()
+    assert sharded_graph._ATTACHED == {}
+    graph.close()
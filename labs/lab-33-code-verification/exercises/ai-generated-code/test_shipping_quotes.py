@@ -0,0 +1,185 @@
+"""Tests for the cached, batched shipping quote service."""
+
+import threading
+
+import pytest
+
+from order_repository import OrderRepository
+from shipping_quotes import (STUB_BRACKET, ShippingAPI, ShippingAPIError,
+                             ShippingQuoteService, StubShippingServer, quote_key)
+from testability_issue import OrderProcessor
+
+
+class FakeAPI:
+    """Records every upstream batch and prices 1.0 per kilogram."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def quote_many(self, keys):
+        self.calls.append(list(keys))
+        if self.error is not None:
+            raise self.error
+        return [weight for weight, _ in keys]
+
+
+def quote_concurrently(service, requests):
+    results = [None] * len(requests)
+
+    def run(index, weight, destination):
+        results[index] = service.quote(weight, destination)
+
+    threads = [threading.Thread(target=run, args=(i, *request))
+               for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_quote_key_is_exact_unless_bucketed():
+    assert quote_key(2.1, ' fr ') == (2.1, 'FR')
+    assert quote_key(2.1, 'fr', bucket=0.5) == (2.5, 'FR')
+    assert quote_key(2.5, 'fr', bucket=0.5) == (2.5, 'FR')
+
+
+def test_cached_quote_skips_upstream():
+    api = FakeAPI()
+    service = ShippingQuoteService(api, batch_window=0)
+    assert service.quote(2.0, 'FR') == 2.0
+    assert service.quote(2.0, ' fr') == 2.0
+    assert len(api.calls) == 1
+    assert service.hits == 1 and service.misses == 1
+
+
+def test_expired_quote_is_fetched_again():
+    api = FakeAPI()
+    service = ShippingQuoteService(api, ttl=0, batch_window=0)
+    service.quote(2.0, 'FR')
+    service.quote(2.0, 'FR')
+    assert len(api.calls) == 2
+
+
+def test_concurrent_misses_share_one_batch():
+    api = FakeAPI()
+    service = ShippingQuoteService(api, batch_window=0.2)
+    requests = [(float(weight), 'FR') for weight in range(1, 6)] + [(1.0, 'FR')] * 3
+    results = quote_concurrently(service, requests)
+    assert results == [weight for weight, _ in requests]
+    assert len(api.calls) == 1
+    assert sorted(api.calls[0]) == [(float(weight), 'FR') for weight in range(1, 6)]
+    assert service.coalesced + service.hits == 3
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    api = FakeAPI()
+    service = ShippingQuoteService(api, batch_window=5, max_batch=2)
+    results = quote_concurrently(service, [(1.0, 'FR'), (2.0, 'FR')])
+    assert results == [1.0, 2.0]
+    assert [len(keys) for keys in api.calls] == [2]
+
+
+def test_upstream_error_reaches_every_waiter_and_is_not_cached():
+    api = FakeAPI(error=ShippingAPIError("HTTP 503"))
+    service = ShippingQuoteService(api, batch_window=0)
+    with pytest.raises(ShippingAPIError):
+        service.quote(1.0, 'FR')
+    api.error = None
+    assert service.quote(1.0, 'FR') == 1.0
+    assert len(api.calls) == 2
+
+
+def test_exact_weight_is_quoted_by_default():
+    # Regression: the service used to send the weight rounded up to 0.5 kg
+    api = FakeAPI()
+    service = ShippingQuoteService(api, batch_window=0)
+    assert service.quote(2.1, 'FR') == 2.1
+    assert api.calls == [[(2.1, 'FR')]]
+
+
+def test_carrier_bracket_keeps_prices_exact():
+    with StubShippingServer(latency=0) as server:
+        api = ShippingAPI(server.url)
+        direct = ShippingAPI(server.url)
+        service = ShippingQuoteService(api, bucket=STUB_BRACKET, batch_window=0)
+        try:
+            for weight in (0.1, 0.5, 0.51, 2.0, 2.26, 7.99):
+                assert service.quote(weight, 'FR') == direct.quote(weight, 'FR')
+        finally:
+            api.close()
+            direct.close()
+
+
+def test_metrics_while_quoting():
+    # Regression: misses appended latencies outside the lock that
+    # metrics() holds while sorting them
+    api = FakeAPI()
+    service = ShippingQuoteService(api, ttl=0, batch_window=0)
+    errors = []
+    stop = threading.Event()
+
+    def quote():
+        while not stop.is_set():
+            service.quote(1.0, 'FR')
+
+    def read_metrics():
+        try:
+            for _ in range(2000):
+                service.metrics()
+        except RuntimeError as error:
+            errors.append(error)
+        finally:
+            stop.set()
+
+    threads = [threading.Thread(target=quote) for _ in range(4)]
+    threads.append(threading.Thread(target=read_metrics))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert errors == []
+    assert service.metrics()['misses'] > 0
+
+
+def test_close_closes_the_api_connections():
+    with StubShippingServer(latency=0) as server:
+        api = ShippingAPI(server.url)
+        service = ShippingQuoteService(api, batch_window=0)
+        service.quote(1.0, 'FR')
+        assert len(api._open) == 1
+        service.close()
+        assert api._open == []
+
+
+def test_processor_close_closes_the_shipping_service():
+    class ClosingAPI(FakeAPI):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    api = ClosingAPI()
+    processor = OrderProcessor(OrderRepository.in_memory(),
+                               shipping=ShippingQuoteService(api))
+    processor.close()
+    assert api.closed
+
+
+def test_stub_server_accepts_a_burst_of_connections():
+    with StubShippingServer(latency=0.02) as server:
+        connections = [ShippingAPI(server.url) for _ in range(32)]
+        results = [None] * len(connections)
+
+        def run(index):
+            results[index] = connections[index].quote(1.0, 'FR')
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(connections))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        for api in connections:
+            api.close()
+    assert results == [7.5] * len(connections)
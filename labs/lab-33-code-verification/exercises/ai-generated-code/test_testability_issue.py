@@ -0,0 +1,68 @@
+"""Tests for OrderProcessor wired to local stand-ins of its dependencies."""
+
+from notification_dispatcher import FakeChannel, NotificationDispatcher
+from notification_queue import LocalSMTPServer, NotificationQueue, smtp_session_factory
+from order_log import BufferedLogWriter
+from order_repository import OrderRepository
+from receipt_store import SegmentReceiptStore
+from testability_issue import OrderProcessor
+
+
+def seeded_repository(count):
+    repository = OrderRepository.in_memory()
+    repository.add_customers((i, f"Customer {i}", f"customer{i}@example.com",
+                              f"+1555{i:07d}") for i in range(1, 11))
+    repository.add_orders((i, i % 10 + 1, 'pending', 10.0 + i, 1.0, 'FR')
+                          for i in range(1, count + 1))
+    return repository
+
+
+def test_close_drains_queued_emails_log_lines_and_receipts(tmp_path):
+    log_path = tmp_path / 'orders.log'
+    with LocalSMTPServer(connect_delay=0.01) as server:
+        notifications = NotificationQueue(smtp_session_factory('127.0.0.1', server.port),
+                                          sessions=1)
+        receipts = SegmentReceiptStore(str(tmp_path / 'receipts'))
+        with OrderProcessor(seeded_repository(50), notifications,
+                            BufferedLogWriter(str(log_path), flush_interval=60),
+                            receipts) as processor:
+            assert processor.process_orders(range(1, 51)).processed == 50
+
+        assert len(server.messages) == 50
+    assert log_path.read_text().count("Processing order") == 50
+    reopened = SegmentReceiptStore(str(tmp_path / 'receipts'))
+    assert "50" in reopened.get(50)
+    reopened.close()
+
+
+def test_flush_waits_for_queued_emails_and_log_lines(tmp_path):
+    log_path = tmp_path / 'orders.log'
+    with LocalSMTPServer() as server:
+        processor = OrderProcessor(
+            seeded_repository(5),
+            NotificationQueue(smtp_session_factory('127.0.0.1', server.port), sessions=1),
+            BufferedLogWriter(str(log_path), flush_interval=60),
+            SegmentReceiptStore(str(tmp_path / 'receipts')))
+        processor.process_orders(range(1, 6))
+        processor.flush()
+        assert len(server.messages) == 5
+        assert log_path.read_text().count("Processing order") == 5
+        processor.close()
+
+
+def test_close_skips_dependencies_never_created():
+    # Lazy production defaults must not be opened just to be closed
+    processor = OrderProcessor(seeded_repository(1))
+    processor.close()
+    assert processor._notifications is None and processor._order_log is None
+
+
+def test_send_notification_reports_unknown_customers():
+    # Regression: an unknown customer id returned True without sending anything
+    repository = seeded_repository(1)
+    sms = FakeChannel('phone')
+    with NotificationDispatcher(repository, {'sms': sms}, workers=1) as dispatcher:
+        processor = OrderProcessor(repository, dispatcher=dispatcher)
+        assert processor.send_notification(3, "Shipped") is True
+        assert processor.send_notification(999, "Shipped") is False
+    assert sms.sent == [('+15550000003', "Shipped")]
@@ -7,153 +7,308 @@ This code was generated by an AI assistant but is extremely difficult
 to unit test due to tight coupling and hard-coded dependencies.
 """
 
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from collections import namedtuple
 import sqlite3
+import time
 from datetime import datetime
 import os
 
+from notification_dispatcher import EmailChannel, NotificationDispatcher, SMSChannel
+from notification_queue import NotificationQueue, smtp_session_factory
+from order_log import BufferedLogWriter
+from order_repository import OrderRepository
+from receipt_store import SegmentReceiptStore, format_receipt
+from shipping_quotes import ShippingAPI, ShippingQuoteService
+from sqlite_pool import ConnectionPool
+
+# Connection factory used by OrderProcessor. Replace it (for example with
+# query_instrumentation.instrumented_connect) to observe every query.
+connect = sqlite3.connect
+
+DATABASE_PATH = '/var/data/production.db'
+
+# Outcome of OrderProcessor.process_orders
+ProcessResult = namedtuple('ProcessResult', [
+    'processed', 'missing', 'elapsed', 'orders_per_second',
+])
+
+
+def _connect(*args, **kwargs):
+    # Look up the hook at call time so a replaced factory is honoured
+    return connect(*args, **kwargs)
+
 
 class OrderProcessor:
     """
     Process customer orders and send confirmations.
     
+    Data access goes through an injectable OrderRepository; by default
+    one backed by a connection pool on the production database. Emails
+    are handed to an injectable NotificationQueue and delivered in the
+    background over long-lived SMTP sessions. Log lines go to an
+    injectable log sink, by default a BufferedLogWriter. Receipts are
+    written in batches to an injectable receipt store, by default
+    append-only segment files. Shipping quotes come from an injectable
+    ShippingQuoteService, and customer notifications go out over SMS and
+    email through an injectable NotificationDispatcher.
+    
+    The email queue and log writer deliver from daemon threads: call
+    ``close()`` (or use the processor as a context manager) so queued
+    emails and buffered log lines are not lost when the interpreter exits.
+    
     TESTABILITY ISSUES:
-    - Hard-coded database connection
-    - Hard-coded email service
-    - Direct file system access
-    - No dependency injection
+    - Hard-coded SMTP, shipping API and Twilio credentials in the defaults
     - Mixed concerns (business logic + infrastructure)
     - Difficult to mock external services
+    
+    Args:
+        repository: OrderRepository (e.g. OrderRepository.in_memory() in tests)
+        notifications: NotificationQueue for outgoing email (e.g. one on a
+            notification_queue.LocalSMTPServer in tests)
+        order_log: Object with a ``write(line)`` method for the order log
+            (e.g. a BufferedLogWriter on a temporary file in tests)
+        receipts: Receipt store from receipt_store (segment, SQLite or
+            file-per-receipt backend)
+        shipping: ShippingQuoteService (e.g. on a
+            shipping_quotes.StubShippingServer in tests)
+        dispatcher: NotificationDispatcher for customer notifications (e.g.
+            with notification_dispatcher.FakeChannel backends in tests)
     """
     
+    def __init__(self, repository=None, notifications=None, order_log=None,
+                 receipts=None, shipping=None, dispatcher=None):
+        self._repository = repository
+        self._notifications = notifications
+        self._order_log = order_log
+        self._receipts = receipts
+        self._shipping = shipping
+        self._dispatcher = dispatcher
+    
+    @property
+    def repository(self):
+        if self._repository is None:
+            # Opened lazily: constructing a processor touches no database
+            self._repository = OrderRepository(
+                ConnectionPool(DATABASE_PATH, connect=_connect))
+        return self._repository
+    
+    @property
+    def notifications(self):
+        if self._notifications is None:
+            # ALSO A SECURITY ISSUE: hard-coded credentials!
+            self._notifications = NotificationQueue(smtp_session_factory(
+                'smtp.gmail.com', 587, 'noreply@company.com', 'hardcoded_password!',
+                starttls=True))
+        return self._notifications
+    
+    @property
+    def order_log(self):
+        if self._order_log is None:
+            self._order_log = BufferedLogWriter('/var/log/orders.log',
+                                                max_bytes=100 * 1024 * 1024)
+        return self._order_log
+    
+    @property
+    def receipts(self):
+        if self._receipts is None:
+            self._receipts = SegmentReceiptStore('/var/receipts')
+        return self._receipts
+    
+    @property
+    def shipping(self):
+        if self._shipping is None:
+            self._shipping = ShippingQuoteService(ShippingAPI(
+                'https://api.shippingcompany.com',
+                api_key='sk_live_123456789'))  # Hard-coded secret!
+        return self._shipping
+    
+    @property
+    def dispatcher(self):
+        if self._dispatcher is None:
+            from twilio.rest import Client
+            # ALSO A SECURITY ISSUE: hard-coded credentials!
+            self._dispatcher = NotificationDispatcher(self.repository, {
+                'sms': SMSChannel(Client('AC123456789', 'auth_token_hardcoded'),
+                                  '+15555555555'),
+                'email': EmailChannel(smtp_session_factory(
+                    'smtp.gmail.com', 587, 'noreply@company.com', 'password',
+                    starttls=True)),
+            }, rates={'sms': 100})
+        return self._dispatcher
+    
+    def flush(self):
+        """Block until queued emails are delivered and log lines written."""
+        for dependency in (self._notifications, self._order_log):
+            flush = getattr(dependency, 'flush', None)
+            if flush is not None:
+                flush()
+    
+    def close(self):
+        """
+        Drain and close the dependencies in use: queued emails are sent,
+        buffered log lines and receipts written, then their threads stop.
+        """
+        for dependency in (self._notifications, self._order_log, self._receipts,
+                           self._dispatcher, self._shipping):
+            close = getattr(dependency, 'close', None)
+            if close is not None:
+                close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
     def process_order(self, order_id):
         """
-        Process an order and send confirmation email.
+        Process an order and queue its confirmation email.
         
-        TESTABILITY ISSUE 1: Hard-coded database dependency
-        Cannot test without a real database connection
+        Returns:
+            True if the order exists and was processed, False otherwise
         """
-        # Create database connection directly - can't be mocked!
-        conn = sqlite3.connect('/var/data/production.db')
-        cursor = conn.cursor()
+        order = self.repository.get_order(order_id)
+        if order is None:
+            return False
         
-        # TESTABILITY ISSUE 2: SQL query embedded in business logic
-        cursor.execute(f"SELECT * FROM orders WHERE id = {order_id}")
-        order = cursor.fetchone()
+        self.handle_order(order)
+        self.commit_orders([order])
+        return True
+    
+    def process_orders(self, order_ids, batch_size=500):
+        """
+        Process many orders as batched units of work.
         
-        if not order:
-            conn.close()
-            return False
+        Each batch loads its orders and customers with one JOIN, writes
+        the receipts in one batch and marks every handled order as
+        processed in one transaction. Orders whose
+        side effects succeeded are committed even if a later order in the
+        batch raises.
+        
+        Args:
+            order_ids: Iterable of order ids
+            batch_size: Orders per query/transaction
+        
+        Returns:
+            ProcessResult with the processed count, the list of unknown
+            ids, elapsed seconds and orders per second
+        """
+        order_ids = list(order_ids)
+        processed = 0
+        missing = []
+        start = time.perf_counter()
         
-        # TESTABILITY ISSUE 3: Another hard-coded database call
-        cursor.execute(f"SELECT * FROM customers WHERE id = {order[1]}")
-        customer = cursor.fetchone()
+        for offset in range(0, len(order_ids), batch_size):
+            batch = order_ids[offset:offset + batch_size]
+            orders = self.repository.get_orders(batch)
+            done = []
+            try:
+                for order_id in batch:
+                    order = orders.get(order_id)
+                    if order is None:
+                        missing.append(order_id)
+                        continue
+                    self.handle_order(order)
+                    done.append(order)
+            finally:
+                if done:
+                    self.commit_orders(done)
+                    processed += len(done)
         
-        # TESTABILITY ISSUE 4: Hard-coded file system access
-        # Cannot test without creating actual files
-        log_file = open('/var/log/orders.log', 'a')
-        log_file.write(f"{datetime.now()}: Processing order {order_id}\n")
-        log_file.close()
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        return ProcessResult(processed, missing, elapsed, rate)
+    
+    def handle_order(self, order, done=None):
+        """
+        Run the side effects of processing one OrderRecord: write its log
+        line, then queue its confirmation email.
         
-        # TESTABILITY ISSUE 5: Hard-coded email service
-        # Cannot test email sending without SMTP server
-        smtp_server = smtplib.SMTP('smtp.gmail.com', 587)
-        smtp_server.starttls()
-        smtp_server.login('noreply@company.com', 'hardcoded_password!')  # ALSO A SECURITY ISSUE!
+        Args:
+            order: OrderRecord to handle
+            done: Optional set of the steps ('log', 'email') that already
+                succeeded for this order. Steps in it are skipped and each
+                step is added once it succeeds, so retrying with the same
+                set after a failure does not log or email twice.
+        """
+        if done is None:
+            done = set()
+        if 'log' not in done:
+            self._log_order(order)
+            done.add('log')
+        if 'email' not in done:
+            self._send_confirmation(order)
+            done.add('email')
+    
+    def commit_orders(self, orders):
+        """
+        Store the receipts of handled orders and mark them processed.
         
-        # Create email
+        Safe to repeat: receipts are overwritten and the status update
+        is the same on every run.
+        """
+        self.receipts.put_many((order.order_id, format_receipt(order)) for order in orders)
+        self.repository.mark_processed([order.order_id for order in orders])
+    
+    def _log_order(self, order):
+        self.order_log.write(f"{datetime.now()}: Processing order {order.order_id}\n")
+    
+    def _send_confirmation(self, order):
+        # Only enqueued here: delivery happens on the notification workers
         msg = MIMEMultipart()
         msg['From'] = 'noreply@company.com'
-        msg['To'] = customer[2]  # Customer email
+        msg['To'] = order.customer_email
         msg['Subject'] = 'Order Confirmation'
         
-        body = f"Your order #{order_id} has been processed."
+        body = f"Your order #{order.order_id} has been processed."
         msg.attach(MIMEText(body, 'plain'))
         
-        smtp_server.send_message(msg)
-        smtp_server.quit()
-        
-        # TESTABILITY ISSUE 6: More hard-coded file access
-        receipt_path = f'/var/receipts/order_{order_id}.txt'
-        with open(receipt_path, 'w') as f:
-            f.write(f"Order ID: {order_id}\n")
-            f.write(f"Customer: {customer[1]}\n")
-            f.write(f"Total: ${order[3]}\n")
-        
-        # Update database
-        cursor.execute(f"UPDATE orders SET status = 'processed' WHERE id = {order_id}")
-        conn.commit()
-        conn.close()
-        
-        return True
-    
+        self.notifications.send(msg)
     
     def calculate_shipping_cost(self, order_id):
         """
         Calculate shipping cost for an order.
         
-        TESTABILITY ISSUE 7: Calling external API directly
-        """
-        # Hard-coded database access again
-        conn = sqlite3.connect('/var/data/production.db')
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT weight, destination FROM orders WHERE id = {order_id}")
-        order_data = cursor.fetchone()
-        conn.close()
-        
-        # TESTABILITY ISSUE 8: Hard-coded external HTTP call
-        # Cannot test without hitting real shipping API
-        import requests
-        response = requests.post(
-            'https://api.shippingcompany.com/calculate',
-            json={'weight': order_data[0], 'destination': order_data[1]},
-            headers={'API-Key': 'sk_live_123456789'}  # Hard-coded secret!
-        )
+        Quotes come from the injectable shipping service, which caches them
+        per (weight, destination) and batches concurrent lookups.
         
-        return response.json()['cost']
+        Raises:
+            order_repository.OrderNotFound: If the order does not exist
+        """
+        weight, destination = self.repository.get_shipping_details(order_id)
+        return self.shipping.quote(weight, destination)
     
     
     def send_notification(self, customer_id, message):
         """
-        Send notification to customer.
-        
-        TESTABILITY ISSUE 9: Multiple hard-coded dependencies
-        """
-        # Hard-coded database
-        conn = sqlite3.connect('/var/data/production.db')
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT phone, email FROM customers WHERE id = {customer_id}")
-        customer = cursor.fetchone()
-        conn.close()
-        
-        # TESTABILITY ISSUE 10: Hard-coded SMS service
-        from twilio.rest import Client
-        client = Client('AC123456789', 'auth_token_hardcoded')
-        client.messages.create(
-            to=customer[0],
-            from_='+15555555555',
-            body=message
-        )
-        
-        # TESTABILITY ISSUE 11: Hard-coded email (again)
-        smtp_server = smtplib.SMTP('smtp.gmail.com', 587)
-        smtp_server.starttls()
-        smtp_server.login('noreply@company.com', 'password')
-        # ... email sending code ...
-        smtp_server.quit()
+        Send notification to customer by SMS and email.
         
-        return True
+        Returns:
+            True if at least one message was sent and no channel failed;
+            False for an unknown customer or one without any address
+        """
+        reports = self.send_notifications([customer_id], message)
+        sent = sum(report.sent for report in reports.values())
+        return sent > 0 and all(report.failed == 0 for report in reports.values())
+    
+    def send_notifications(self, customer_ids, message):
+        """
+        Send one notification to many customers (e.g. a campaign).
+        
+        Contacts are fetched per batch and SMS and email are sent
+        concurrently through the injectable dispatcher.
+        
+        Returns:
+            Dict of channel name -> notification_dispatcher.ChannelReport
+        """
+        return self.dispatcher.dispatch(customer_ids, message)
 
 
-# This class is IMPOSSIBLE to unit test properly because:
-# 1. No dependency injection - all dependencies created internally
-# 2. Hard-coded file paths - tests need specific directory structure
-# 3. Hard-coded database - tests need actual database setup
-# 4. Hard-coded SMTP - tests need email server or complex mocking
-# 5. Hard-coded HTTP calls - tests need network or complex patching
-# 6. Mixed concerns - business logic entangled with infrastructure
+# This class is still HARD to unit test properly because:
+# 1. Default credentials are hard-coded instead of injected as configuration
+# 2. Mixed concerns - business logic entangled with infrastructure
 
 
 # Demonstration of testability problems
@@ -163,21 +318,18 @@ if __name__ == "__main__":
     
     print("\nAttempting to test OrderProcessor...")
     print("\nProblems encountered:")
-    print("1. No way to inject mock database")
-    print("2. No way to inject mock email service")
-    print("3. Hard-coded file paths require specific directories")
-    print("4. Hard-coded API endpoints can't be stubbed")
-    print("5. Business logic mixed with infrastructure")
-    print("6. Cannot test in isolation - needs full environment")
-    
-    print("\nWhat a unit test would need:")
-    print("- Actual SQLite database at /var/data/production.db")
-    print("- SMTP server at smtp.gmail.com")
-    print("- Writable /var/log/ directory")
-    print("- Writable /var/receipts/ directory")
-    print("- Network access to shipping API")
-    print("- Twilio account credentials")
-    print("\nThis is NOT unit testing - this is integration testing!")
+    print("1. Hard-coded credentials in the default dependencies")
+    print("2. Business logic mixed with infrastructure")
+    print("3. Defaults still reach the full environment unless dependencies")
+    print("   are injected (OrderRepository.in_memory(),")
+    print("    NotificationQueue on a LocalSMTPServer, any order log sink,")
+    print("    receipt stores in a temporary directory,")
+    print("    ShippingQuoteService on a StubShippingServer,")
+    print("    NotificationDispatcher with fake SMS/email channels)")
+    
+    print("\nWhat a unit test needs now:")
+    print("- Fakes or local stand-ins for each injected dependency")
+    print("\nWithout them it is still integration testing, not unit testing!")
     
     print("\n" + "="*50)
     print("VERIFICATION TASK:")
@@ -217,3 +369,37 @@ if __name__ == "__main__":
     print("   - No interfaces or protocols for dependencies")
     print("   - Mixed business logic and infrastructure code")
     print("   - Tight coupling to specific implementations")
+    
+    print("\n" + "="*50)
+    print("BATCHED UNIT OF WORK (in-memory repository, segment receipts):")
+    import tempfile
+    
+    class DryRunProcessor(OrderProcessor):
+        """Log and email disabled: measures data access and receipts only."""
+        def handle_order(self, order, done=None):
+            pass
+    
+    def seeded_repository(count):
+        repository = OrderRepository.in_memory()
+        repository.add_customers((i, f"Customer {i}", f"customer{i}@example.com",
+                                  f"+1555{i:07d}") for i in range(1, count // 10 + 1))
+        repository.add_orders((i, i % (count // 10) + 1, 'pending', 10.0 + i % 90,
+                               1.0 + i % 20, 'FR') for i in range(1, count + 1))
+        return repository
+    
+    count = 20_000
+    receipt_directory = tempfile.TemporaryDirectory()
+    with DryRunProcessor(seeded_repository(count),
+                         receipts=SegmentReceiptStore(receipt_directory.name)) as processor:
+        start = time.perf_counter()
+        for order_id in range(1, count + 1):
+            processor.process_order(order_id)
+        elapsed = time.perf_counter() - start
+    print(f"\n  process_order x{count}: {count / elapsed:10.0f} orders/s")
+    
+    with DryRunProcessor(seeded_repository(count),
+                         receipts=SegmentReceiptStore(receipt_directory.name)) as processor:
+        result = processor.process_orders(range(1, count + 2))
+    print(f"  process_orders      : {result.orders_per_second:10.0f} orders/s "
+          f"({result.processed} processed, missing {result.missing})")
+    receipt_directory.cleanup()
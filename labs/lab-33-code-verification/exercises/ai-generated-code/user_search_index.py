@@ -0,0 +1,155 @@
+"""
+Full-Text Search Index for the ``users`` Table
+
+An SQLite FTS5 table with the ``trigram`` tokenizer mirrors the ``name``
+and ``email`` columns of ``users``. Trigram indexing answers substring
+(and therefore prefix) matches of three or more characters from the index
+instead of scanning every row, and results can be ranked with ``bm25``.
+``role`` is stored UNINDEXED so the role filter is applied inside the same
+index query. Triggers keep the index in sync with ``users``.
+
+Requires SQLite 3.34+ (trigram tokenizer) compiled with FTS5.
+
+Run this module directly to benchmark the indexed search against the
+``LIKE '%term%'`` scan (1M users by default).
+"""
+
+import sqlite3
+
+# Trigram matching needs at least this many characters in the search term
+MIN_TERM_LENGTH = 3
+
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+           name, email, role UNINDEXED,
+           content='users', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+           INSERT INTO users_fts(rowid, name, email, role)
+           VALUES (new.id, new.name, new.email, new.role);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+           INSERT INTO users_fts(users_fts, rowid, name, email, role)
+           VALUES ('delete', old.id, old.name, old.email, old.role);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE ON users BEGIN
+           INSERT INTO users_fts(users_fts, rowid, name, email, role)
+           VALUES ('delete', old.id, old.name, old.email, old.role);
+           INSERT INTO users_fts(rowid, name, email, role)
+           VALUES (new.id, new.name, new.email, new.role);
+       END""",
+]
+
+# bm25 weights: a hit in name counts twice as much as a hit in email
+SEARCH_SQL = """SELECT u.id, u.name, u.email, u.role
+                FROM users_fts JOIN users u ON u.id = users_fts.rowid
+                WHERE users_fts MATCH ?
+                ORDER BY bm25(users_fts, 2.0, 1.0)
+                LIMIT ?"""
+SEARCH_BY_ROLE_SQL = """SELECT u.id, u.name, u.email, u.role
+                        FROM users_fts JOIN users u ON u.id = users_fts.rowid
+                        WHERE users_fts MATCH ? AND users_fts.role = ?
+                        ORDER BY bm25(users_fts, 2.0, 1.0)
+                        LIMIT ?"""
+
+
+def has_search_index(conn):
+    """Return True if the ``users_fts`` table exists."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").fetchone()
+    return row is not None
+
+
+def create_search_index(conn):
+    """
+    Create the FTS5 index and its sync triggers, then index existing rows.
+
+    Safe to call repeatedly: the rebuild only runs when the index is new.
+    """
+    existed = has_search_index(conn)
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        if not existed:
+            conn.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+
+def match_expression(search_term):
+    """
+    Build an FTS5 query matching ``search_term`` as a substring of name or email.
+
+    The term is quoted as a single phrase, so FTS5 operators in user input
+    are treated as plain text.
+    """
+    phrase = search_term.replace('"', '""')
+    return f'{{name email}} : "{phrase}"'
+
+
+def search(conn, search_term, role_filter=None, limit=-1):
+    """
+    Ranked substring search of users through the FTS5 index.
+
+    Args:
+        conn: Connection to a database with ``create_search_index`` applied
+        search_term: At least MIN_TERM_LENGTH characters
+        role_filter: Optional exact role to filter by
+        limit: Maximum number of rows (-1 for no limit)
+
+    Returns:
+        List of (id, name, email, role) tuples, best match first
+    """
+    if len(search_term) < MIN_TERM_LENGTH:
+        raise ValueError(f"indexed search needs at least {MIN_TERM_LENGTH} characters")
+    expression = match_expression(search_term)
+    if role_filter:
+        return conn.execute(SEARCH_BY_ROLE_SQL, (expression, role_filter, limit)).fetchall()
+    return conn.execute(SEARCH_SQL, (expression, limit)).fetchall()
+
+
+# Benchmark: indexed search vs LIKE scan
+if __name__ == "__main__":
+    import argparse
+    import os
+    import random
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 trigram search vs LIKE.")
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200)
+    options = parser.parse_args()
+
+    rng = random.Random(42)
+    first_names = ['John', 'Jane', 'Alice', 'Bob', 'Carol', 'Dave', 'Eve', 'Mallory',
+                   'Oscar', 'Peggy', 'Trent', 'Victor', 'Walter', 'Zoe']
+    roles = ('admin', 'user', 'guest')
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(os.path.join(directory, 'users.db'))
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, role TEXT)")
+        print(f"Creating {options.users} users...")
+        with conn:
+            conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)", (
+                (i, f"{rng.choice(first_names)} Smith{i}", f"user{i}@example.com",
+                 rng.choice(roles)) for i in range(1, options.users + 1)))
+
+        start = time.perf_counter()
+        create_search_index(conn)
+        print(f"Index build: {time.perf_counter() - start:.1f} s")
+
+        terms = [f"smith{rng.randint(1, options.users)}" for _ in range(options.queries)]
+        like_sql = ("SELECT id, name, email, role FROM users "
+                    "WHERE (name LIKE ? OR email LIKE ?) AND role = ?")
+
+        start = time.perf_counter()
+        for term in terms:
+            conn.execute(like_sql, (f"%{term}%", f"%{term}%", 'admin')).fetchall()
+        like_ms = (time.perf_counter() - start) / len(terms) * 1000
+
+        start = time.perf_counter()
+        for term in terms:
+            search(conn, term, 'admin')
+        fts_ms = (time.perf_counter() - start) / len(terms) * 1000
+
+        print(f"\nSearch with role filter, {len(terms)} selective terms:")
+        print(f"  LIKE '%term%' scan : {like_ms:9.3f} ms/query")
+        print(f"  FTS5 trigram index : {fts_ms:9.3f} ms/query ({like_ms / fts_ms:.0f}x faster)")
+        conn.close()